@@ -5,11 +5,12 @@ class SuggestionAgent(Agent):
         super().__init__(name=name, seed=name)
         self.wardrobe_agent = wardrobe_agent
 
-    async def suggest_outfit(self, ctx: Context, occasion: str):
+    async def suggest_outfit(self, ctx: Context, occasion: str, user_id: str = "default"):
         try:
             return await self.wardrobe_agent.ai_services.suggest_outfit(
                 occasion, 
-                self.wardrobe_agent.wardrobe
+                self.wardrobe_agent.wardrobe,
+                user_id=user_id
             )
         except Exception as e:
             return {"status": "error", "message": str(e)}
@@ -1,5 +1,8 @@
+import asyncio
 from uagents import Agent, Context
 from utils.ai_services import AIServicesAgent
+from utils.feature_index import get_feature_index
+from utils.image_processing import item_image_features
 
 class WardrobeAgent(Agent):
     def __init__(self, name: str):
@@ -9,7 +12,24 @@ class WardrobeAgent(Agent):
 
     async def add_item(self, ctx: Context, item_data: dict):
         try:
-            analysis = await self.ai_services.analyze_style(item_data["image_url"])
-            return {"status": "success", "analysis": analysis}
+            return await self.ingest_item(item_data)
         except Exception as e:
             return {"status": "error", "message": str(e)}
+
+    async def ingest_item(self, item_data: dict):
+        """Analyse and index one item; raises on failure (used by ingestion jobs)"""
+        image_url = item_data["image_url"]
+        image_data = await self.ai_services.load_image(image_url)
+        analysis = await self.ai_services.analyze_style_bytes(image_data)
+        # Colour and brightness for the index come from the pixels, not
+        # from the colour names in the style analysis
+        features = await asyncio.to_thread(item_image_features, image_url, image_data)
+        user_id = item_data.get("user_id", "default")
+        # Index the new item only; the rest of the wardrobe is untouched
+        await asyncio.to_thread(
+            get_feature_index(user_id).add_item,
+            {**item_data, "style_analysis": analysis, "image_features": features}
+        )
+        # Suggestions made for the old wardrobe are stale now
+        self.ai_services.suggestion_cache.invalidate_user(user_id)
+        return {"status": "success", "analysis": analysis}
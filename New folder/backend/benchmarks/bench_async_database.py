@@ -0,0 +1,89 @@
+"""Latency of concurrent wardrobe updates through the async database layer.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_async_database --concurrency 200
+
+Fires ``--concurrency`` ``update_user_wardrobe`` calls at once (repeated
+``--rounds`` times) and reports per-call p50/p99 latency. A ticker coroutine
+measures event-loop lag over the same window, showing that the loop keeps
+serving other work while the writes are in flight.
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from utils.database import Database
+from utils.db_manager import AsyncDatabase
+from benchmarks.bench_database import CATEGORIES, make_wardrobe, percentile
+
+
+async def timed_update(db: AsyncDatabase, user_id: str, update: dict) -> float:
+    start = time.perf_counter()
+    await db.update_user_wardrobe(user_id, update)
+    return time.perf_counter() - start
+
+
+async def measure_loop_lag(lags: list, interval: float = 0.001):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run(workdir: Path, users: int, concurrency: int, rounds: int, pool_size: int) -> dict:
+    rng = random.Random(0)
+    workdir.mkdir(parents=True, exist_ok=True)
+    database = Database(workdir / "async.db", legacy_json_path=workdir / "missing.json",
+                        pool_size=pool_size)
+    db = AsyncDatabase(database)
+    await db.save({"users": {f"user{i}": make_wardrobe(rng) for i in range(users)},
+                   "metadata": {"version": "2.0", "last_updated": None}})
+
+    lags = []
+    ticker = asyncio.create_task(measure_loop_lag(lags))
+    samples = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        samples.extend(await asyncio.gather(*[
+            timed_update(db, f"user{rng.randrange(users)}",
+                         {rng.choice(CATEGORIES): make_wardrobe(rng)["tops"]})
+            for _ in range(concurrency)
+        ]))
+    elapsed = time.perf_counter() - start
+    ticker.cancel()
+    await db.close()
+
+    return {
+        "users": users,
+        "concurrency": concurrency,
+        "pool_size": pool_size,
+        "updates": len(samples),
+        "updates_per_second": len(samples) / elapsed,
+        "p50_ms": 1000 * percentile(samples, 0.50),
+        "p99_ms": 1000 * percentile(samples, 0.99),
+        "loop_lag_p99_ms": 1000 * percentile(lags, 0.99) if lags else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--pool-size", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for pool_size in args.pool_size:
+            result = asyncio.run(run(Path(workdir) / str(pool_size), args.users,
+                                     args.concurrency, args.rounds, pool_size))
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Latency and palette quality of the colour extraction backends.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_color_extraction --images 32
+
+``legacy`` is the classifier's original code path, an unseeded
+``KMeans(n_clusters=3, n_init=10)``. Quality is the mean RGB distance from
+each pixel to its nearest palette colour (lower is better), reported next to
+the legacy value for the same images. One JSON object is printed per backend.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from utils.color_extraction import BACKENDS, extract_palettes, palette_error
+
+
+def synthetic_garments(count: int, size: int = 150, seed: int = 0) -> np.ndarray:
+    """Garment-like images: a noisy two-tone shape on a light background"""
+    rng = np.random.default_rng(seed)
+    images = np.empty((count, size, size, 3), dtype=np.uint8)
+    for i in range(count):
+        background, body, trim = rng.integers(0, 256, size=(3, 3))
+        background = 200 + background % 56
+        image = np.tile(background, (size, size, 1)).astype(np.float32)
+        top, left = rng.integers(size // 8, size // 4, size=2)
+        image[top:size - top, left:size - left] = body
+        image[top:top + size // 10, left:size - left] = trim
+        image += rng.normal(0, 8, image.shape)
+        images[i] = np.clip(image, 0, 255)
+    return images
+
+
+def legacy_palette(pixels: np.ndarray) -> np.ndarray:
+    from sklearn.cluster import KMeans
+    kmeans = KMeans(n_clusters=3, n_init=10)
+    kmeans.fit(pixels)
+    return kmeans.cluster_centers_.astype(int)
+
+
+def run(n_images: int, repeats: int) -> list:
+    images = synthetic_garments(n_images)
+    pixels = images.reshape(n_images, -1, 3)
+
+    start = time.perf_counter()
+    legacy = [legacy_palette(p) for p in pixels]
+    legacy_seconds = time.perf_counter() - start
+    legacy_error = float(np.mean([palette_error(p, pal) for p, pal in zip(pixels, legacy)]))
+
+    results = [{
+        "backend": "legacy",
+        "images": n_images,
+        "ms_per_image": 1000 * legacy_seconds / n_images,
+        "palette_error": legacy_error,
+        "error_vs_legacy": 1.0,
+    }]
+    for backend in BACKENDS:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            palettes = extract_palettes(pixels, n_colors=3, backend=backend)
+            timings.append(time.perf_counter() - start)
+        error = float(np.mean([palette_error(p, pal) for p, pal in zip(pixels, palettes)]))
+        results.append({
+            "backend": backend,
+            "images": n_images,
+            "ms_per_image": 1000 * min(timings) / n_images,
+            "palette_error": error,
+            "error_vs_legacy": error / legacy_error,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    for result in run(args.images, args.repeats):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Wardrobe update latency of the SQLite store versus the legacy JSON file.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_database --users 1000 10000 100000
+
+For every user count the store is seeded with that many users, then single
+``update_user_wardrobe`` calls on random users are timed. ``legacy_json``
+replays the old implementation: load the whole file, change one user, dump
+it back with ``indent=4``. One JSON object is printed per backend and size.
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from utils.database import Database
+
+CATEGORIES = ("tops", "bottoms", "dresses", "accessories", "shoes")
+
+
+def make_wardrobe(rng: random.Random) -> dict:
+    return {
+        category: [{"image_url": f"/uploads/{rng.getrandbits(32)}.jpg", "style": "casual"}
+                   for _ in range(rng.randint(0, 3))]
+        for category in CATEGORIES
+    }
+
+
+def legacy_update(file_path: Path, user_id: str, wardrobe_data: dict):
+    with open(file_path, 'r') as f:
+        data = json.load(f)
+    data["users"].setdefault(user_id, {}).update(wardrobe_data)
+    with open(file_path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarise(backend: str, users: int, samples: list) -> dict:
+    return {
+        "backend": backend,
+        "users": users,
+        "updates": len(samples),
+        "p50_ms": 1000 * percentile(samples, 0.50),
+        "p99_ms": 1000 * percentile(samples, 0.99),
+        "mean_ms": 1000 * sum(samples) / len(samples),
+    }
+
+
+def bench_sqlite(workdir: Path, users: int, updates: int, rng: random.Random) -> dict:
+    db = Database(workdir / f"sqlite_{users}.db", legacy_json_path=workdir / "missing.json")
+    data = {"users": {f"user{i}": make_wardrobe(rng) for i in range(users)},
+            "metadata": {"version": "2.0", "last_updated": None}}
+    db.save(data)
+
+    samples = []
+    for _ in range(updates):
+        user_id = f"user{rng.randrange(users)}"
+        update = {rng.choice(CATEGORIES): make_wardrobe(rng)["tops"]}
+        start = time.perf_counter()
+        db.update_user_wardrobe(user_id, update)
+        samples.append(time.perf_counter() - start)
+    db.close()
+    return summarise("sqlite", users, samples)
+
+
+def bench_legacy(workdir: Path, users: int, updates: int, rng: random.Random) -> dict:
+    file_path = workdir / f"legacy_{users}.json"
+    with open(file_path, 'w') as f:
+        json.dump({"users": {f"user{i}": make_wardrobe(rng) for i in range(users)},
+                   "metadata": {"version": "1.0", "last_updated": None}}, f, indent=4)
+
+    samples = []
+    for _ in range(updates):
+        user_id = f"user{rng.randrange(users)}"
+        update = {rng.choice(CATEGORIES): make_wardrobe(rng)["tops"]}
+        start = time.perf_counter()
+        legacy_update(file_path, user_id, update)
+        samples.append(time.perf_counter() - start)
+    return summarise("legacy_json", users, samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--legacy-updates", type=int, default=20,
+                        help="the JSON rewrite is slow at large sizes, so time fewer calls")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as workdir:
+        for users in args.users:
+            print(json.dumps(bench_sqlite(Path(workdir), users, args.updates, rng)))
+            print(json.dumps(bench_legacy(Path(workdir), users, args.legacy_updates, rng)))
+
+
+if __name__ == "__main__":
+    main()
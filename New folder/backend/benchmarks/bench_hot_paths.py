@@ -0,0 +1,287 @@
+"""Throughput of the image and storage hot paths, with baseline regression checks.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_hot_paths --output results.json
+    python -m benchmarks.bench_hot_paths --baseline benchmarks/baselines/hot_paths.json
+    python -m benchmarks.bench_hot_paths --quick --save-baseline benchmarks/baselines/hot_paths.json
+
+Synthetic garment JPEGs in several sizes are generated from a fixed seed
+and served by an in-process HTTP server. These stages are timed:
+
+- ``analyze_image``: one ``ClothingClassifier.analyze_image`` per image size
+- ``analyze_images``: batches of 1, 8 and 32 URLs
+- ``create_outfit_preview``: render and encode for 2 and 6 items, plus the cached path
+- ``process_image``: first call (derivatives made) and repeat call, per image size
+- ``update_user_wardrobe``: SQLite updates with 100 and 1000 stored users
+
+The analysis cache is disabled, so every analysis decodes. Each result is
+one JSON object keyed by ``bench`` and ``params``, with p50, p99 and
+throughput (operations per second at the p50 latency). With
+``--baseline``, every result also found in the baseline must reach
+``1 - tolerance`` of the baseline throughput. Otherwise the regressions
+are listed and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.bench_database import CATEGORIES, make_wardrobe, percentile
+from src.agents import outfit_agent
+from utils.database import Database
+from utils.image_processing import process_image
+from utils.preview_cache import PreviewCache
+
+IMAGE_SIZES = {"small": (640, 480), "medium": (1600, 1200), "large": (4000, 3000)}
+GARMENT_NAMES = ("shirt", "jean", "sneaker", "jacket", "watch", "dress")
+PREVIEW_CATEGORIES = ("tops", "bottoms", "shoes", "outerwear", "accessories", "others")
+
+
+def make_garment_jpeg(width: int, height: int, seed: int) -> bytes:
+    """A noisy two-tone garment on a light background, JPEG encoded"""
+    rng = np.random.default_rng(seed)
+    background, body, trim = rng.integers(0, 256, size=(3, 3))
+    image = np.tile(200 + background % 56, (height, width, 1)).astype(np.float32)
+    top, left = height // 6, width // 5
+    image[top:height - top, left:width - left] = body
+    image[top:top + height // 10, left:width - left] = trim
+    image += rng.normal(0, 8, image.shape)
+    buffer = BytesIO()
+    Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class ImageServer:
+    """Serves ``images`` (name -> bytes) on a local port from a thread"""
+
+    def __init__(self, images: Dict[str, bytes]):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = images.get(self.path.lstrip("/"))
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def measure(bench: str, params: dict, func: Callable[[], object], repeats: int,
+            ops_per_call: int = 1, setup: Optional[Callable[[], None]] = None) -> dict:
+    """Time ``repeats`` calls of ``func`` after one untimed warm-up call"""
+    if setup is not None:
+        setup()
+    func()
+    samples = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    p50 = percentile(samples, 0.50)
+    return {
+        "bench": bench,
+        "params": params,
+        "calls": len(samples),
+        "p50_ms": 1000 * p50,
+        "p99_ms": 1000 * percentile(samples, 0.99),
+        "mean_ms": 1000 * sum(samples) / len(samples),
+        "throughput_per_s": ops_per_call / p50 if p50 > 0 else float("inf"),
+    }
+
+
+def bench_analysis(server: ImageServer, sizes: List[str], batches: List[int], repeats: int) -> List[dict]:
+    results = []
+    classifier = outfit_agent.ClothingClassifier()
+    classifier.warm_up()
+    try:
+        for size in sizes:
+            url = f"{server.base_url}/{size}_shirt_0.jpg"
+            results.append(measure("analyze_image", {"size": size},
+                                   lambda: classifier.analyze_image(url), repeats))
+        for batch in batches:
+            urls = [f"{server.base_url}/medium_{GARMENT_NAMES[i % len(GARMENT_NAMES)]}_{i}.jpg"
+                    for i in range(batch)]
+            results.append(measure("analyze_images", {"size": "medium", "batch": batch},
+                                   lambda: classifier.analyze_images(urls), repeats, ops_per_call=batch))
+    finally:
+        classifier.close()
+    return results
+
+
+def bench_preview(images: Dict[str, bytes], item_counts: List[int], repeats: int) -> List[dict]:
+    results = []
+    for count in item_counts:
+        store = outfit_agent.ImageStore()
+        wardrobe = {}
+        for i in range(count):
+            name = f"medium_{GARMENT_NAMES[i % len(GARMENT_NAMES)]}_{i}.jpg"
+            img = Image.open(BytesIO(images[name])).convert("RGB")
+            img.thumbnail(outfit_agent.PREVIEW_THUMBNAIL_SIZE)
+            store.put(name, np.array(img))
+            category = PREVIEW_CATEGORIES[i % len(PREVIEW_CATEGORIES)]
+            wardrobe.setdefault(category, []).append({"url": name, "hash": f"{i:064x}"})
+
+        def fresh_cache():
+            outfit_agent.preview_cache = PreviewCache(outfit_agent.PREVIEW_CACHE_MAX_BYTES)
+
+        render = lambda: outfit_agent.create_outfit_preview(wardrobe, store, mode="inline")
+        results.append(measure("create_outfit_preview", {"items": count, "cache": "miss"},
+                               render, repeats, setup=fresh_cache))
+        results.append(measure("create_outfit_preview", {"items": count, "cache": "hit"},
+                               render, repeats))
+    return results
+
+
+def bench_process_image(workdir: Path, images: Dict[str, bytes], sizes: List[str], repeats: int) -> List[dict]:
+    results = []
+    for size in sizes:
+        original = workdir / f"{size}_shirt_0.jpg"
+        original.write_bytes(images[f"{size}_shirt_0.jpg"])
+
+        def drop_derivatives():
+            for path in workdir.glob(f"{size}_shirt_0.*.*"):
+                path.unlink()
+
+        call = lambda: process_image(str(original))
+        results.append(measure("process_image", {"size": size, "derivatives": "create"},
+                               call, repeats, setup=drop_derivatives))
+        results.append(measure("process_image", {"size": size, "derivatives": "reuse"}, call, repeats))
+    return results
+
+
+def bench_database(workdir: Path, user_counts: List[int], repeats: int) -> List[dict]:
+    results = []
+    rng = random.Random(0)
+    for users in user_counts:
+        db = Database(workdir / f"bench_{users}.db", legacy_json_path=workdir / "missing.json")
+        db.save({"users": {f"user{i}": make_wardrobe(rng) for i in range(users)},
+                 "metadata": {"version": "2.0", "last_updated": None}})
+        updates = iter([(f"user{rng.randrange(users)}", {rng.choice(CATEGORIES): make_wardrobe(rng)["tops"]})
+                        for _ in range(repeats + 1)])
+        results.append(measure("update_user_wardrobe", {"users": users},
+                               lambda: db.update_user_wardrobe(*next(updates)), repeats))
+        db.close()
+    return results
+
+
+def result_key(result: dict) -> str:
+    return result["bench"] + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[dict]:
+    """Results whose throughput fell more than ``tolerance`` below the baseline"""
+    expected = {result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        reference = expected.get(result_key(result))
+        if reference is None:
+            continue
+        ratio = result["throughput_per_s"] / reference["throughput_per_s"]
+        if ratio < 1 - tolerance:
+            regressions.append({
+                "bench": result["bench"],
+                "params": result["params"],
+                "baseline_per_s": reference["throughput_per_s"],
+                "current_per_s": result["throughput_per_s"],
+                "ratio": ratio,
+            })
+    return regressions
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--quick", action="store_true", help="small sizes and batches only")
+    parser.add_argument("--output", type=Path, help="write the full results document here")
+    parser.add_argument("--baseline", type=Path, help="fail on throughput drops against this file")
+    parser.add_argument("--save-baseline", type=Path, help="write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed throughput drop as a fraction of the baseline")
+    args = parser.parse_args()
+
+    sizes = ["small", "medium"] if args.quick else list(IMAGE_SIZES)
+    batches = [1, 8] if args.quick else [1, 8, 32]
+    item_counts = [2, 6]
+    user_counts = [100] if args.quick else [100, 1000]
+
+    images = {}
+    for size, (width, height) in IMAGE_SIZES.items():
+        if size in sizes:
+            for i in range(max(batches)):
+                name = GARMENT_NAMES[i % len(GARMENT_NAMES)]
+                images[f"{size}_{name}_{i}.jpg"] = make_garment_jpeg(width, height, seed=i)
+
+    # Every analysis should decode; nothing here may touch data/
+    outfit_agent.ANALYSIS_CACHE_ENABLED = False
+    results = []
+    with tempfile.TemporaryDirectory() as workdir, ImageServer(images) as server:
+        results += bench_analysis(server, sizes, batches, args.repeats)
+        results += bench_preview(images, item_counts, args.repeats)
+        results += bench_process_image(Path(workdir), images, sizes, args.repeats)
+        results += bench_database(Path(workdir), user_counts, args.repeats)
+
+    for result in results:
+        print(json.dumps(result))
+
+    document = {"environment": environment(), "results": results}
+    if args.output:
+        args.output.write_text(json.dumps(document, indent=2))
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps(document, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + json.dumps(regression), file=sys.stderr)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed more than {args.tolerance:.0%} "
+                  f"against {args.baseline}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Import-time cost of the backend entry points, per top-level module.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --repeats 5 --top 15 --output imports.json
+
+Each scenario runs in a fresh interpreter under ``python -X importtime``:
+
+- ``outfit_agent``: importing the Node-facing agent module
+- ``text_request``: a suggestion request without images
+- ``image_request``: a request analysing one local image (the vision stack)
+- ``main``: importing the FastAPI application
+
+The importtime lines are grouped by top-level package (``numpy.core`` and
+``numpy.linalg`` both count towards ``numpy``), using each module's own
+"self" time, and the median over ``--repeats`` runs is reported. Every
+scenario also lists which of ``utils.lazy_import.HEAVY_MODULES`` ended up
+loaded, so a stray eager import shows up by name.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from statistics import median
+from typing import Dict, List, Tuple
+
+from utils.lazy_import import HEAVY_MODULES
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+REPORT_LOADED = (
+    "import json, sys\n"
+    "print(json.dumps([m for m in {heavy!r} if m in sys.modules]))\n"
+)
+
+IMAGE_SETUP = (
+    "from PIL import Image\n"
+    "Image.new('RGB', (640, 480), (30, 60, 120)).save({path!r})\n"
+)
+
+SCENARIOS = {
+    "outfit_agent": "import src.agents.outfit_agent\n",
+    "text_request": (
+        "from src.agents import outfit_agent\n"
+        "outfit_agent.ANALYSIS_CACHE_ENABLED = False\n"
+        "outfit_agent.process_request({'preferences': {'prompt': 'casual weekend'}, 'images': []})\n"
+    ),
+    "image_request": (
+        "from src.agents import outfit_agent\n"
+        "outfit_agent.ANALYSIS_CACHE_ENABLED = False\n"
+        "outfit_agent.process_request({{'preferences': {{'prompt': 'casual weekend'}},\n"
+        "                              'images': ['shirt.jpg'], 'paths': [{path!r}]}})\n"
+    ),
+    "main": "import main\n",
+}
+
+
+def parse_importtime(stderr: str) -> Tuple[Dict[str, int], int]:
+    """(self microseconds per top-level package, total microseconds)"""
+    per_package: Dict[str, int] = defaultdict(int)
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        per_package[package] += int(self_us)
+        total += int(self_us)
+    return dict(per_package), total
+
+
+def run_scenario(code: str) -> Tuple[Dict[str, int], int, List[str]]:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code + REPORT_LOADED.format(heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        errors = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError("\n".join(errors[-5:]))
+    per_package, total = parse_importtime(completed.stderr)
+    loaded = json.loads(completed.stdout.strip().splitlines()[-1])
+    return per_package, total, loaded
+
+
+def measure(name: str, code: str, repeats: int, top: int) -> dict:
+    runs = [run_scenario(code) for _ in range(repeats)]
+    packages = {package for per_package, _, _ in runs for package in per_package}
+    medians = {
+        package: median(per_package.get(package, 0) for per_package, _, _ in runs)
+        for package in packages
+    }
+    ranked = sorted(medians.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "scenario": name,
+        "runs": repeats,
+        "total_ms": median(total for _, total, _ in runs) / 1000,
+        "heavy_loaded": runs[-1][2],
+        "modules": [{"module": package, "self_ms": us / 1000} for package, us in ranked],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="modules listed per scenario")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="run only these scenarios (repeatable)")
+    parser.add_argument("--output", type=Path, help="write the report here as JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=BACKEND_DIR / "uploads") as workdir:
+        image_path = str(Path(workdir) / "shirt.jpg")
+        for name in args.scenario or SCENARIOS:
+            code = SCENARIOS[name]
+            if name == "image_request":
+                code = IMAGE_SETUP.format(path=image_path) + code.format(path=image_path)
+            result = measure(name, code, args.repeats, args.top)
+            print(json.dumps(result))
+            results.append(result)
+
+    if args.output:
+        args.output.write_text(json.dumps({"results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Prompt size and suggestion latency: compact table versus pretty-printed JSON.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_prompt_builder --items 10 100 1000
+
+For each wardrobe size a synthetic wardrobe is generated and an outfit
+prompt is built both ways. ``legacy_json`` is the old prompt with
+``json.dumps(wardrobe, indent=2)``. ``compact`` is ``PromptBuilder``, which
+filters by occasion, writes a table and maps ids back. Tokens are estimated
+at four characters per token. End-to-end latency adds a stub model charging
+``--ms-per-1k-tokens`` of prompt. One JSON object is printed per variant and
+size.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from utils.prompt_builder import PromptBuilder
+from benchmarks.bench_database import CATEGORIES
+
+OCCASIONS = ("work", "business dinner", "wedding", "gym", "beach", "date night", "party")
+STYLES = ("casual", "formal", "sporty", "minimal", "bohemian", "streetwear", "classic")
+COLORS = ("navy", "white", "black", "beige", "olive", "burgundy", "grey")
+
+
+def make_item(rng: random.Random, category: str) -> dict:
+    return {
+        "category": category,
+        "style": rng.choice(STYLES),
+        "image_url": f"http://localhost:5000/uploads/{rng.getrandbits(64):016x}.jpg",
+        "occasion_tags": rng.sample(OCCASIONS, rng.randint(1, 3)),
+        "color": {"name": rng.choice(COLORS)},
+        "style_tags": rng.sample(STYLES, 2)
+    }
+
+
+def make_wardrobe(rng: random.Random, items: int) -> dict:
+    wardrobe = {category: [] for category in CATEGORIES}
+    for _ in range(items):
+        category = rng.choice(CATEGORIES)
+        wardrobe[category].append(make_item(rng, category))
+    return wardrobe
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def legacy_prompt(occasion: str, wardrobe: dict) -> str:
+    return f"""
+            Suggest an outfit for {occasion} using these available items:
+            {json.dumps(wardrobe, indent=2)}
+
+            Consider:
+            1. Occasion appropriateness
+            2. Color coordination
+            3. Style matching
+            4. Weather suitability
+
+            Format the response as a JSON with:
+            1. Selected items
+            2. Styling tips
+            3. Confidence score
+            """
+
+
+async def stub_model(prompt: str, ms_per_1k_tokens: float) -> str:
+    await asyncio.sleep(estimate_tokens(prompt) / 1000 * ms_per_1k_tokens / 1000)
+    return json.dumps({"items": ["1", "2", "3"], "suggested_accessories": [],
+                       "styling_tips": "", "confidence_score": 0.8})
+
+
+async def legacy_round_trip(occasion: str, wardrobe: dict, ms_per_1k_tokens: float):
+    prompt = legacy_prompt(occasion, wardrobe)
+    json.loads(await stub_model(prompt, ms_per_1k_tokens))
+    return prompt
+
+
+async def compact_round_trip(builder: PromptBuilder, occasion: str, wardrobe: dict, ms_per_1k_tokens: float):
+    prompt, id_map = builder.build(occasion, wardrobe)
+    builder.resolve(json.loads(await stub_model(prompt, ms_per_1k_tokens)), id_map)
+    return prompt
+
+
+def bench(variant: str, items: int, round_trip, repeats: int) -> dict:
+    samples, prompt = [], ""
+    for _ in range(repeats):
+        start = time.perf_counter()
+        prompt = asyncio.run(round_trip())
+        samples.append(time.perf_counter() - start)
+    return {
+        "variant": variant,
+        "items": items,
+        "prompt_chars": len(prompt),
+        "prompt_tokens_est": estimate_tokens(prompt),
+        "mean_ms": 1000 * sum(samples) / len(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--occasion", default="business dinner")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=50.0)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    builder = PromptBuilder()
+    for items in args.items:
+        wardrobe = make_wardrobe(random.Random(items), items)
+        print(json.dumps(bench("legacy_json", items, lambda: legacy_round_trip(
+            args.occasion, wardrobe, args.ms_per_1k_tokens), args.repeats)))
+        print(json.dumps(bench("compact", items, lambda: compact_round_trip(
+            builder, args.occasion, wardrobe, args.ms_per_1k_tokens), args.repeats)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Matching-items query latency: exact brute force versus the IVF index.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_similarity_search --items 1000 10000 100000
+
+A synthetic catalogue is generated for each size, with random colours,
+categories and a few tags per item drawn from a small vocabulary. Every
+item's matches are then queried for ``--queries`` random items. ``recall``
+is the share of the exact top-k that the IVF index also returns. One JSON
+object is printed per index type and size.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from utils.feature_index import CATEGORIES, rgb_to_lab, tag_bits
+from utils.similarity_search import SimilaritySearch, embed
+from benchmarks.bench_database import percentile
+
+TAGS = ("work", "party", "gym", "beach", "wedding", "casual", "formal", "sporty",
+        "minimal", "classic", "streetwear", "date night", "business dinner")
+
+
+def make_catalogue(items: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    lab = rgb_to_lab(rng.integers(0, 256, size=(items, 3)))
+    vocabulary = np.array([tag_bits([tag]) for tag in TAGS], dtype=np.uint64)
+    picks = rng.integers(0, len(TAGS), size=(items, 3))
+    bits = np.bitwise_or.reduce(vocabulary[picks], axis=1)
+    categories = rng.integers(1, len(CATEGORIES), size=items).astype(np.uint8)
+    ids = [f"item{i}" for i in range(items)]
+    return embed(lab, bits), ids, categories
+
+
+def bench(name: str, search: SimilaritySearch, queries, k: int, exact=None) -> dict:
+    samples, hits = [], 0
+    for item_id in queries:
+        start = time.perf_counter()
+        results = search.matching_for_id(item_id, k)
+        samples.append(time.perf_counter() - start)
+        if exact is not None:
+            truth = {match["id"] for match in exact.matching_for_id(item_id, k)}
+            hits += len(truth & {match["id"] for match in results})
+    summary = {
+        "index": name,
+        "items": len(search.vectors),
+        "queries": len(samples),
+        "p50_ms": 1000 * percentile(samples, 0.50),
+        "p99_ms": 1000 * percentile(samples, 0.99),
+    }
+    if exact is not None:
+        summary["recall"] = hits / (k * len(samples))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    for items in args.items:
+        vectors, ids, categories = make_catalogue(items)
+        queries = np.random.default_rng(1).choice(ids, min(args.queries, items), replace=False)
+
+        exact = SimilaritySearch(vectors, ids, categories, ivf_threshold=items + 1)
+        print(json.dumps(bench("brute_force", exact, queries, args.k)))
+
+        start = time.perf_counter()
+        ivf = SimilaritySearch(vectors, ids, categories, ivf_threshold=1)
+        build_seconds = time.perf_counter() - start
+        result = bench("ivf", ivf, queries, args.k, exact)
+        result["build_seconds"] = build_seconds
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -31,13 +31,90 @@ AGENT_CONFIG = {
 
 # Storage configurations
 STORAGE_CONFIG = {
-    "wardrobe_file": DATA_DIR / "user_wardrobes.json",
+    "database_file": DATA_DIR / "wardrobe.db",
+    "wardrobe_file": DATA_DIR / "user_wardrobes.json",  # legacy, migrated on first open
+    "pool_size": 8,  # pooled SQLite connections, also the async executor size
+    "feature_index_dir": DATA_DIR / "feature_index",  # per-user memory-mapped arrays
+    "write_behind": {
+        "enabled": os.getenv("WARDROBE_WRITE_BEHIND", "0") == "1",
+        "flush_interval": 1.0,  # seconds between batched flushes
+        "max_pending": 500  # flush early once this many mutations are queued
+    },
     "max_image_size": 5 * 1024 * 1024  # 5MB
 }
 
+# Analysis cache configurations
+CACHE_CONFIG = {
+    "analysis_db": DATA_DIR / "analysis_cache.db",
+    "max_entries": 50000,
+    "max_bytes": 256 * 1024 * 1024,  # 256MB of serialized results
+    "touch_interval": 60,  # seconds before a hit refreshes an entry's LRU time
+    "suggestion_ttl": 6 * 60 * 60,  # seconds an outfit suggestion stays valid
+    "suggestion_max_entries": 10000
+}
+
+# Outbound HTTP configurations (shared aiohttp session)
+HTTP_CONFIG = {
+    "limit": 100,  # open connections across all hosts
+    "limit_per_host": 10,
+    "keepalive_timeout": 30,
+    "total_timeout": 30,
+    "connect_timeout": 5,
+    "read_timeout": 15,
+    "retries": 2,  # extra attempts after the first
+    "backoff": 0.25,  # seconds, doubled on each retry
+    "chunk_size": 64 * 1024
+}
+
+# Generative model scheduling (rate limit, concurrency and micro-batching)
+MODEL_CONFIG = {
+    "requests_per_minute": 60,
+    "burst": 10,  # calls allowed back to back before the rate applies
+    "max_concurrency": 4,
+    "batch_window": 0.05,  # seconds to wait for more images to join a batch
+    "max_batch_size": 8,  # images per multimodal prompt
+    "prompt_max_per_category": 12,  # occasion matches sent per category
+    "prompt_min_per_category": 2  # kept even without a matching tag
+}
+
+# Background ingestion jobs (upload analysis and indexing)
+JOB_CONFIG = {
+    "workers": 4,  # jobs processed at once
+    "max_queued": 100,  # waiting jobs before uploads are refused with 429
+    "result_ttl": 15 * 60  # seconds a finished job's status stays queryable
+}
+
+# Bulk wardrobe imports (multipart batch, zip archive or manifest)
+BULK_IMPORT_CONFIG = {
+    "concurrency": 8,  # images decoded and analysed at once
+    "chunk_size": 200,  # items written per storage transaction
+    "max_errors": 50,  # per-image errors kept in the job result
+    # Files in one multipart import; larger imports go through a zip or a manifest
+    "max_files": 5000
+}
+
+# Matching-items search over wardrobe embeddings
+SIMILARITY_CONFIG = {
+    "color_weight": 1.0,
+    "tag_weight": 0.5,
+    "ivf_threshold": 20000,  # items from which search switches to an IVF index
+    "nprobe": 8,  # IVF cells scanned per query
+    # Share of rows added, changed or removed since the IVF cells were
+    # trained before they are trained again; until then rows join their
+    # nearest existing cell
+    "retrain_fraction": 0.2
+}
+
 # Image processing configurations
 IMAGE_CONFIG = {
+    "analysis_size": (150, 150),
     "thumbnail_size": (300, 300),
-    "allowed_extensions": {".jpg", ".jpeg", ".png", ".gif"},
-    "max_file_size": 5 * 1024 * 1024  # 5MB
+    "display_size": (1200, 1200),
+    "allowed_extensions": {".jpg", ".jpeg", ".png", ".gif", ".webp"},
+    # What the header must say, whatever the extension claims
+    "allowed_formats": {"JPEG", "PNG", "GIF", "WEBP", "MPO"},
+    "max_file_size": 5 * 1024 * 1024,  # 5MB
+    # Decompression-bomb guard: refuse before decoding past these
+    "max_pixels": 50_000_000,
+    "max_frames": 100
 } 
\ No newline at end of file
@@ -1,8 +1,22 @@
-from fastapi import FastAPI
+import asyncio
+import shutil
+import sys
+import zipfile
+from typing import Any, Dict
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from uagents import Bureau
-from agents.wardrobe_agent import WardrobeAgent
-from agents.suggestion_agent import SuggestionAgent
+from fastapi.responses import PlainTextResponse
+from config import BULK_IMPORT_CONFIG
+from utils.db_manager import close_db
+from utils.http_client import http_client
+from utils.suggestion_cache import suggestion_cache
+from utils.background_tasks import ingestion_queue
+from utils.metrics import REGISTRY
+from middleware.timing import timing_middleware
+from utils.error_handlers import QueueFullError, handle_error
+
+# uAgents, the Gemini SDK and the numpy/OpenCV feature stack are imported
+# by the first route that needs them rather than at startup
 
 app = FastAPI()
 
@@ -15,20 +29,167 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
-# Initialize agents
-bureau = Bureau()
-wardrobe_agent = WardrobeAgent(name="wardrobe_agent")
-suggestion_agent = SuggestionAgent(name="suggestion_agent", wardrobe_agent=wardrobe_agent)
+# Per-route latency histograms, scraped from /metrics
+app.middleware("http")(timing_middleware)
+
+_agents = None
+
+def get_agents():
+    """The (wardrobe, suggestion) agents, built and added to the bureau on first use"""
+    global _agents
+    if _agents is None:
+        from uagents import Bureau
+        from agents.wardrobe_agent import WardrobeAgent
+        from agents.suggestion_agent import SuggestionAgent
+
+        bureau = Bureau()
+        wardrobe_agent = WardrobeAgent(name="wardrobe_agent")
+        suggestion_agent = SuggestionAgent(name="suggestion_agent", wardrobe_agent=wardrobe_agent)
+        bureau.add(wardrobe_agent)
+        bureau.add(suggestion_agent)
+        _agents = (wardrobe_agent, suggestion_agent)
+    return _agents
+
+@app.on_event("startup")
+async def startup():
+    await http_client.start()
 
-# Add agents to bureau
-bureau.add(wardrobe_agent)
-bureau.add(suggestion_agent)
+@app.on_event("shutdown")
+async def shutdown():
+    await http_client.close()
+    await ingestion_queue.close()
+    await close_db()
+    # Nothing to close if no route ever loaded an index
+    if "utils.feature_index" in sys.modules:
+        sys.modules["utils.feature_index"].close_feature_indexes()
 
 # Basic routes
-@app.post("/api/wardrobe/upload")
+@app.post("/api/wardrobe/upload", status_code=202)
 async def upload_item(item_data: dict):
-    return await wardrobe_agent.add_item(None, item_data)
+    # Analysis and indexing run on the ingestion workers; poll the job
+    try:
+        wardrobe_agent, _ = get_agents()
+        job_id = ingestion_queue.submit(wardrobe_agent.ingest_item, item_data, kind="upload")
+    except QueueFullError as e:
+        raise handle_error(e)
+    return {"job_id": job_id, "status": "queued"}
+
+def _submit_import(func, *args) -> Dict[str, Any]:
+    wardrobe_agent, _ = get_agents()
+    try:
+        job_id = ingestion_queue.submit(
+            func, *args, analyze=wardrobe_agent.ai_services.analyze_style_bytes,
+            kind="import", report_progress=True
+        )
+    except QueueFullError as e:
+        raise handle_error(e)
+    return {"job_id": job_id, "status": "queued"}
+
+@app.post("/api/wardrobe/import", status_code=202)
+async def import_items(request: Request):
+    """Bulk import from a multipart batch of images and/or a zip archive.
+
+    Form fields: ``files`` (repeated, up to BULK_IMPORT_CONFIG["max_files"]),
+    ``archive``, ``user_id`` and ``category``. The body is streamed
+    straight to disk (``MultipartUpload``) instead of being parsed into
+    memory first; larger imports should send a zip or use the manifest
+    endpoint. Files that are not images count as failures in the job
+    summary, which GET /api/wardrobe/jobs/{id} reports with the progress.
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="Send images as multipart/form-data")
+    max_files = BULK_IMPORT_CONFIG["max_files"]
+    from utils.bulk_import import MultipartUpload, TooManyFilesError, import_directory
+    # Refuse before reading the body if there is no room for the job
+    try:
+        ingestion_queue.ensure_room()
+    except QueueFullError as e:
+        raise handle_error(e)
+
+    directory = import_directory()
+    try:
+        upload = MultipartUpload(directory, max_files)
+        await upload.receive(content_type, request.stream())
+        return _submit_upload(upload)
+    except TooManyFilesError as e:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise HTTPException(
+            status_code=413, detail=f"{e}; send a zip 'archive' or a manifest for more"
+        )
+    except ValueError as e:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+def _submit_upload(upload) -> Dict[str, Any]:
+    from utils.bulk_import import import_files, import_zip
+    user_id = upload.fields.get("user_id") or "default"
+    fields = {"category": upload.fields.get("category") or "others"}
+    calls = []
+    if upload.files or upload.rejected:
+        calls.append((import_files, user_id, upload.files, fields, upload.rejected))
+    if upload.archive is not None:
+        if not zipfile.is_zipfile(upload.archive):
+            raise ValueError("'archive' is not a zip file")
+        calls.append((import_zip, user_id, upload.archive, fields))
+    if not calls:
+        raise ValueError("Send images as 'files' or a zip as 'archive'")
+    # Nothing awaits between here and the submits, so they all fit
+    try:
+        ingestion_queue.ensure_room(len(calls))
+    except QueueFullError as e:
+        raise handle_error(e)
+    jobs = [_submit_import(*call) for call in calls]
+    return jobs[0] if len(jobs) == 1 else {"jobs": jobs}
+
+@app.post("/api/wardrobe/import/manifest", status_code=202)
+async def import_items_from_manifest(manifest: Dict[str, Any]):
+    """Bulk import images already in the upload directory.
+
+    Body: ``{"user_id": ..., "items": [{"path": ..., "category": ...}, ...]}``.
+    """
+    items = manifest.get("items") or []
+    if not all(isinstance(item, dict) and item.get("path") for item in items):
+        raise HTTPException(status_code=400, detail="Every manifest item needs a 'path'")
+    from utils.bulk_import import import_manifest
+    return _submit_import(import_manifest, manifest.get("user_id", "default"), items)
+
+@app.get("/api/wardrobe/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job: {job_id}")
+    return job
 
 @app.post("/api/suggest")
-async def get_suggestions(occasion: str):
-    return await suggestion_agent.suggest_outfit(None, occasion)
+async def get_suggestions(occasion: str, user_id: str = "default"):
+    _, suggestion_agent = get_agents()
+    return await suggestion_agent.suggest_outfit(None, occasion, user_id)
+
+@app.get("/api/suggest/local")
+async def get_local_suggestions(occasion: str, user_id: str = "default", k: int = 3):
+    # Ranked from the precomputed feature index; no images or model calls
+    from utils.feature_index import get_feature_index
+    from utils.outfit_engine import OutfitEngine
+    return OutfitEngine().rank_index(get_feature_index(user_id), occasion, k)
+
+@app.get("/api/wardrobe/matching")
+async def get_matching_items(item_id: str, user_id: str = "default", k: int = 10):
+    from utils.similarity_search import get_similarity_search
+    try:
+        # Updating the search after the wardrobe changed is CPU work
+        search = await asyncio.to_thread(get_similarity_search, user_id)
+        return search.matching_for_id(item_id, k)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Item not indexed: {item_id}")
+
+@app.get("/api/suggest/cache")
+async def get_suggestion_cache_stats():
+    return suggestion_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -1,10 +1,24 @@
-from fastapi import Request
 import time
-from utils.logger import logger
+from fastapi import Request
+from utils.metrics import REQUEST_SECONDS, error_counter
+
+HTTP_ERRORS = error_counter("http")
 
 async def timing_middleware(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    logger.info(f"Request to {request.url.path} took {process_time:.2f} seconds")
-    return response 
\ No newline at end of file
+    start_time = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    except Exception:
+        HTTP_ERRORS.inc()
+        raise
+    finally:
+        # The route template, not the raw path, keeps the label set bounded
+        route = request.scope.get("route")
+        REQUEST_SECONDS.labels(
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status
+        ).observe(time.perf_counter() - start_time)
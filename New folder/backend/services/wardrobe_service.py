@@ -1,11 +1,15 @@
+import asyncio
 from typing import Dict, List
-from utils.database import Database
-from utils.ai_services import AIServicesManager
+from utils.db_manager import get_wardrobe_store
+from utils.ai_services import AIServicesAgent
+from utils.suggestion_cache import normalize_occasion, suggestion_cache
+from utils.feature_index import get_feature_index
+from utils.similarity_search import matching_items_for
 
 class WardrobeService:
-    def __init__(self):
-        self.db = Database()
-        self.ai_services = AIServicesManager()
+    def __init__(self, ai_services: AIServicesAgent = None, db=None):
+        self.db = db or get_wardrobe_store()
+        self.ai_services = ai_services or AIServicesAgent(name="wardrobe_service")
     
     async def add_item(self, item: Dict, user_id: str) -> Dict:
         """Add item to user's wardrobe with AI analysis"""
@@ -19,22 +23,32 @@ class WardrobeService:
             enhanced_item = {
                 **item,
                 "style_analysis": style_analysis,
-                "recommendations": await self._generate_recommendations(style_analysis)
+                "recommendations": await self._generate_recommendations(
+                    style_analysis, {**item, "style_analysis": style_analysis}, user_id
+                )
             }
             
             # Save to database
             await self.db.update_user_wardrobe(user_id, {
                 item["category"]: enhanced_item
             })
+            await asyncio.to_thread(get_feature_index(user_id).add_item, enhanced_item)
+            suggestion_cache.invalidate_user(user_id)
             
             return enhanced_item
             
         except Exception as e:
             raise Exception(f"Failed to add item: {str(e)}")
     
-    async def _generate_recommendations(self, style_analysis: Dict) -> Dict:
+    async def _generate_recommendations(self, style_analysis: Dict, item: Dict, user_id: str) -> Dict:
         """Generate initial recommendations for the item"""
         return {
-            "matching_items": await self.ai_services.get_matching_items(style_analysis),
-            "occasions": await self.ai_services.suggest_occasions(style_analysis)
+            # Local k-NN over the user's feature index, no model round-trip
+            "matching_items": await asyncio.to_thread(matching_items_for, user_id, item),
+            # From the item's own tags and the analysed style category
+            "occasions": sorted({
+                normalize_occasion(str(tag))
+                for tag in (item.get("occasion_tags") or []) + [style_analysis.get("style_category") or ""]
+                if str(tag).strip()
+            })
         } 
\ No newline at end of file
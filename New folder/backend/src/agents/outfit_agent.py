@@ -1,18 +1,40 @@
+from __future__ import annotations
+
 import sys
 import json
 import logging
 import os
 from dotenv import load_dotenv
-import numpy as np
-from PIL import Image
-import requests
 from io import BytesIO
 import base64
 import time
-from typing import List, Dict
-import cv2
+from typing import List, Dict, Optional, Tuple
+import hashlib
 from collections import defaultdict
-from sklearn.cluster import KMeans
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+# Shared backend utilities (utils/) live next to src/
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(1, BACKEND_DIR)
+
+from utils.analysis_cache import AnalysisCache, image_digest
+from utils.preview_cache import PreviewCache, preview_key
+from utils.metrics import REGISTRY, error_counter, stage_timer
+from utils.lazy_import import lazy_import
+from utils import uploads
+from config import IMAGE_CONFIG
+
+# The vision stack loads on first use, so text-only requests never import it
+np = lazy_import('numpy')
+cv2 = lazy_import('cv2')
+Image = lazy_import('PIL.Image')
+requests = lazy_import('requests')
+color_extraction = lazy_import('utils.color_extraction')
+derivatives = lazy_import('utils.derivatives')
+image_probe = lazy_import('utils.image_probe')
+outfit_engine = lazy_import('utils.outfit_engine')
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -21,8 +43,202 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Parallel analysis settings
+FETCH_WORKERS = int(os.getenv('OUTFIT_FETCH_WORKERS', '8'))
+ANALYSIS_WORKERS = int(os.getenv('OUTFIT_ANALYSIS_WORKERS', str(min(os.cpu_count() or 1, 4))))
+IMAGE_TIMEOUT = float(os.getenv('OUTFIT_IMAGE_TIMEOUT', '15'))
+# None means utils.color_extraction.DEFAULT_BACKEND
+COLOR_BACKEND = os.getenv('OUTFIT_COLOR_BACKEND')
+
+# Bump CLASSIFIER_VERSION whenever extract_colors changes its output
+CLASSIFIER_VERSION = '3'
+ANALYSIS_CACHE_ENABLED = os.getenv('OUTFIT_ANALYSIS_CACHE', '1') == '1'
+
+# Outfits ranked locally per request
+OUTFIT_TOP_K = int(os.getenv('OUTFIT_TOP_K', '3'))
+
+# Decoded preview thumbnails kept per request, shared with the preview step
+PREVIEW_THUMBNAIL_SIZE = IMAGE_CONFIG['thumbnail_size']
+ANALYSIS_SIZE = IMAGE_CONFIG['analysis_size']
+MAX_IMAGE_BYTES = IMAGE_CONFIG['max_file_size']
+FETCH_CHUNK_SIZE = 64 * 1024
+IMAGE_STORE_MAX_BYTES = int(os.getenv('OUTFIT_IMAGE_STORE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Preview delivery: 'inline' data URI, 'file' URL under /uploads/previews
+# (written to disk, opt-in), or 'none'
+PREVIEW_MODE = os.getenv('OUTFIT_PREVIEW_MODE', 'inline')
+PREVIEW_FORMAT = os.getenv('OUTFIT_PREVIEW_FORMAT', 'jpeg')
+PREVIEW_QUALITY = int(os.getenv('OUTFIT_PREVIEW_QUALITY', '85'))
+PREVIEW_URL_PREFIX = '/api/outfits/previews/'
+PREVIEW_RETENTION_SECONDS = float(os.getenv('OUTFIT_PREVIEW_RETENTION_HOURS', '24')) * 3600
+PREVIEW_MAX_FILES = int(os.getenv('OUTFIT_PREVIEW_MAX_FILES', '500'))
+# Bump when render_outfit_preview changes what it draws
+PREVIEW_LAYOUT_VERSION = '1'
+PREVIEW_CACHE_MAX_BYTES = int(os.getenv('OUTFIT_PREVIEW_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+# Keep encoded previews on disk even in inline mode
+PREVIEW_DISK_CACHE = os.getenv('OUTFIT_PREVIEW_DISK_CACHE', '0') == '1'
+PREVIEW_ENCODINGS = {
+    'jpeg': ('.jpg', 'image/jpeg', 'IMWRITE_JPEG_QUALITY'),
+    'webp': ('.webp', 'image/webp', 'IMWRITE_WEBP_QUALITY'),
+}
+
+# Stage timers and error counters, bound once; the worker reports them to
+# Node with every response
+FETCH_TIMER = stage_timer('fetch')
+DECODE_TIMER = stage_timer('decode')
+COLOR_TIMER = stage_timer('color_extraction')
+DERIVATIVES_TIMER = stage_timer('derivatives')
+CLASSIFY_TIMER = stage_timer('classification')
+RENDER_TIMER = stage_timer('preview_render')
+ENCODE_TIMER = stage_timer('preview_encode')
+BASE64_TIMER = stage_timer('base64_encode')
+ANALYSIS_ERRORS = error_counter('analysis')
+PREVIEW_ERRORS = error_counter('preview')
+REQUEST_ERRORS = error_counter('request')
+
+FALLBACK_ANALYSIS = {
+    'category': 'others',
+    'confidence': 0.3,
+    'colors': ['#000000'],
+    'size': {'width': 0, 'height': 0}
+}
+
+class ImageStore:
+    """Per-request store of preview images keyed by image URL.
+
+    Holds either the preview-sized RGB array decoded during analysis or, for
+    analysis cache hits that skipped decoding, the downloaded bytes. The
+    full-resolution decode is never kept. Once ``max_bytes`` is reached
+    further images are not stored and the preview falls back to downloading
+    them.
+    """
+
+    def __init__(self, max_bytes: int = IMAGE_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self._images = {}
+        # Uploads found on disk, so the preview never fetches them over HTTP
+        self._paths = {}
+
+    def put(self, image_url: str, image) -> bool:
+        if image_url in self._images:
+            return True
+        size = image.nbytes if isinstance(image, np.ndarray) else len(image)
+        if self.used_bytes + size > self.max_bytes:
+            logger.info(f"Image store full, not keeping {image_url}")
+            return False
+        self._images[image_url] = image
+        self.used_bytes += size
+        return True
+
+    def get(self, image_url: str):
+        return self._images.get(image_url)
+
+    def put_path(self, image_url: str, path: str):
+        self._paths[image_url] = path
+
+    def get_path(self, image_url: str) -> Optional[str]:
+        return self._paths.get(image_url)
+
+    def clear(self):
+        self._images.clear()
+        self._paths.clear()
+        self.used_bytes = 0
+
+def extract_colors(image_bytes: bytes) -> Dict:
+    """Decode an image and extract its dominant colors.
+
+    JPEGs are decoded straight at preview scale, which also yields the
+    preview thumbnail, so the preview never has to download or decode the
+    image again. Colours come from the analysis-size copy, the same one the
+    upload derivatives store. Module-level so it can run inside the
+    analysis process pool.
+    """
+    start = time.perf_counter()
+    # Oversized or disallowed images are refused from their header alone;
+    # the header also knows the original size after a reduced decode
+    info = image_probe.validate_image(image_bytes)
+    img = derivatives.open_scaled(BytesIO(image_bytes), PREVIEW_THUMBNAIL_SIZE)
+    width, height = info.width, info.height
+
+    img.thumbnail(PREVIEW_THUMBNAIL_SIZE, Image.LANCZOS)
+    thumbnail = np.array(img)
+    decoded = time.perf_counter()
+    img.thumbnail(ANALYSIS_SIZE, Image.LANCZOS)
+    colors = color_extraction.extract_palette(
+        np.array(img), n_colors=3, backend=COLOR_BACKEND or color_extraction.DEFAULT_BACKEND
+    )
+
+    return {
+        'colors': [f'rgb({r},{g},{b})' for r,g,b in colors],
+        'size': {'width': width, 'height': height},
+        'thumbnail': thumbnail,
+        # Recorded by the caller, since this may run in a pool process
+        'timings': (decoded - start, time.perf_counter() - decoded)
+    }
+
+def _record_timings(features: Dict):
+    timings = features.pop('timings', None)
+    if timings is not None:
+        DECODE_TIMER.observe(timings[0])
+        COLOR_TIMER.observe(timings[1])
+
+def _remaining(deadline: float) -> float:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Image deadline passed")
+    return remaining
+
+def fetch_image_bytes(image_url: str, session=None, timeout: float = IMAGE_TIMEOUT,
+                      deadline: Optional[float] = None) -> bytes:
+    """Download an image, refusing bodies over MAX_IMAGE_BYTES.
+
+    The limit is checked against Content-Length or, failing that, while
+    streaming, so an oversized body is never buffered whole. The whole
+    download must finish by ``deadline`` (``timeout`` from now by
+    default), not just each socket read, so a slow trickle cannot hold a
+    fetch thread past it.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + timeout
+    get = session.get if session is not None else requests.get
+    with get(image_url, timeout=min(timeout, _remaining(deadline)), stream=True) as response:
+        response.raise_for_status()
+        length = response.headers.get('Content-Length')
+        if length is not None and int(length) > MAX_IMAGE_BYTES:
+            raise ValueError(f"Image is {length} bytes, over the {MAX_IMAGE_BYTES} byte limit")
+        body = bytearray()
+        # read1 returns whatever has arrived, so the deadline is checked
+        # between reads instead of after a full chunk has trickled in
+        while True:
+            chunk = response.raw.read1(FETCH_CHUNK_SIZE, decode_content=True)
+            if not chunk:
+                break
+            body.extend(chunk)
+            if len(body) > MAX_IMAGE_BYTES:
+                raise ValueError(f"Image is over the {MAX_IMAGE_BYTES} byte limit")
+            _remaining(deadline)
+        return bytes(body)
+
+def get_upload_dir() -> str:
+    return os.path.join(BACKEND_DIR, 'uploads')
+
+def upload_path(path: Optional[str]) -> Optional[str]:
+    """``path`` resolved if it is an existing file inside the upload directory"""
+    return uploads.upload_path(path, get_upload_dir())
+
+def local_image_path(image_url: str) -> Optional[str]:
+    """The upload a local path or ``file://`` URI names; None for http(s) URLs.
+
+    Raises ValueError for local references outside the upload directory.
+    """
+    return uploads.local_upload(image_url, get_upload_dir())
+
 class ClothingClassifier:
-    def __init__(self):
+    def __init__(self, fetch_workers: int = FETCH_WORKERS,
+                 analysis_workers: int = ANALYSIS_WORKERS,
+                 image_timeout: float = IMAGE_TIMEOUT,
+                 analysis_cache: AnalysisCache = None):
         self.clothing_categories = {
             'tops': [
                 'shirt', 't-shirt', 'blouse', 'top', 'sweater', 'sweatshirt',
@@ -43,66 +259,267 @@ class ClothingClassifier:
                 'jacket', 'coat', 'blazer', 'vest', 'hoodie'
             ]
         }
+        self.fetch_workers = max(1, fetch_workers)
+        self.analysis_workers = max(1, analysis_workers)
+        self.image_timeout = image_timeout
+
+        # Colour/size features keyed by image hash, shared across processes
+        if analysis_cache is None and ANALYSIS_CACHE_ENABLED:
+            analysis_cache = AnalysisCache(
+                'vision', f'{CLASSIFIER_VERSION}:{COLOR_BACKEND or color_extraction.DEFAULT_BACKEND}'
+            )
+        self.analysis_cache = analysis_cache
+
+        # Pools and the HTTP session are created on first use and then kept
+        # warm for the lifetime of the classifier
+        self._session = None
+        self._fetch_pool = None
+        self._analysis_pool = None
+
+    @property
+    def session(self) -> requests.Session:
+        """Shared keep-alive session sized to the fetch pool"""
+        if self._session is None:
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=self.fetch_workers,
+                pool_maxsize=self.fetch_workers
+            )
+            self._session = requests.Session()
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+        return self._session
+
+    @property
+    def fetch_pool(self) -> ThreadPoolExecutor:
+        if self._fetch_pool is None:
+            self._fetch_pool = ThreadPoolExecutor(
+                max_workers=self.fetch_workers,
+                thread_name_prefix='image-fetch'
+            )
+        return self._fetch_pool
+
+    @property
+    def analysis_pool(self) -> ProcessPoolExecutor:
+        if self._analysis_pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            import multiprocessing
+            # spawn keeps the children clear of locks held by the fetch threads
+            self._analysis_pool = ProcessPoolExecutor(
+                max_workers=self.analysis_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._analysis_pool
+
+    def warm_up(self):
+        """Start the analysis processes before the first request needs them.
+
+        Spawned children import the vision stack on first use, which would
+        otherwise be charged against the first batch's per-image timeouts.
+        """
+        buffer = BytesIO()
+        Image.new('RGB', (8, 8), (255, 255, 255)).save(buffer, format='PNG')
+        sample = buffer.getvalue()
+        futures = [self.analysis_pool.submit(extract_colors, sample)
+                   for _ in range(self.analysis_workers)]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        """Release the pools and the HTTP session"""
+        if self._fetch_pool is not None:
+            self._fetch_pool.shutdown(wait=False, cancel_futures=True)
+            self._fetch_pool = None
+        if self._analysis_pool is not None:
+            self._analysis_pool.shutdown(wait=False, cancel_futures=True)
+            self._analysis_pool = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        if self.analysis_cache is not None:
+            logger.info(f"Analysis cache stats: {self.analysis_cache.stats()}")
+
+    def fetch_image(self, image_url: str, deadline: Optional[float] = None) -> bytes:
+        """Download raw image bytes over the shared session"""
+        with FETCH_TIMER.time():
+            return fetch_image_bytes(image_url, self.session, self.image_timeout, deadline)
+
+    def classify(self, image_url: str, size: Dict) -> Dict:
+        """Determine category based on filename and aspect ratio"""
+        filename = image_url.lower()
+        category = 'others'
+        confidence = 0.5
+
+        # Try to classify based on filename
+        for cat, keywords in self.clothing_categories.items():
+            if any(keyword in filename for keyword in keywords):
+                category = cat
+                confidence = 0.8
+                break
 
-    def analyze_image(self, image_url: str) -> Dict:
+        # If no category found, use aspect ratio
+        if category == 'others':
+            aspect_ratio = size['width'] / size['height']
+            if aspect_ratio < 0.8:  # Tall
+                category = 'bottoms'
+            elif aspect_ratio > 1.5:  # Wide
+                category = 'outerwear'
+            else:  # Square-ish
+                category = 'tops'
+
+        return {'category': category, 'confidence': confidence}
+
+    def analyze_image(self, image_url: str, image_store: ImageStore = None,
+                      local_path: str = None) -> Dict:
         """Analyze image using computer vision"""
         try:
-            logger.info(f"Analyzing image: {image_url}")
-            
-            # Download and process image
-            response = requests.get(image_url)
-            img = Image.open(BytesIO(response.content))
-            img = img.convert('RGB')
-            img_array = np.array(img)
-            
-            # Get image properties
-            height, width = img_array.shape[:2]
-            aspect_ratio = width / height
-            
-            # Get dominant colors
-            resized = cv2.resize(img_array, (150, 150))
-            pixels = resized.reshape(-1, 3)
-            kmeans = KMeans(n_clusters=3, n_init=10)
-            kmeans.fit(pixels)
-            colors = kmeans.cluster_centers_.astype(int)
-            
-            # Determine category based on filename and aspect ratio
-            filename = image_url.lower()
-            category = 'others'
-            confidence = 0.5
-
-            # Try to classify based on filename
-            for cat, keywords in self.clothing_categories.items():
-                if any(keyword in filename for keyword in keywords):
-                    category = cat
-                    confidence = 0.8
-                    break
-
-            # If no category found, use aspect ratio
-            if category == 'others':
-                if aspect_ratio < 0.8:  # Tall
-                    category = 'bottoms'
-                elif aspect_ratio > 1.5:  # Wide
-                    category = 'outerwear'
-                else:  # Square-ish
-                    category = 'tops'
-
-            logger.info(f"Classified as {category} with confidence {confidence}")
-            return {
-                'category': category,
-                'confidence': confidence,
-                'colors': [f'rgb({r},{g},{b})' for r,g,b in colors],
-                'size': {'width': width, 'height': height}
-            }
+            logger.debug("Analyzing image: %s", image_url)
+            features = self._load_and_extract(image_url, local_path, False,
+                                              time.monotonic() + self.image_timeout)
+            return self._build_analysis(image_url, features, image_store)
 
         except Exception as e:
+            ANALYSIS_ERRORS.inc()
             logger.error(f"Error analyzing image: {str(e)}")
-            return {
-                'category': 'others',
-                'confidence': 0.3,
-                'colors': ['#000000'],
-                'size': {'width': 0, 'height': 0}
-            }
+            return dict(FALLBACK_ANALYSIS)
+
+    def analyze_images(self, image_urls: List[str], image_store: ImageStore = None,
+                       local_paths: List[Optional[str]] = None) -> List[Dict]:
+        """Analyze a batch of images concurrently, keeping input order.
+
+        Downloads overlap on the fetch thread pool and colour extraction runs
+        on the analysis process pool. Every image gets its own deadline, so a
+        slow URL only costs its own slot in the batch. ``local_paths``, aligned
+        with ``image_urls``, points at uploads on this machine; those are read
+        from their stored derivatives instead of being downloaded.
+        """
+        local_paths = list(local_paths or [])
+        local_paths += [None] * (len(image_urls) - len(local_paths))
+        if len(image_urls) <= 1:
+            return [self.analyze_image(url, image_store, path)
+                    for url, path in zip(image_urls, local_paths)]
+
+        deadlines = []
+        futures = []
+        for image_url, local_path in zip(image_urls, local_paths):
+            deadlines.append(time.monotonic() + self.image_timeout)
+            futures.append(self.fetch_pool.submit(
+                self._load_and_extract, image_url, local_path, True, deadlines[-1]
+            ))
+
+        analyses = []
+        for image_url, future, deadline in zip(image_urls, futures, deadlines):
+            try:
+                features = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                analyses.append(self._build_analysis(image_url, features, image_store))
+            except FutureTimeoutError:
+                future.cancel()
+                ANALYSIS_ERRORS.inc()
+                logger.error(f"Timed out analyzing image: {image_url}")
+                analyses.append(dict(FALLBACK_ANALYSIS))
+            except Exception as e:
+                ANALYSIS_ERRORS.inc()
+                logger.error(f"Error analyzing image {image_url}: {str(e)}")
+                analyses.append(dict(FALLBACK_ANALYSIS))
+        return analyses
+
+    def _load_and_extract(self, image_url: str, local_path: Optional[str], use_pool: bool,
+                          deadline: float) -> Dict:
+        """Features for one image, given up (TimeoutError) at ``deadline``.
+
+        The fetch thread running this stops waiting at the deadline as well,
+        so a timed-out image does not keep holding it.
+        """
+        # Uploads on this machine are read from disk; only remote URLs are fetched
+        path = upload_path(local_path) or local_image_path(image_url)
+        if path is not None:
+            return self._extract_upload(path, use_pool, deadline)
+        return self._extract(self.fetch_image(image_url, deadline), use_pool, deadline)
+
+    def _extract_colors(self, image_bytes: bytes, use_pool: bool, deadline: float) -> Dict:
+        _remaining(deadline)
+        if not use_pool:
+            return extract_colors(image_bytes)
+        future = self.analysis_pool.submit(extract_colors, image_bytes)
+        try:
+            return future.result(timeout=_remaining(deadline))
+        except FutureTimeoutError:
+            # Frees the pool slot unless the decode already started
+            future.cancel()
+            raise
+
+    def _extract_upload(self, path: str, use_pool: bool, deadline: float) -> Dict:
+        """Features of a local upload, read from its derivatives.
+
+        The derivatives are made on first sight of the upload; afterwards
+        neither the original nor anything larger than the thumbnail is read.
+        """
+        with DERIVATIVES_TIMER.time():
+            stored = derivatives.ensure_derivatives(path)
+        meta = stored['meta']
+        digest = meta['digest']
+        thumbnail_bytes = uploads.read_upload(str(stored['thumbnail']))
+        if self.analysis_cache is not None:
+            cached = self.analysis_cache.get(digest)
+            if cached is not None:
+                return {**cached, 'digest': digest, 'image_bytes': thumbnail_bytes, 'path': path}
+
+        analysis_bytes = uploads.read_upload(str(stored['analysis']))
+        features = self._extract_colors(analysis_bytes, use_pool, deadline)
+        _record_timings(features)
+        features = {
+            'colors': features['colors'],
+            'size': {'width': meta['width'], 'height': meta['height']}
+        }
+        if self.analysis_cache is not None:
+            self.analysis_cache.put(digest, features)
+        # The preview decodes the stored thumbnail
+        return {**features, 'digest': digest, 'image_bytes': thumbnail_bytes, 'path': path}
+
+    def _extract(self, image_bytes: bytes, use_pool: bool, deadline: float) -> Dict:
+        """Colour/size features for downloaded bytes, via the analysis cache"""
+        # The content hash also keys the preview cache, so always compute it
+        digest = image_digest(image_bytes)
+        if self.analysis_cache is not None:
+            cached = self.analysis_cache.get(digest)
+            if cached is not None:
+                # Nothing was decoded; the preview decodes these bytes instead
+                return {**cached, 'digest': digest, 'image_bytes': image_bytes}
+
+        features = self._extract_colors(image_bytes, use_pool, deadline)
+        _record_timings(features)
+
+        if self.analysis_cache is not None:
+            self.analysis_cache.put(digest, {
+                'colors': features['colors'],
+                'size': features['size']
+            })
+        return {**features, 'digest': digest}
+
+    def _build_analysis(self, image_url: str, features: Dict, image_store: ImageStore = None) -> Dict:
+        # The category depends on the URL, so only colours and size come
+        # from the cache and classification always runs
+        preview_image = features.pop('thumbnail', None)
+        image_bytes = features.pop('image_bytes', None)
+        path = features.pop('path', None)
+        if preview_image is None:
+            preview_image = image_bytes
+        if image_store is not None:
+            if preview_image is not None:
+                image_store.put(image_url, preview_image)
+            if path is not None:
+                image_store.put_path(image_url, path)
+
+        with CLASSIFY_TIMER.time():
+            classification = self.classify(image_url, features['size'])
+        logger.debug("Classified as %s with confidence %s",
+                     classification['category'], classification['confidence'])
+        return {
+            'category': classification['category'],
+            'confidence': classification['confidence'],
+            'colors': features['colors'],
+            'size': features['size'],
+            'digest': features['digest']
+        }
 
 def get_outfit_suggestions(prompt: str) -> Dict:
     """Generate outfit suggestions based on prompt"""
@@ -149,135 +566,294 @@ def get_outfit_suggestions(prompt: str) -> Dict:
             'avoid': []
         }
 
-def process_request(request_data: dict):
+def process_request(request_data: dict, classifier: ClothingClassifier = None):
     try:
         # Get prompt and images
         prompt = request_data.get('preferences', {}).get('prompt', '')
         images = request_data.get('images', [])
+        # Local paths of uploaded images, aligned with ``images``
+        paths = request_data.get('paths') or []
         
-        logger.info(f"Processing request with prompt: {prompt}")
-        logger.info(f"Number of images: {len(images)}")
-        
-        # Initialize classifier
-        classifier = ClothingClassifier()
+        logger.debug("Processing request with prompt %r and %d images", prompt, len(images))
         
-        # Process images
+        # Process images; decoded thumbnails are kept for the preview only
+        image_store = ImageStore()
         wardrobe = defaultdict(list)
-        for image_url in images:
-            analysis = classifier.analyze_image(image_url)
+        analyses = []
+        if images:
+            # Worker mode passes in its warm instance; text-only requests
+            # never build one, so they never load the vision stack
+            owns_classifier = classifier is None
+            if owns_classifier:
+                classifier = ClothingClassifier()
+            try:
+                analyses = classifier.analyze_images(images, image_store, paths)
+            finally:
+                if owns_classifier:
+                    classifier.close()
+        for image_url, analysis in zip(images, analyses):
             wardrobe[analysis['category']].append({
                 'url': image_url,
                 'type': analysis['category'],
                 'colors': analysis['colors'],
-                'confidence': analysis['confidence']
+                'confidence': analysis['confidence'],
+                'hash': analysis.get('digest')
             })
-            logger.info(f"Classified {image_url} as {analysis['category']}")
+            logger.debug("Classified %s as %s", image_url, analysis['category'])
         
         # Get suggestions
         suggestions = get_outfit_suggestions(prompt)
+        ranked_outfits = outfit_engine.rank_outfits(wardrobe, prompt, k=OUTFIT_TOP_K) if wardrobe else []
         
-        # Create outfit preview
-        preview_url = create_outfit_preview(wardrobe) if wardrobe else None
+        # Create outfit preview. Images analysis could not read (or refused)
+        # have no digest and are left out, so they are never decoded here
+        previewable = {
+            category: [item for item in items if item['hash']]
+            for category, items in wardrobe.items()
+        }
+        previewable = {category: items for category, items in previewable.items() if items}
+        preview_url = create_outfit_preview(previewable, image_store) if previewable else None
+        image_store.clear()
         
         result = [{
             'wardrobe_items': dict(wardrobe),
             'suggestions': suggestions,
+            'ranked_outfits': ranked_outfits,
             'outfit_preview': preview_url
         }]
         
-        logger.info(f"Processed wardrobe items: {dict(wardrobe)}")
+        logger.debug("Processed wardrobe items: %s", dict(wardrobe))
         return result
 
     except Exception as e:
+        REQUEST_ERRORS.inc()
         logger.error(f"Error in process_request: {str(e)}")
         return [{"error": str(e)}]
 
-def create_outfit_preview(wardrobe_items: dict) -> str:
-    """Create a visual preview of the outfit combination"""
-    try:
-        # Create a white canvas
-        canvas_height = 1000
-        canvas_width = 800
-        canvas = np.ones((canvas_height, canvas_width, 3), dtype=np.uint8) * 255
-
-        # Define positions for different clothing types
-        positions = {
-            'tops': (400, 200),      # Top center
-            'bottoms': (400, 500),   # Middle
-            'shoes': (400, 800),     # Bottom
-            'accessories': (650, 400),# Right side
-            'outerwear': (150, 400), # Left side
-            'others': (650, 600)     # Bottom right
-        }
+def _open_preview_image(image_url: str, image_bytes: Optional[bytes], image_store: ImageStore = None):
+    """Decode an item the image store holds no array for, as RGB.
 
-        # Place each clothing item on the canvas
-        for category, items in wardrobe_items.items():
-            if not items:
-                continue
+    Uses the stored bytes if any, else the smallest stored copy of a local
+    upload (mapped, not read through HTTP), else downloads the URL with
+    the same size cap and timeout as analysis. Bytes are validated from
+    their header before a reduced-scale decode.
+    """
+    if image_bytes is None:
+        path = image_store.get_path(image_url) if image_store is not None else None
+        path = path or local_image_path(image_url)
+        if path is not None:
+            source = derivatives.smallest_derivative(path, PREVIEW_THUMBNAIL_SIZE)
+            image_bytes = uploads.read_upload(str(source))
+        else:
+            image_bytes = fetch_image_bytes(image_url)
+    image_probe.validate_image(image_bytes)
+    return derivatives.open_scaled(BytesIO(image_bytes), PREVIEW_THUMBNAIL_SIZE)
 
-            position = positions.get(category, positions['others'])
-            for idx, item in enumerate(items):
-                try:
-                    image_url = item.get('url')
-                    if not image_url:
-                        continue
-
-                    # Download and process image
-                    response = requests.get(image_url)
-                    img = Image.open(BytesIO(response.content))
-                    img = img.convert('RGB')
-                    img.thumbnail((300, 300))
-                    img_array = np.array(img)
+def render_outfit_preview(wardrobe_items: dict, image_store: ImageStore = None) -> np.ndarray:
+    """Compose the outfit preview canvas as an RGB array"""
+    # Create a white canvas
+    canvas_height = 1000
+    canvas_width = 800
+    canvas = np.ones((canvas_height, canvas_width, 3), dtype=np.uint8) * 255
+
+    # Define positions for different clothing types
+    positions = {
+        'tops': (400, 200),      # Top center
+        'bottoms': (400, 500),   # Middle
+        'shoes': (400, 800),     # Bottom
+        'accessories': (650, 400),# Right side
+        'outerwear': (150, 400), # Left side
+        'others': (650, 600)     # Bottom right
+    }
 
-                    # Calculate position
-                    h, w = img_array.shape[:2]
-                    x, y = position
-                    if idx > 0:
-                        x += (idx * 50)
-                    
-                    y1 = max(0, min(y - h//2, canvas_height - h))
-                    y2 = y1 + h
-                    x1 = max(0, min(x - w//2, canvas_width - w))
-                    x2 = x1 + w
-
-                    # Place image on canvas
-                    canvas[y1:y2, x1:x2] = img_array
-
-                    # Add label
-                    font = cv2.FONT_HERSHEY_SIMPLEX
-                    cv2.putText(canvas,
-                              category.upper(),
-                              (x1, y1-10),
-                              font,
-                              0.5,
-                              (0, 0, 0),
-                              2)
-
-                except Exception as e:
-                    logger.error(f"Error processing image {image_url}: {str(e)}")
+    # Place each clothing item on the canvas
+    for category, items in wardrobe_items.items():
+        if not items:
+            continue
+
+        position = positions.get(category, positions['others'])
+        for idx, item in enumerate(items):
+            try:
+                image_url = item.get('url')
+                if not image_url:
                     continue
 
-        # Save preview
-        preview_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'uploads', 'previews')
-        os.makedirs(preview_dir, exist_ok=True)
-        
-        timestamp = int(time.time() * 1000)
-        preview_path = os.path.join(preview_dir, f'outfit_preview_{timestamp}.jpg')
-        
-        cv2.imwrite(preview_path, cv2.cvtColor(canvas, cv2.COLOR_RGB2BGR))
+                # Reuse what analysis already fetched or decoded
+                img_array = image_store.get(image_url) if image_store is not None else None
+                if not isinstance(img_array, np.ndarray):
+                    img = _open_preview_image(image_url, img_array, image_store)
+                    img.thumbnail(PREVIEW_THUMBNAIL_SIZE)
+                    img_array = np.array(img)
+
+                # Calculate position
+                h, w = img_array.shape[:2]
+                x, y = position
+                if idx > 0:
+                    x += (idx * 50)
+                
+                y1 = max(0, min(y - h//2, canvas_height - h))
+                y2 = y1 + h
+                x1 = max(0, min(x - w//2, canvas_width - w))
+                x2 = x1 + w
 
-        # Convert to base64
-        with open(preview_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            return f"data:image/jpeg;base64,{encoded_string}"
+                # Place image on canvas
+                canvas[y1:y2, x1:x2] = img_array
+
+                # Add label
+                font = cv2.FONT_HERSHEY_SIMPLEX
+                cv2.putText(canvas,
+                          category.upper(),
+                          (x1, y1-10),
+                          font,
+                          0.5,
+                          (0, 0, 0),
+                          2)
+
+            except Exception as e:
+                logger.error(f"Error processing image {image_url}: {str(e)}")
+                continue
+
+    return canvas
+
+def encode_preview(canvas: np.ndarray, fmt: str = PREVIEW_FORMAT, quality: int = PREVIEW_QUALITY) -> Tuple[bytes, str]:
+    """Encode a preview canvas in memory; returns the bytes and MIME type"""
+    extension, mime_type, quality_flag = PREVIEW_ENCODINGS[fmt]
+    ok, buffer = cv2.imencode(extension, cv2.cvtColor(canvas, cv2.COLOR_RGB2BGR),
+                              [getattr(cv2, quality_flag), quality])
+    if not ok:
+        raise ValueError(f"Could not encode preview as {fmt}")
+    return buffer.tobytes(), mime_type
+
+def get_preview_dir() -> str:
+    return os.path.join(BACKEND_DIR, 'uploads', 'previews')
+
+def preview_path(key: str, fmt: str = PREVIEW_FORMAT) -> str:
+    return os.path.join(get_preview_dir(), f"outfit_preview_{key}{PREVIEW_ENCODINGS[fmt][0]}")
+
+def cleanup_previews(preview_dir: str = None, max_age: float = PREVIEW_RETENTION_SECONDS,
+                     max_files: int = PREVIEW_MAX_FILES) -> int:
+    """Delete previews older than ``max_age`` seconds, then the oldest beyond ``max_files``"""
+    preview_dir = preview_dir or get_preview_dir()
+    if not os.path.isdir(preview_dir):
+        return 0
+    previews = []
+    for entry in os.scandir(preview_dir):
+        if entry.is_file() and entry.name.startswith('outfit_preview_'):
+            previews.append((entry.stat().st_mtime, entry.path))
+    previews.sort(reverse=True)
+
+    now = time.time()
+    removed = 0
+    for position, (mtime, path) in enumerate(previews):
+        if position >= max_files or now - mtime > max_age:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+def _item_hash(item: dict) -> str:
+    # Content hash from analysis; the URL stands in when analysis failed
+    return item.get('hash') or hashlib.sha256(item.get('url', '').encode('utf-8')).hexdigest()
+
+def create_outfit_preview(wardrobe_items: dict, image_store: ImageStore = None, mode: str = None) -> Optional[str]:
+    """Create a visual preview of the outfit combination.
+
+    Returns a data URI (``inline``), a ``/api/outfits/previews/<key>`` URL
+    (``file``), or None (``none``). Previews are cached under a key made
+    of the item hashes and the layout version, in memory and, in ``file``
+    mode or with OUTFIT_PREVIEW_DISK_CACHE, on disk, so a repeated item
+    combination is neither rendered nor encoded again.
+    """
+    mode = mode or PREVIEW_MODE
+    if mode == 'none':
+        return None
+    try:
+        # A fixed item order makes the layout a function of the item set
+        ordered = {
+            category: sorted(items, key=_item_hash)
+            for category, items in wardrobe_items.items() if items
+        }
+        key = preview_key(
+            [(category, _item_hash(item)) for category, items in ordered.items() for item in items],
+            PREVIEW_LAYOUT_VERSION,
+            f"{PREVIEW_FORMAT}:{PREVIEW_QUALITY}"
+        )
+        disk_path = preview_path(key) if mode == 'file' or PREVIEW_DISK_CACHE else None
+
+        data = preview_cache.get(key, disk_path)
+        rendered = data is None
+        if rendered:
+            with RENDER_TIMER.time():
+                canvas = render_outfit_preview(ordered, image_store)
+            with ENCODE_TIMER.time():
+                data, _ = encode_preview(canvas)
+        # A memory hit may still be missing from disk (e.g. first seen inline)
+        if rendered or (disk_path is not None and not os.path.exists(disk_path)):
+            preview_cache.put(key, data, disk_path)
+            if disk_path is not None:
+                cleanup_previews()
+
+        if mode == 'file':
+            return PREVIEW_URL_PREFIX + key
+        mime_type = PREVIEW_ENCODINGS[PREVIEW_FORMAT][1]
+        with BASE64_TIMER.time():
+            return f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
 
     except Exception as e:
+        PREVIEW_ERRORS.inc()
         logger.error(f"Error creating outfit preview: {str(e)}")
         return None
 
+# Lives as long as the (resident) worker process
+preview_cache = PreviewCache(PREVIEW_CACHE_MAX_BYTES)
+
+def run_worker(input_stream=None, output_stream=None):
+    """Serve line-delimited JSON requests until the input stream closes.
+
+    Each request line looks like {"id": ..., "payload": {...}} and gets exactly
+    one response line {"id": ..., "result": [...], "metrics": {...}}, the
+    metrics being this worker's registry snapshot for Node to merge into its
+    /metrics. Logs go to stderr so stdout only ever carries protocol lines.
+    """
+    input_stream = input_stream or sys.stdin
+    output_stream = output_stream or sys.stdout
+
+    classifier = ClothingClassifier()
+    classifier.warm_up()
+    logger.info(f"Outfit agent worker {os.getpid()} ready")
+
+    for line in input_stream:
+        line = line.strip()
+        if not line:
+            continue
+
+        request_id = None
+        try:
+            message = json.loads(line)
+            request_id = message.get('id')
+            result = process_request(message.get('payload') or {}, classifier=classifier)
+        except Exception as e:
+            logger.error(f"Error handling worker request: {str(e)}")
+            result = [{"error": str(e)}]
+
+        output_stream.write(json.dumps({
+            'id': request_id,
+            'result': result,
+            'metrics': REGISTRY.snapshot()
+        }) + '\n')
+        output_stream.flush()
+
+    classifier.close()
+
 if __name__ == "__main__":
     try:
-        if len(sys.argv) > 1:
+        if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+            run_worker()
+        elif len(sys.argv) > 1 and sys.argv[1] == '--cleanup-previews':
+            print(json.dumps({'removed': cleanup_previews()}))
+        elif len(sys.argv) > 1:
             input_data = json.loads(sys.argv[1])
             result = process_request(input_data)
             print(json.dumps(result))
@@ -2,6 +2,16 @@ const agentService = require('../services/agentService');
 const path = require('path');
 const fs = require('fs');
 
+// A full queue or a pool whose workers keep dying is back-pressure, not a server fault
+const statusForError = (error) => (
+  ['AGENT_QUEUE_FULL', 'AGENT_UNAVAILABLE'].includes(error.code) ? 503 : 500
+);
+
+// Previews are content-addressed by the agent, so a key never changes meaning
+const PREVIEW_DIR = path.join(__dirname, '../../uploads/previews');
+const PREVIEW_TYPES = { '.jpg': 'image/jpeg', '.webp': 'image/webp' };
+const PREVIEW_KEY = /^[0-9a-f]{32}$/;
+
 const uploadImage = async (req, res) => {
   try {
     console.log('Upload request received');
@@ -32,10 +42,12 @@ const uploadImage = async (req, res) => {
     console.log('File URLs:', filePaths);
 
     // Process with Python agent
+    // The agent reads uploads (and their derivatives) straight from disk;
+    // the URLs remain for clients and for classification by filename
     const agentResponse = await agentService.processOutfit(filePaths, {
       prompt: req.body.prompt || '',
       images: filePaths
-    });
+    }, files.map(file => file.path));
 
     console.log('Agent response:', agentResponse);
 
@@ -48,7 +60,7 @@ const uploadImage = async (req, res) => {
   } catch (error) {
     console.error('Error in uploadImage:', error);
     console.error('Error stack:', error.stack);
-    res.status(500).json({ 
+    res.status(statusForError(error)).json({ 
       error: error.message,
       details: 'Check server logs for more information'
     });
@@ -73,14 +85,45 @@ const getSuggestions = async (req, res) => {
   } catch (error) {
     console.error('Error in getSuggestions:', error);
     console.error('Error stack:', error.stack);
-    res.status(500).json({ 
+    res.status(statusForError(error)).json({ 
       error: error.message,
       details: 'Check server logs for more information'
     });
   }
 };
 
+const getPreview = (req, res) => {
+  const { key } = req.params;
+  if (!PREVIEW_KEY.test(key)) {
+    return res.status(400).json({ error: 'Invalid preview key' });
+  }
+
+  // Previews are pruned by retention, so only an existing file is cached
+  // or revalidated; a miss must stay uncacheable
+  const found = Object.entries(PREVIEW_TYPES)
+    .map(([extension, type]) => ({ type, file: path.join(PREVIEW_DIR, `outfit_preview_${key}${extension}`) }))
+    .find(({ file }) => fs.existsSync(file));
+  if (!found) {
+    res.set('Cache-Control', 'no-store');
+    return res.status(404).json({ error: 'Preview not found' });
+  }
+
+  const etag = `"${key}"`;
+  res.set('ETag', etag);
+  res.set('Cache-Control', 'public, max-age=31536000, immutable');
+  const ifNoneMatch = (req.headers['if-none-match'] || '').split(',').map(tag => tag.trim());
+  if (ifNoneMatch.includes(etag) || ifNoneMatch.includes('*')) {
+    return res.status(304).end();
+  }
+
+  res.type(found.type);
+  return fs.createReadStream(found.file)
+    .on('error', () => res.destroy())
+    .pipe(res);
+};
+
 module.exports = {
   uploadImage,
-  getSuggestions
+  getSuggestions,
+  getPreview
 }; 
\ No newline at end of file
@@ -0,0 +1,16 @@
+const { requestSeconds } = require('../services/metrics');
+
+// Per-route latency histogram. The matched route pattern (not the raw URL)
+// is the label, so previews/:key stays one series.
+function requestTimer(req, res, next) {
+  const start = process.hrtime.bigint();
+  res.on('finish', () => {
+    const route = req.route ? `${req.baseUrl}${req.route.path}` : 'unmatched';
+    requestSeconds
+      .labels({ method: req.method, route, status: res.statusCode })
+      .observe(Number(process.hrtime.bigint() - start) / 1e9);
+  });
+  next();
+}
+
+module.exports = requestTimer;
@@ -45,13 +45,19 @@ const fileFilter = (req, file, cb) => {
         'image/webp',
         'application/octet-stream'
     ];
+    // The saved file keeps this extension, and octet-stream says nothing,
+    // so the name must match too (the agent checks the real format)
+    const allowedExtensions = ['.jpg', '.jpeg', '.png', '.webp'];
+    const extension = path.extname(file.originalname).toLowerCase();
 
-    if (allowedTypes.includes(file.mimetype)) {
+    if (allowedTypes.includes(file.mimetype) && allowedExtensions.includes(extension)) {
         console.log('File type accepted:', file.mimetype);
         cb(null, true);
     } else {
-        console.log('File type rejected:', file.mimetype);
-        cb(new Error(`Invalid file type: ${file.mimetype}. Only JPEG, JPG, PNG and WebP are allowed.`), false);
+        console.log('File type rejected:', file.mimetype, extension);
+        const error = new Error(`Invalid file type: ${file.mimetype} (${extension || 'no extension'}). Only JPEG, JPG, PNG and WebP are allowed.`);
+        error.code = 'INVALID_FILE_TYPE';
+        cb(error, false);
     }
 };
 
@@ -59,7 +65,7 @@ const upload = multer({
     storage: storage,
     fileFilter: fileFilter,
     limits: {
-        fileSize: 10 * 1024 * 1024 // 10MB limit
+        fileSize: 5 * 1024 * 1024 // 5MB, as IMAGE_CONFIG['max_file_size']
     }
 });
 
@@ -1,9 +1,10 @@
 const express = require('express');
 const router = express.Router();
 const upload = require('../middleware/upload');
-const { uploadImage, getSuggestions } = require('../controllers/outfitController');
+const { uploadImage, getSuggestions, getPreview } = require('../controllers/outfitController');
 
 router.post('/upload', upload.array('images', 10), uploadImage);
 router.get('/suggestions', getSuggestions);
+router.get('/previews/:key', getPreview);
 
 module.exports = router; 
\ No newline at end of file
@@ -5,6 +5,9 @@ const multer = require('multer');
 require('dotenv').config();
 
 const outfitsRouter = require('./routes/outfits');
+const agentService = require('./services/agentService');
+const requestTimer = require('./middleware/metrics');
+const { render } = require('./services/metrics');
 
 const app = express();
 const port = process.env.PORT || 8000;
@@ -24,6 +27,7 @@ app.use(cors({
   }
 }));
 app.use(express.json());
+app.use(requestTimer);
 
 // Serve uploaded files
 app.use('/uploads', express.static(path.join(__dirname, '../uploads')));
@@ -36,6 +40,11 @@ app.get('/api/health', (req, res) => {
   res.json({ status: 'ok' });
 });
 
+// Prometheus scrape: Node metrics plus the latest from each Python worker
+app.get('/metrics', (req, res) => {
+  res.type('text/plain; version=0.0.4').send(render(agentService.metricsSnapshot()));
+});
+
 // Routes
 app.use('/api/outfits', outfitsRouter);
 
@@ -47,9 +56,20 @@ app.use((err, req, res, next) => {
       return res.status(400).json({ error: 'File size is too large. Max size is 5MB.' });
     }
   }
+  if (err.code === 'INVALID_FILE_TYPE') {
+    return res.status(400).json({ error: err.message });
+  }
   res.status(500).json({ error: err.message || 'Something broke!' });
 });
 
-app.listen(port, () => {
+const server = app.listen(port, () => {
   console.log(`Server is running on port ${port}`);
+});
+
+// Stop the resident Python workers together with the HTTP server
+['SIGINT', 'SIGTERM'].forEach(signal => {
+  process.on(signal, () => {
+    agentService.shutdown();
+    server.close(() => process.exit(0));
+  });
 }); 
\ No newline at end of file
@@ -1,14 +1,60 @@
 const { PythonShell } = require('python-shell');
 const path = require('path');
 const fs = require('fs');
+const metrics = require('./metrics');
+
+// Pool sizing for the resident outfit agent workers
+const POOL_SIZE = parseInt(process.env.AGENT_POOL_SIZE, 10) || 2;
+const QUEUE_DEPTH = parseInt(process.env.AGENT_QUEUE_DEPTH, 10) || 32;
+const REQUEST_TIMEOUT_MS = parseInt(process.env.AGENT_REQUEST_TIMEOUT_MS, 10) || 120000;
+// A worker that keeps dying is restarted after a doubling delay, and its
+// slot is given up after this many restarts without a response in between
+const RESTART_DELAY_MS = parseInt(process.env.AGENT_RESTART_DELAY_MS, 10) || 500;
+const MAX_RESTART_DELAY_MS = parseInt(process.env.AGENT_MAX_RESTART_DELAY_MS, 10) || 30000;
+const MAX_RESTARTS = parseInt(process.env.AGENT_MAX_RESTARTS, 10) || 5;
 
 class AgentService {
-  constructor() {
+  constructor({
+    poolSize = POOL_SIZE,
+    queueDepth = QUEUE_DEPTH,
+    requestTimeout = REQUEST_TIMEOUT_MS,
+    restartDelay = RESTART_DELAY_MS,
+    maxRestartDelay = MAX_RESTART_DELAY_MS,
+    maxRestarts = MAX_RESTARTS
+  } = {}) {
     this.agentPath = path.join(__dirname, '../agents/outfit_agent.py');
+    this.poolSize = poolSize;
+    this.queueDepth = queueDepth;
+    this.requestTimeout = requestTimeout;
+    this.restartDelay = restartDelay;
+    this.maxRestartDelay = maxRestartDelay;
+    this.maxRestarts = maxRestarts;
+    this.workers = [];
+    this.queue = [];
+    // Restarts per slot since its worker last answered, and pending restarts
+    this.restarts = [];
+    this.restartTimers = [];
+    // Set once every slot has hit the restart limit
+    this.unavailable = null;
+    this.nextRequestId = 1;
+    this.closing = false;
+    // Latest metrics snapshot reported by each worker slot
+    this.workerMetrics = [];
+
+    metrics.queueDepth.labels({ queue: 'agent' }).setFunction(() => this.queue.length);
+    metrics.busyWorkers.labels().setFunction(() => this.workers.filter(worker => worker.current).length);
+    this.errorCounters = {
+      queueFull: metrics.agentErrors.labels({ reason: 'queue_full' }),
+      timeout: metrics.agentErrors.labels({ reason: 'timeout' }),
+      workerExit: metrics.agentErrors.labels({ reason: 'worker_exit' }),
+      unavailable: metrics.agentErrors.labels({ reason: 'unavailable' })
+    };
+    this.latency = metrics.agentSeconds.labels();
+
     // Create uploads directory if it doesn't exist
     const uploadsDir = path.join(__dirname, '../../uploads');
     const previewsDir = path.join(uploadsDir, 'previews');
-    
+
     [uploadsDir, previewsDir].forEach(dir => {
       if (!fs.existsSync(dir)) {
         fs.mkdirSync(dir, { recursive: true });
@@ -16,68 +62,200 @@ class AgentService {
     });
   }
 
-  async processOutfit(images, preferences = {}) {
-    return new Promise((resolve, reject) => {
-      const pythonPath = process.platform === 'win32' ? 'python' : 'python3';
-      
-      const options = {
-        mode: 'text',
-        pythonPath: pythonPath,
-        pythonOptions: ['-u'], // unbuffered output
-        scriptPath: path.dirname(this.agentPath),
-        args: [JSON.stringify({ images, preferences })]
-      };
-
-      console.log('Starting Python process with options:', {
-        scriptPath: options.scriptPath,
-        pythonPath: options.pythonPath,
-        script: path.basename(this.agentPath)
-      });
+  _spawnWorker(index) {
+    const pythonPath = process.platform === 'win32' ? 'python' : 'python3';
+
+    const options = {
+      mode: 'text',
+      pythonPath: pythonPath,
+      pythonOptions: ['-u'], // unbuffered output
+      scriptPath: path.dirname(this.agentPath),
+      args: ['--worker']
+    };
+
+    console.log('Starting Python worker with options:', {
+      index,
+      scriptPath: options.scriptPath,
+      pythonPath: options.pythonPath,
+      script: path.basename(this.agentPath)
+    });
+
+    const worker = {
+      index,
+      shell: new PythonShell(path.basename(this.agentPath), options),
+      current: null,
+      alive: true
+    };
+
+    worker.shell.on('message', (message) => {
+      let parsed;
+      try {
+        parsed = JSON.parse(message);
+      } catch (e) {
+        console.log('Non-JSON message:', message);
+        return;
+      }
+
+      if (parsed.metrics) {
+        this.workerMetrics[index] = parsed.metrics;
+      }
+      // A worker that answers is healthy; its next crash starts a fresh backoff
+      this.restarts[index] = 0;
+
+      const job = worker.current;
+      if (!job || parsed.id !== job.id) {
+        console.log('Dropping response for unknown request:', parsed.id);
+        return;
+      }
+      this._finish(worker, null, parsed.result);
+    });
+
+    worker.shell.on('stderr', (stderr) => {
+      console.error(`Python worker ${index} stderr:`, stderr);
+    });
+
+    worker.shell.on('error', (err) => {
+      console.error(`Python worker ${index} error:`, err);
+    });
+
+    worker.shell.on('close', () => {
+      worker.alive = false;
+      if (worker.current) {
+        this.errorCounters.workerExit.inc();
+        this._finish(worker, new Error(`Python worker ${index} exited while processing a request`));
+      }
+      if (!this.closing) {
+        this._scheduleRestart(index);
+      }
+    });
+
+    return worker;
+  }
+
+  // Replace a dead worker after a backoff, or give its slot up
+  _scheduleRestart(index) {
+    const restarts = (this.restarts[index] || 0) + 1;
+    this.restarts[index] = restarts;
+    if (restarts > this.maxRestarts) {
+      console.error(`Python worker ${index} exited ${this.maxRestarts} times in a row, not restarting it`);
+      if (this.workers.every(worker => !worker.alive) && this.restartTimers.every(timer => !timer)) {
+        this._giveUp();
+      }
+      return;
+    }
+
+    const delay = Math.min(this.restartDelay * 2 ** (restarts - 1), this.maxRestartDelay);
+    console.error(`Python worker ${index} exited, restarting in ${delay}ms`);
+    this.restartTimers[index] = setTimeout(() => {
+      this.restartTimers[index] = null;
+      if (this.closing) {
+        return;
+      }
+      this.workers[index] = this._spawnWorker(index);
+      this._dispatch();
+    }, delay);
+  }
+
+  // No worker is left or coming back: fail waiting and future requests
+  _giveUp() {
+    const err = new Error('Outfit agent workers keep exiting; see the worker logs');
+    err.code = 'AGENT_UNAVAILABLE';
+    this.unavailable = err;
+    const waiting = this.queue.splice(0);
+    waiting.forEach(job => {
+      this.errorCounters.unavailable.inc();
+      job.reject(err);
+    });
+  }
 
+  _ensurePool() {
+    if (this.workers.length === 0) {
       if (!fs.existsSync(this.agentPath)) {
-        return reject(new Error(`Python script not found at: ${this.agentPath}`));
+        throw new Error(`Python script not found at: ${this.agentPath}`);
       }
+      for (let i = 0; i < this.poolSize; i++) {
+        this.workers.push(this._spawnWorker(i));
+      }
+    }
+  }
 
-      let pyshell = new PythonShell(path.basename(this.agentPath), options);
-      let jsonOutput = null;
-      let errorOutput = [];
-
-      pyshell.on('message', function (message) {
-        console.log('Python output:', message);
-        try {
-          const parsed = JSON.parse(message);
-          jsonOutput = parsed;
-        } catch (e) {
-          console.log('Non-JSON message:', message);
-          errorOutput.push(message);
-        }
-      });
+  _dispatch() {
+    for (const worker of this.workers) {
+      if (this.queue.length === 0) {
+        return;
+      }
+      if (!worker.alive || worker.current) {
+        continue;
+      }
 
-      pyshell.on('stderr', function (stderr) {
-        console.error('Python stderr:', stderr);
-        errorOutput.push(stderr);
-      });
+      const job = this.queue.shift();
+      worker.current = job;
+      job.timer = setTimeout(() => {
+        // A stuck worker cannot be trusted with the next request; replace it
+        worker.alive = false;
+        this.errorCounters.timeout.inc();
+        this._finish(worker, new Error(`Agent request timed out after ${this.requestTimeout}ms`));
+        worker.shell.kill();
+      }, this.requestTimeout);
+      worker.shell.send(JSON.stringify({ id: job.id, payload: job.payload }));
+    }
+  }
 
-      pyshell.on('error', function (err) {
-        console.error('Python shell error:', err);
-        errorOutput.push(err.message);
-      });
+  _finish(worker, err, result) {
+    const job = worker.current;
+    worker.current = null;
+    clearTimeout(job.timer);
+    this.latency.observe(Number(process.hrtime.bigint() - job.queuedAt) / 1e9);
+
+    if (err) {
+      job.reject(err);
+    } else {
+      job.resolve(result);
+    }
+    this._dispatch();
+  }
+
+  async processOutfit(images, preferences = {}, paths = []) {
+    return new Promise((resolve, reject) => {
+      try {
+        this._ensurePool();
+      } catch (err) {
+        return reject(err);
+      }
+
+      if (this.unavailable) {
+        this.errorCounters.unavailable.inc();
+        return reject(this.unavailable);
+      }
+
+      if (this.queue.length >= this.queueDepth) {
+        const err = new Error(`Agent queue is full (${this.queueDepth} pending requests)`);
+        err.code = 'AGENT_QUEUE_FULL';
+        this.errorCounters.queueFull.inc();
+        return reject(err);
+      }
 
-      pyshell.end(function (err) {
-        if (err) {
-          console.error('Python shell end error:', err);
-          console.error('Error output:', errorOutput.join('\n'));
-          reject(err);
-        } else {
-          if (jsonOutput) {
-            resolve(jsonOutput);
-          } else {
-            reject(new Error('No valid JSON output received. Logs: ' + errorOutput.join('\n')));
-          }
-        }
+      this.queue.push({
+        id: this.nextRequestId++,
+        payload: { images, paths, preferences },
+        queuedAt: process.hrtime.bigint(),
+        resolve,
+        reject
       });
+      this._dispatch();
     });
   }
+
+  // This process's metrics merged with the latest from every worker
+  metricsSnapshot() {
+    return metrics.mergeSnapshots([metrics.registry.snapshot(), ...this.workerMetrics]);
+  }
+
+  shutdown() {
+    this.closing = true;
+    this.restartTimers.forEach(timer => clearTimeout(timer));
+    this.workers.forEach(worker => worker.shell.end(() => {}));
+  }
 }
 
-module.exports = new AgentService(); 
\ No newline at end of file
+module.exports = new AgentService();
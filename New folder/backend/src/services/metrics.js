@@ -0,0 +1,177 @@
+// Prometheus-style metrics for the Node server.
+//
+// Mirrors utils/metrics.py: a snapshot maps each metric name to
+// { type, help, samples } with samples keyed by their exposition name
+// (e.g. 'http_request_duration_seconds_bucket{route="/x",le="0.1"}'), so
+// snapshots from the Python workers merge with this process's by summing.
+
+const DEFAULT_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30];
+
+const escapeLabel = value => String(value).replace(/\\/g, '\\\\').replace(/\n/g, '\\n').replace(/"/g, '\\"');
+
+function sampleKey(name, labels) {
+  if (labels.length === 0) {
+    return name;
+  }
+  return `${name}{${labels.map(([key, value]) => `${key}="${escapeLabel(value)}"`).join(',')}}`;
+}
+
+class Metric {
+  constructor(registry, type, name, help, labelNames = []) {
+    this.type = type;
+    this.name = name;
+    this.help = help;
+    this.labelNames = labelNames;
+    this.children = new Map();
+    registry.register(this);
+  }
+
+  // Bind label values once and keep the child on hot paths
+  labels(values = {}) {
+    const key = this.labelNames.map(name => String(values[name])).join('\u0000');
+    let child = this.children.get(key);
+    if (!child) {
+      child = this.newChild();
+      child.labelPairs = this.labelNames.map(name => [name, String(values[name])]);
+      this.children.set(key, child);
+    }
+    return child;
+  }
+}
+
+class Counter extends Metric {
+  constructor(registry, name, help, labelNames) {
+    super(registry, 'counter', name, help, labelNames);
+  }
+
+  newChild() {
+    return { value: 0, inc(amount = 1) { this.value += amount; } };
+  }
+
+  samples(out) {
+    for (const child of this.children.values()) {
+      out[sampleKey(`${this.name}_total`, child.labelPairs)] = child.value;
+    }
+  }
+}
+
+class Gauge extends Metric {
+  constructor(registry, name, help, labelNames) {
+    super(registry, 'gauge', name, help, labelNames);
+  }
+
+  newChild() {
+    return {
+      value: 0,
+      fn: null,
+      set(value) { this.value = value; },
+      setFunction(fn) { this.fn = fn; },
+      get() { return this.fn ? this.fn() : this.value; }
+    };
+  }
+
+  samples(out) {
+    for (const child of this.children.values()) {
+      out[sampleKey(this.name, child.labelPairs)] = child.get();
+    }
+  }
+}
+
+class Histogram extends Metric {
+  constructor(registry, name, help, labelNames, buckets = DEFAULT_BUCKETS) {
+    super(registry, 'histogram', name, help, labelNames);
+    this.buckets = [...buckets].sort((a, b) => a - b);
+  }
+
+  newChild() {
+    const bounds = this.buckets;
+    return {
+      counts: new Array(bounds.length + 1).fill(0),
+      sum: 0,
+      observe(value) {
+        let index = 0;
+        while (index < bounds.length && value > bounds[index]) {
+          index++;
+        }
+        this.counts[index]++;
+        this.sum += value;
+      }
+    };
+  }
+
+  samples(out) {
+    for (const child of this.children.values()) {
+      let cumulative = 0;
+      child.counts.forEach((count, index) => {
+        cumulative += count;
+        const le = index < this.buckets.length ? String(this.buckets[index]) : '+Inf';
+        out[sampleKey(`${this.name}_bucket`, [...child.labelPairs, ['le', le]])] = cumulative;
+      });
+      out[sampleKey(`${this.name}_sum`, child.labelPairs)] = child.sum;
+      out[sampleKey(`${this.name}_count`, child.labelPairs)] = cumulative;
+    }
+  }
+}
+
+class Registry {
+  constructor() {
+    this.metrics = new Map();
+  }
+
+  register(metric) {
+    if (this.metrics.has(metric.name)) {
+      throw new Error(`Metric already registered: ${metric.name}`);
+    }
+    this.metrics.set(metric.name, metric);
+  }
+
+  snapshot() {
+    const snapshot = {};
+    for (const metric of this.metrics.values()) {
+      const samples = {};
+      metric.samples(samples);
+      snapshot[metric.name] = { type: metric.type, help: metric.help, samples };
+    }
+    return snapshot;
+  }
+}
+
+function mergeSnapshots(snapshots) {
+  const merged = {};
+  for (const snapshot of snapshots) {
+    for (const [name, family] of Object.entries(snapshot || {})) {
+      const target = merged[name] || (merged[name] = { type: family.type, help: family.help, samples: {} });
+      for (const [key, value] of Object.entries(family.samples)) {
+        target.samples[key] = (target.samples[key] || 0) + value;
+      }
+    }
+  }
+  return merged;
+}
+
+function render(snapshot) {
+  const lines = [];
+  for (const [name, family] of Object.entries(snapshot)) {
+    lines.push(`# HELP ${name} ${family.help}`);
+    lines.push(`# TYPE ${name} ${family.type}`);
+    for (const [key, value] of Object.entries(family.samples)) {
+      lines.push(`${key} ${value}`);
+    }
+  }
+  return lines.join('\n') + '\n';
+}
+
+const registry = new Registry();
+
+module.exports = {
+  registry,
+  mergeSnapshots,
+  render,
+  requestSeconds: new Histogram(registry, 'node_http_request_duration_seconds',
+    'Node HTTP request latency by route', ['method', 'route', 'status']),
+  agentSeconds: new Histogram(registry, 'agent_request_duration_seconds',
+    'Time from queueing an agent request to its response'),
+  agentErrors: new Counter(registry, 'agent_errors', 'Failed agent requests by reason', ['reason']),
+  queueDepth: new Gauge(registry, 'node_queue_depth', 'Work waiting in each Node queue', ['queue']),
+  busyWorkers: new Gauge(registry, 'agent_busy_workers', 'Python workers handling a request')
+};
@@ -0,0 +1,76 @@
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import config
+
+
+def make_garment_image(width: int, height: int, color=(200, 30, 30)) -> bytes:
+    """Encode a flat garment-like JPEG on a white background"""
+    canvas = np.full((height, width, 3), 255, dtype=np.uint8)
+    canvas[height // 4: 3 * height // 4, width // 4: 3 * width // 4] = color
+    buffer = io.BytesIO()
+    Image.fromarray(canvas).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(tmp_path, monkeypatch):
+    """Keep caches and databases written during tests out of data/"""
+    monkeypatch.setitem(config.CACHE_CONFIG, "analysis_db", tmp_path / "analysis_cache.db")
+    monkeypatch.setitem(config.STORAGE_CONFIG, "database_file", tmp_path / "wardrobe.db")
+    monkeypatch.setitem(config.STORAGE_CONFIG, "wardrobe_file", tmp_path / "user_wardrobes.json")
+    monkeypatch.setitem(config.STORAGE_CONFIG, "feature_index_dir", tmp_path / "feature_index")
+    return tmp_path
+
+
+@pytest.fixture
+def image_server():
+    """Serve in-memory images over HTTP.
+
+    ``/slow/...`` paths stall before answering; ``/trickle/...`` paths send
+    the body a few bytes at a time.
+    """
+    images = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith('/slow/'):
+                time.sleep(2)
+            body = images.get(self.path.rsplit('/', 1)[-1])
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if not self.path.startswith('/trickle/'):
+                self.wfile.write(body)
+                return
+            try:
+                for start in range(0, len(body), 64):
+                    self.wfile.write(body[start:start + 64])
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            except OSError:
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield base_url, images
+
+    server.shutdown()
+    server.server_close()
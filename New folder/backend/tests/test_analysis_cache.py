@@ -0,0 +1,71 @@
+from utils.analysis_cache import AnalysisCache, image_digest
+
+
+def test_hits_and_misses_are_counted():
+    cache = AnalysisCache("vision", "1")
+    digest = image_digest(b"shirt")
+
+    assert cache.get(digest) is None
+    cache.put(digest, {"colors": ["rgb(1,2,3)"], "size": {"width": 2, "height": 3}})
+
+    assert cache.get(digest) == {"colors": ["rgb(1,2,3)"], "size": {"width": 2, "height": 3}}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_entries_survive_reopening_but_not_a_version_bump(tmp_path):
+    path = tmp_path / "cache.db"
+    AnalysisCache("vision", "1", path=path).put("abc", {"category": "tops"})
+
+    assert AnalysisCache("vision", "1", path=path).get("abc") == {"category": "tops"}
+    assert AnalysisCache("style", "1", path=path).get("abc") is None
+    assert AnalysisCache("vision", "2", path=path).get("abc") is None
+    assert AnalysisCache("vision", "1", path=path).get("abc") is None
+
+
+def test_least_recently_used_entries_are_evicted(monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr("utils.analysis_cache.time.time", lambda: next(clock))
+    cache = AnalysisCache("vision", "1", max_entries=2, touch_interval=0)
+
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    cache.get("a")
+    cache.put("c", {"n": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1}
+    assert cache.get("c") == {"n": 3}
+
+
+def test_hits_only_write_back_stale_access_times(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("utils.analysis_cache.time.time", lambda: now[0])
+    cache = AnalysisCache("vision", "1", touch_interval=60)
+    cache.put("a", {"n": 1})
+    last_access = lambda: cache._conn.execute(
+        "SELECT last_access FROM analysis_cache WHERE digest = 'a'"
+    ).fetchone()[0]
+
+    now[0] += 30
+    cache.get("a")
+    assert last_access() == 1000.0
+    now[0] += 60
+    cache.get("a")
+    assert last_access() == 1090.0
+
+
+def test_totals_track_writes_from_every_process(tmp_path):
+    path = tmp_path / "cache.db"
+    cache = AnalysisCache("vision", "1", path=path, max_entries=3)
+    other = AnalysisCache("vision", "1", path=path, max_entries=3)
+    for digest in "abc":
+        other.put(digest, {"digest": digest})
+    other.put("a", {"digest": "a", "longer": True})
+    cache.put("d", {"digest": "d"})
+
+    rows = cache._conn.execute(
+        "SELECT COUNT(*), SUM(size) FROM analysis_cache WHERE kind = 'vision'"
+    ).fetchone()
+    assert cache._totals() == rows and rows[0] == 3
+    assert AnalysisCache("vision", "2", path=path)._totals() == (0, 0)
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from utils.background_tasks import JobQueue
+from utils.error_handlers import QueueFullError, handle_error
+
+
+def test_jobs_report_status_and_result():
+    async def scenario():
+        queue = JobQueue(workers=2, max_queued=10, result_ttl=60)
+
+        async def double(x):
+            await asyncio.sleep(0.01)
+            return 2 * x
+
+        async def broken():
+            raise ValueError("bad image")
+
+        ok = queue.submit(double, 21, kind="upload")
+        failed = queue.submit(broken)
+        queued = queue.get(ok)["status"]
+        await queue.join()
+        statuses = queue.get(ok), queue.get(failed)
+        await queue.close()
+        return queued, statuses
+
+    queued, (ok, failed) = asyncio.run(scenario())
+
+    assert queued == "queued"
+    assert ok["status"] == "completed" and ok["result"] == 42 and ok["kind"] == "upload"
+    assert failed["status"] == "failed" and failed["error"] == "bad image"
+
+
+def test_full_queue_pushes_back_with_429():
+    async def scenario():
+        queue = JobQueue(workers=1, max_queued=2, result_ttl=60)
+        release = asyncio.Event()
+
+        async def blocked():
+            await release.wait()
+
+        queue.submit(blocked)
+        await asyncio.sleep(0)  # the worker takes the first job
+        queue.submit(blocked)
+        queue.submit(blocked)
+        with pytest.raises(QueueFullError) as raised:
+            queue.submit(blocked)
+        release.set()
+        await queue.join()
+        await queue.close()
+        return raised.value
+
+    error = asyncio.run(scenario())
+
+    assert handle_error(error).status_code == 429
+
+
+def test_finished_jobs_expire_after_ttl():
+    async def scenario():
+        queue = JobQueue(workers=1, max_queued=4, result_ttl=0.05)
+
+        async def noop():
+            return None
+
+        job_id = queue.submit(noop)
+        await queue.join()
+        fresh = queue.get(job_id)
+        await asyncio.sleep(0.06)
+        expired = queue.get(job_id)
+        await queue.close()
+        return fresh, expired
+
+    fresh, expired = asyncio.run(scenario())
+
+    assert fresh["status"] == "completed"
+    assert expired is None
@@ -0,0 +1,175 @@
+import asyncio
+import zipfile
+from pathlib import Path
+
+from utils import bulk_import
+from utils.bulk_import import BulkImporter, manifest_entries, zip_entries
+from utils.database import Database
+from utils.db_manager import AsyncDatabase
+from utils.feature_index import get_feature_index
+from tests.conftest import make_garment_image
+
+
+def test_zip_import_writes_chunks_and_reports_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_import, "UPLOAD_DIR", tmp_path / "uploads")
+    archive_path = tmp_path / "closet.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        for i in range(7):
+            archive.writestr(f"closet/../item{i}.jpg", make_garment_image(64, 48))
+        archive.writestr("closet/readme.txt", "not an image")
+        archive.writestr("closet/broken.jpg", b"not a jpeg")
+
+    async def analyze(thumbnail):
+        return {"style_tags": ["casual"]}
+
+    updates = []
+    store = AsyncDatabase(Database(tmp_path / "wardrobe.db"))
+
+    async def scenario():
+        with zipfile.ZipFile(archive_path) as archive:
+            importer = BulkImporter(
+                "alice", analyze=analyze, store=store, concurrency=3, chunk_size=3,
+                progress=updates.append
+            )
+            summary = await importer.run(
+                zip_entries(archive, bulk_import.import_directory(), {"category": "tops"}), total=8
+            )
+        wardrobe = await store.get_user_wardrobe("alice")
+        await store.close()
+        return summary, wardrobe
+
+    summary, wardrobe = asyncio.run(scenario())
+
+    assert summary["imported"] == 7 and summary["failed"] == 1 and summary["stored"] == 7
+    assert summary["errors"][0]["name"] == "closet/broken.jpg"
+    assert len(wardrobe["tops"]) == 7
+    assert wardrobe["tops"][0]["style_analysis"] == {"style_tags": ["casual"]}
+    for item in wardrobe["tops"]:
+        assert item["image_url"].startswith("/uploads/imports/")
+        original = Path(item["image_features"]["original_path"])
+        assert original.parent.name == item["image_url"].split("/")[3] and original.name == item["image_url"].rsplit("/", 1)[1]
+    assert len(get_feature_index("alice")) == 7
+    # Progress arrives per image and chunks are stored before the end
+    processed = [update["processed"] for update in updates]
+    assert processed == sorted(processed) and processed[0] == 0 and processed[-1] == 8
+    assert any(0 < update["stored"] < 7 for update in updates)
+
+
+def test_manifest_paths_must_be_inside_the_upload_dir(tmp_path, monkeypatch):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    monkeypatch.setattr(bulk_import, "UPLOAD_DIR", uploads)
+    inside = uploads / "shirt.jpg"
+    inside.write_bytes(make_garment_image(64, 48))
+    outside = tmp_path / "secret.jpg"
+    outside.write_bytes(make_garment_image(64, 48))
+
+    entries = list(manifest_entries([
+        {"path": str(inside), "category": "tops"},
+        {"path": str(uploads / ".." / "secret.jpg")}
+    ]))
+
+    assert entries[0][1]() == inside and entries[0][2] == {"category": "tops"}
+    try:
+        entries[1][1]()
+    except ValueError as e:
+        assert "outside the upload directory" in str(e)
+    else:
+        raise AssertionError("path outside uploads was accepted")
+
+
+def test_multipart_import_accepts_more_than_a_thousand_files(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    monkeypatch.setattr(bulk_import, "UPLOAD_DIR", tmp_path / "uploads")
+    submitted = []
+    monkeypatch.setattr(main, "_submit_import", lambda func, *args: submitted.append(args) or {"job_id": "1"})
+    files = [("files", (f"shirt{i}.jpg", b"jpeg", "image/jpeg")) for i in range(1001)]
+    files.append(("files", ("notes.txt", b"text", "text/plain")))
+
+    response = TestClient(main.app).post("/api/wardrobe/import", files=files, data={"user_id": "alice"})
+
+    assert response.status_code == 202
+    user_id, saved, fields, rejected = submitted[0]
+    assert user_id == "alice" and len(saved) == 1001 and fields == {"category": "others"}
+    assert rejected == ["notes.txt"]
+    assert all(path.read_bytes() == b"jpeg" for _, path in saved)
+
+
+def test_multipart_upload_streams_parts_to_disk(tmp_path):
+    boundary = "b0undary"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"coat.jpg\"\r\n\r\n"
+    ).encode() + b"x" * 5000 + (
+        f"\r\n--{boundary}\r\nContent-Disposition: form-data; name=\"category\"\r\n\r\ntops"
+        f"\r\n--{boundary}--\r\n"
+    ).encode()
+    upload = bulk_import.MultipartUpload(tmp_path, max_files=10)
+
+    async def chunks():
+        for start in range(0, len(body), 100):
+            yield body[start:start + 100]
+
+    asyncio.run(upload.receive(f"multipart/form-data; boundary={boundary}", chunks()))
+
+    assert upload.fields == {"category": "tops"}
+    [(name, path)] = upload.files
+    assert name == "coat.jpg" and path.parent == tmp_path and path.read_bytes() == b"x" * 5000
+
+
+def test_import_rejected_by_a_full_queue_leaves_no_files(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+    from utils.error_handlers import QueueFullError
+
+    monkeypatch.setattr(bulk_import, "UPLOAD_DIR", tmp_path / "uploads")
+
+    checks = []
+
+    def fills_up_while_uploading(jobs=1):
+        # Room when the request arrives, none once the files are saved
+        checks.append(jobs)
+        if len(checks) > 1:
+            raise QueueFullError("Too many jobs waiting, try again later")
+
+    monkeypatch.setattr(main.ingestion_queue, "ensure_room", fills_up_while_uploading)
+    files = [("files", ("shirt.jpg", b"jpeg", "image/jpeg"))]
+
+    response = TestClient(main.app).post("/api/wardrobe/import", files=files)
+
+    assert response.status_code == 429 and len(checks) == 2
+    assert not list((tmp_path / "uploads" / "imports").iterdir())
+
+
+def test_too_many_files_are_refused_and_cleaned_up(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    monkeypatch.setattr(bulk_import, "UPLOAD_DIR", tmp_path / "uploads")
+    monkeypatch.setitem(main.BULK_IMPORT_CONFIG, "max_files", 2)
+    files = [("files", (f"shirt{i}.jpg", b"jpeg", "image/jpeg")) for i in range(3)]
+
+    response = TestClient(main.app).post("/api/wardrobe/import", files=files)
+
+    assert response.status_code == 413 and "archive" in response.json()["detail"]
+    assert not list((tmp_path / "uploads" / "imports").iterdir())
+
+
+def test_rejected_files_count_as_failures(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_import, "UPLOAD_DIR", tmp_path / "uploads")
+    store = AsyncDatabase(Database(tmp_path / "wardrobe.db"))
+    monkeypatch.setattr(bulk_import, "get_wardrobe_store", lambda: store)
+    image = tmp_path / "uploads" / "shirt.jpg"
+    image.parent.mkdir(parents=True)
+    image.write_bytes(make_garment_image(64, 48))
+
+    async def scenario():
+        summary = await bulk_import.import_files("bob", [("shirt.jpg", image)], {}, rejected=["notes.txt"])
+        await store.close()
+        return summary
+
+    summary = asyncio.run(scenario())
+
+    assert summary["total"] == 2 and summary["imported"] == 1 and summary["failed"] == 1
+    assert summary["errors"] == [{"name": "notes.txt", "error": "Not an allowed image type"}]
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from utils.color_extraction import (
+    BACKENDS, dominant_color, extract_palette, extract_palettes, palette_error
+)
+
+
+def two_tone_image(major, minor, size=60):
+    image = np.empty((size, size, 3), dtype=np.uint8)
+    image[:] = major
+    image[: size // 4] = minor
+    return image
+
+
+@pytest.mark.parametrize("backend", ["histogram", "minibatch", "kmeans"])
+def test_palette_recovers_flat_colours_most_populated_first(backend):
+    image = two_tone_image((200, 20, 20), (10, 10, 160))
+
+    palette = extract_palette(image, n_colors=2, backend=backend)
+
+    assert palette.shape == (2, 3)
+    np.testing.assert_allclose(palette[0], (200, 20, 20), atol=1)
+    np.testing.assert_allclose(palette[1], (10, 10, 160), atol=1)
+
+
+def test_median_cut_splits_at_the_median():
+    image = np.zeros((2, 10, 3), dtype=np.uint8)
+    image[0] = (250, 0, 0)
+
+    palette = extract_palette(image, n_colors=2, backend="median_cut")
+
+    assert sorted(map(tuple, palette)) == [(0, 0, 0), (250, 0, 0)]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_batches_are_deterministic_and_pad_short_palettes(backend):
+    rng = np.random.default_rng(1)
+    images = [rng.integers(0, 256, (40, 40, 3), dtype=np.uint8),
+              np.full((10, 10, 3), 128, dtype=np.uint8)]
+
+    first = extract_palettes(images, n_colors=3, backend=backend)
+    second = extract_palettes(images, n_colors=3, backend=backend)
+
+    assert first.shape == (2, 3, 3)
+    np.testing.assert_array_equal(first, second)
+    assert (first[1] == 128).all()
+
+
+def test_histogram_batch_matches_single_image_calls():
+    rng = np.random.default_rng(2)
+    images = rng.integers(0, 256, (4, 30, 30, 3), dtype=np.uint8)
+
+    batched = extract_palettes(images)
+
+    for image, palette in zip(images, batched):
+        np.testing.assert_array_equal(extract_palette(image), palette)
+
+
+def test_dominant_color_is_the_mean_and_palette_error_is_zero_on_exact_palettes():
+    image = two_tone_image((100, 100, 100), (200, 0, 0), size=4)
+
+    assert dominant_color(image) == (125, 75, 75)
+    assert palette_error(image, [(100, 100, 100), (200, 0, 0)]) == 0.0
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        extract_palette(np.zeros((2, 2, 3), dtype=np.uint8), backend="magic")
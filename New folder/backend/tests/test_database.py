@@ -0,0 +1,79 @@
+import json
+import threading
+
+from utils.database import Database
+
+
+def test_legacy_json_is_migrated_once(tmp_path):
+    legacy = tmp_path / "user_wardrobes.json"
+    legacy.write_text(json.dumps({
+        "users": {"default": {"tops": [{"id": 1}, {"id": 2}], "shoes": []}},
+        "metadata": {"version": "1.0", "last_updated": None}
+    }))
+
+    db = Database(legacy)
+    assert db.file_path == tmp_path / "user_wardrobes.db"
+    assert db.get_user_wardrobe("default") == {"tops": [{"id": 1}, {"id": 2}], "shoes": []}
+
+    db.update_user_wardrobe("default", {"shoes": [{"id": 3}]})
+    db.close()
+
+    # Reopening must not re-import the stale JSON over newer rows
+    reopened = Database(legacy)
+    assert reopened.get_user_wardrobe("default")["shoes"] == [{"id": 3}]
+
+
+def test_update_replaces_only_the_given_categories():
+    db = Database()
+    db.update_user_wardrobe("alice", {"tops": [{"id": 1}], "favourite": {"id": 1}})
+
+    db.update_user_wardrobe("alice", {"tops": [{"id": 2}, {"id": 3}]})
+
+    assert db.get_user_wardrobe("alice") == {
+        "tops": [{"id": 2}, {"id": 3}],
+        "favourite": {"id": 1}
+    }
+    assert db.get_user_wardrobe("bob") == {}
+
+
+def test_load_and_save_round_trip_the_legacy_document_shape():
+    db = Database()
+    data = db.load()
+    data["users"]["bob"] = {"bottoms": [{"id": 7}]}
+
+    db.save(data)
+
+    loaded = db.load()
+    assert loaded["users"] == {"default": {}, "bob": {"bottoms": [{"id": 7}]}}
+    assert loaded["metadata"]["version"] == "2.0"
+    assert loaded["metadata"]["last_updated"] is not None
+
+
+def test_concurrent_writers_do_not_lose_updates():
+    db = Database()
+
+    def write(user_index):
+        for category in range(10):
+            db.update_user_wardrobe(f"user{user_index}", {f"c{category}": [category]})
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    users = db.load()["users"]
+    for i in range(8):
+        assert users[f"user{i}"] == {f"c{c}": [c] for c in range(10)}
+
+
+def test_append_keeps_stored_items():
+    db = Database()
+    db.update_user_wardrobe("alice", {"tops": [{"id": 1}], "favourite": {"id": 2}})
+
+    db.append_items("alice", {"tops": [{"id": 3}, {"id": 4}], "favourite": [{"id": 5}], "shoes": [{"id": 6}]})
+
+    wardrobe = db.get_user_wardrobe("alice")
+    assert wardrobe["tops"] == [{"id": 1}, {"id": 3}, {"id": 4}]
+    assert wardrobe["favourite"] == [{"id": 2}, {"id": 5}]
+    assert wardrobe["shoes"] == [{"id": 6}]
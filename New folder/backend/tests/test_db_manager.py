@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+from utils.db_manager import AsyncDatabase, close_db, get_db
+
+
+def test_concurrent_updates_land_without_blocking_the_event_loop():
+    async def scenario():
+        db = AsyncDatabase()
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.001)
+
+        ticking = asyncio.create_task(ticker())
+        await asyncio.gather(*[
+            db.update_user_wardrobe(f"user{i % 20}", {f"c{i}": [i]})
+            for i in range(200)
+        ])
+        ticking.cancel()
+        data = await db.load()
+        await db.close()
+        return ticks, data
+
+    ticks, data = asyncio.run(scenario())
+
+    assert sum(len(wardrobe) for wardrobe in data["users"].values()) == 200
+    # The loop kept running while the writes were in flight
+    assert len(ticks) > 1
+
+
+def test_get_db_hands_out_the_shared_pool():
+    async def scenario():
+        async with get_db() as first:
+            await first.update_user_wardrobe("alice", {"tops": [1]})
+        async with get_db() as second:
+            wardrobe = await second.get_user_wardrobe("alice")
+        await close_db()
+        return first, second, wardrobe
+
+    first, second, wardrobe = asyncio.run(scenario())
+
+    assert first is second
+    assert wardrobe == {"tops": [1]}
@@ -0,0 +1,52 @@
+import json
+import os
+
+from PIL import Image
+
+from utils.derivatives import derivative_path, ensure_derivatives, smallest_derivative
+from tests.conftest import make_garment_image
+
+
+def write_upload(directory, width=1600, height=1200):
+    original = directory / "shirt.jpg"
+    original.write_bytes(make_garment_image(width, height))
+    return original
+
+
+def test_derivatives_are_written_next_to_the_original(tmp_path):
+    original = write_upload(tmp_path)
+
+    derivatives = ensure_derivatives(original)
+
+    assert derivatives["analysis"] == tmp_path / "shirt.analysis.jpg"
+    assert Image.open(derivatives["analysis"]).size == (150, 113)
+    assert Image.open(derivatives["thumbnail"]).size == (300, 225)
+    display = Image.open(derivatives["display"])
+    assert display.format == "WEBP" and display.size == (1200, 900)
+    meta = json.loads(derivative_path(original, "meta").read_text())
+    assert meta["width"] == 1600 and meta["height"] == 1200 and len(meta["digest"]) == 64
+
+
+def test_derivatives_are_made_once_and_redone_when_stale(tmp_path):
+    original = write_upload(tmp_path)
+    first = ensure_derivatives(original)
+    made_at = first["thumbnail"].stat().st_mtime_ns
+
+    assert ensure_derivatives(original)["meta"] == first["meta"]
+    assert first["thumbnail"].stat().st_mtime_ns == made_at
+
+    original.write_bytes(make_garment_image(400, 800))
+    later = os.stat(first["thumbnail"]).st_mtime + 10
+    os.utime(original, (later, later))
+    redone = ensure_derivatives(original)
+    assert redone["meta"]["width"] == 400
+    assert Image.open(redone["thumbnail"]).size == (150, 300)
+
+
+def test_smallest_derivative_covers_the_requested_size(tmp_path):
+    original = write_upload(tmp_path)
+
+    assert smallest_derivative(original, (100, 100)).name == "shirt.analysis.jpg"
+    assert smallest_derivative(original, (300, 300)).name == "shirt.thumb.jpg"
+    assert smallest_derivative(original, (800, 600)).name == "shirt.display.webp"
+    assert smallest_derivative(original, (4000, 3000)) == original
@@ -0,0 +1,73 @@
+import json
+
+import numpy as np
+
+from utils.feature_index import FeatureIndex, get_feature_index, close_feature_indexes, tag_bits
+from utils.outfit_engine import OutfitEngine
+
+
+def wardrobe_item(name, category, rgb, occasion_tags=()):
+    return {
+        "image_url": f"http://localhost:5000/uploads/{name}.jpg",
+        "category": category,
+        "occasion_tags": list(occasion_tags),
+        "image_features": {"dominant_color": rgb, "brightness": float(max(rgb))},
+    }
+
+
+def test_items_append_incrementally_and_survive_reopening(tmp_path):
+    index = FeatureIndex(tmp_path / "alice", initial_capacity=2)
+    for i in range(5):
+        index.add_item(wardrobe_item(f"shirt{i}", "tops", (200, 10 * i, 10), ["work"]))
+    # Re-adding an item overwrites its row instead of appending
+    index.add_item(wardrobe_item("shirt0", "bottoms", (0, 0, 255)))
+    index.remove("http://localhost:5000/uploads/shirt4.jpg")
+    assert index.capacity == 8
+    index.close()
+
+    reopened = FeatureIndex(tmp_path / "alice")
+    arrays = reopened.arrays()
+
+    assert len(reopened) == 4
+    assert reopened.count == 5
+    assert list(arrays["alive"]) == [True, True, True, True, False]
+    assert arrays["category"][0] == 2
+    assert arrays["occasion_bits"][1] == tag_bits(["Work"])
+    assert isinstance(arrays["lab"], np.memmap)
+    # Pure blue in Lab: dark with a strongly negative b axis
+    assert arrays["lab"][0][0] < 40 and arrays["lab"][0][2] < -80
+
+
+def test_outfits_rank_straight_from_the_index():
+    index = get_feature_index("bob")
+    index.add_item(wardrobe_item("tee", "tops", (240, 240, 240), ["gym"]))
+    index.add_item(wardrobe_item("shirt", "tops", (245, 245, 245), ["work"]))
+    index.add_item(wardrobe_item("chinos", "bottoms", (30, 40, 90), ["work"]))
+    index.add_item(wardrobe_item("loafer", "shoes", (60, 40, 20), ["work"]))
+
+    outfits = OutfitEngine().rank_index(index, "work", k=2)
+    close_feature_indexes()
+
+    assert [item["image_url"].rsplit("/", 1)[1] for item in outfits[0]["items"]] == [
+        "shirt.jpg", "chinos.jpg", "loafer.jpg"
+    ]
+    assert outfits[0]["confidence_score"] > outfits[1]["confidence_score"]
+
+
+def test_mutations_append_ids_instead_of_rewriting_them(tmp_path):
+    directory = tmp_path / "alice"
+    index = FeatureIndex(directory, initial_capacity=2)
+    for name in ("shirt", "jeans", "boots"):
+        index.add_item(wardrobe_item(name, "tops", (10, 20, 30)))
+    index.remove(index.ids[1])
+    index.close()
+
+    ids = (directory / "ids.jsonl").read_text().splitlines()
+    assert len(ids) == 3 and "ids" not in json.loads((directory / "meta.json").read_text())
+    # An append whose count never committed is dropped on reopen
+    with open(directory / "ids.jsonl", "a") as f:
+        f.write('"torn')
+    reopened = FeatureIndex(directory)
+    assert reopened.ids == [json.loads(line) for line in ids] and len(reopened) == 2
+    reopened.add_item(wardrobe_item("scarf", "accessories", (1, 2, 3)))
+    assert FeatureIndex(directory).ids[-1].endswith("scarf.jpg")
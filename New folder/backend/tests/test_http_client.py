@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils.error_handlers import ImageProcessingError
+from utils.http_client import HTTPClient
+
+
+def run_against_server(scenario):
+    calls = {"flaky": 0}
+
+    async def small(request):
+        return web.Response(body=b"x" * 10)
+
+    async def flaky(request):
+        calls["flaky"] += 1
+        if calls["flaky"] < 3:
+            return web.Response(status=503)
+        return web.Response(body=b"ok")
+
+    async def streamed(request):
+        # No Content-Length, so the limit can only be enforced while reading
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for _ in range(100):
+            await response.write(b"y" * 1024)
+        await response.write_eof()
+        return response
+
+    async def missing(request):
+        return web.Response(status=404)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/small", small)
+        app.router.add_get("/flaky", flaky)
+        app.router.add_get("/streamed", streamed)
+        app.router.add_get("/missing", missing)
+        async with TestServer(app) as server:
+            client = HTTPClient(backoff=0.01, chunk_size=1024)
+            try:
+                return await scenario(client, lambda path: str(server.make_url(path)))
+            finally:
+                await client.close()
+
+    return asyncio.run(main()), calls
+
+
+def test_fetch_reuses_one_session_and_retries_transient_failures():
+    async def scenario(client, url):
+        first = await client.fetch_bytes(url("/small"))
+        session = client._session
+        second = await client.fetch_bytes(url("/flaky"))
+        return first, second, session is client._session
+
+    (first, second, same_session), calls = run_against_server(scenario)
+
+    assert first == b"x" * 10
+    assert second == b"ok"
+    assert same_session
+    assert calls["flaky"] == 3
+
+
+def test_oversized_bodies_are_rejected_while_streaming():
+    async def scenario(client, url):
+        with pytest.raises(ImageProcessingError, match="maximum file size"):
+            await client.fetch_bytes(url("/small"), max_size=5)
+        with pytest.raises(ImageProcessingError, match="maximum file size"):
+            await client.fetch_bytes(url("/streamed"), max_size=10 * 1024)
+        return await client.fetch_bytes(url("/streamed"), max_size=200 * 1024)
+
+    body, _ = run_against_server(scenario)
+
+    assert len(body) == 100 * 1024
+
+
+def test_client_errors_are_not_retried():
+    async def scenario(client, url):
+        with pytest.raises(ImageProcessingError) as error:
+            await client.fetch_bytes(url("/missing"))
+        return error.value.details
+
+    details, _ = run_against_server(scenario)
+
+    assert details["status"] == 404
@@ -0,0 +1,86 @@
+import io
+import struct
+import zlib
+
+import pytest
+from PIL import Image
+
+import config
+from src.agents import outfit_agent
+from utils.derivatives import create_derivatives
+from utils.image_probe import probe_image, validate_image
+from tests.conftest import make_garment_image
+
+
+def png_claiming(width: int, height: int) -> bytes:
+    """A tiny PNG whose header claims ``width`` x ``height`` pixels"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, format='PNG')
+    data = bytearray(buffer.getvalue())
+    ihdr = bytes(data[12:16]) + struct.pack('>II', width, height) + bytes(data[24:29])
+    data[16:24] = struct.pack('>II', width, height)
+    data[29:33] = struct.pack('>I', zlib.crc32(ihdr))
+    return bytes(data)
+
+
+def test_probe_reads_format_size_and_frames_from_the_header():
+    frames = [Image.new('RGB', (40, 30), color) for color in ('red', 'green', 'blue')]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format='GIF', save_all=True, append_images=frames[1:])
+
+    assert probe_image(make_garment_image(640, 480)) == ('JPEG', 640, 480, 1)
+    assert probe_image(buffer.getvalue()) == ('GIF', 40, 30, 3)
+
+
+def test_oversized_and_disallowed_images_are_refused_before_decoding(monkeypatch):
+    with pytest.raises(ValueError, match='pixel'):
+        validate_image(png_claiming(100_000, 100_000))
+    with pytest.raises(ValueError, match='pixel'):
+        validate_image(png_claiming(8000, 7000))
+
+    bmp = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(bmp, format='BMP')
+    with pytest.raises(ValueError, match='format BMP'):
+        validate_image(bmp.getvalue())
+    with pytest.raises(ValueError, match='Not a readable image'):
+        validate_image(b'<html>not an image</html>')
+
+    monkeypatch.setitem(config.IMAGE_CONFIG, 'max_file_size', 100)
+    with pytest.raises(ValueError, match='byte limit'):
+        validate_image(make_garment_image(64, 64))
+
+
+def test_extensions_are_checked_for_uploads(tmp_path):
+    disguised = tmp_path / 'shirt.svg'
+    disguised.write_bytes(make_garment_image(64, 64))
+    with pytest.raises(ValueError, match=r'\.svg'):
+        validate_image(disguised)
+    with pytest.raises(ValueError):
+        create_derivatives(disguised)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['shirt.svg']
+
+
+def test_analysis_falls_back_instead_of_decoding_a_bomb(monkeypatch):
+    classifier = outfit_agent.ClothingClassifier(analysis_cache=None)
+    monkeypatch.setattr(classifier, 'fetch_image', lambda url, deadline=None: png_claiming(100_000, 100_000))
+    assert classifier.analyze_image('http://example.com/shirt.png') == outfit_agent.FALLBACK_ANALYSIS
+    classifier.close()
+
+
+def test_refused_images_are_left_out_of_the_preview(monkeypatch):
+    bomb = png_claiming(9000, 9000)
+    classifier = outfit_agent.ClothingClassifier(analysis_cache=None)
+    monkeypatch.setattr(classifier, 'fetch_image', lambda url, deadline=None: bomb)
+
+    def no_refetch(*args, **kwargs):
+        raise AssertionError("the preview must not download a refused image")
+    monkeypatch.setattr(outfit_agent.requests, 'get', no_refetch)
+
+    result = outfit_agent.process_request(
+        {'preferences': {'prompt': 'casual'}, 'images': ['http://example.com/shirt.png']}, classifier
+    )[0]
+    classifier.close()
+    assert result['wardrobe_items']['others'][0]['hash'] is None
+    assert result['outfit_preview'] is None
+    with pytest.raises(ValueError, match='pixel'):
+        outfit_agent._open_preview_image('http://example.com/shirt.png', bomb)
@@ -0,0 +1,37 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from utils.lazy_import import HEAVY_MODULES, lazy_import
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def loaded_heavy_modules(code: str):
+    """Heavy modules in sys.modules after running ``code`` in a fresh interpreter"""
+    report = f"\nimport json, sys\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    completed = subprocess.run(
+        [sys.executable, "-c", code + report], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_lazy_module_imports_on_first_attribute():
+    proxy = lazy_import("colorsys")
+    assert "not loaded" in repr(proxy)
+    assert proxy.rgb_to_hsv(1, 0, 0) == (0.0, 1.0, 1)
+    assert "not loaded" not in repr(proxy)
+
+
+def test_text_only_request_skips_vision_stack():
+    code = (
+        "from src.agents import outfit_agent\n"
+        "result = outfit_agent.process_request({'preferences': {'prompt': 'casual'}, 'images': []})\n"
+        "assert 'error' not in result[0], result\n"
+    )
+    assert loaded_heavy_modules(code) == []
+
+
+def test_app_import_defers_agents_and_models():
+    assert loaded_heavy_modules("import main\n") == []
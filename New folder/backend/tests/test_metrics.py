@@ -0,0 +1,56 @@
+import io
+import json
+
+from utils.metrics import Counter, Gauge, Histogram, Registry, merge_snapshots, render
+
+
+def test_histogram_buckets_are_cumulative_in_the_exposition():
+    registry = Registry()
+    latency = Histogram("latency_seconds", "Latency", ["stage"], buckets=(0.1, 1.0), registry=registry)
+    fetch = latency.labels(stage="fetch")
+    for value in (0.05, 0.1, 0.5, 3.0):
+        fetch.observe(value)
+    with latency.labels(stage="decode").time():
+        pass
+
+    samples = registry.snapshot()["latency_seconds"]["samples"]
+
+    assert samples['latency_seconds_bucket{stage="fetch",le="0.1"}'] == 2
+    assert samples['latency_seconds_bucket{stage="fetch",le="1"}'] == 3
+    assert samples['latency_seconds_bucket{stage="fetch",le="+Inf"}'] == 4
+    assert samples['latency_seconds_count{stage="fetch"}'] == 4
+    assert samples['latency_seconds_sum{stage="fetch"}'] == 3.65
+    assert samples['latency_seconds_count{stage="decode"}'] == 1
+
+
+def test_snapshots_from_several_processes_merge_and_render():
+    def worker_snapshot(hits):
+        registry = Registry()
+        counter = Counter("cache_requests", "Lookups", ["result"], registry=registry)
+        counter.labels(result="hit").inc(hits)
+        Gauge("queue_depth", "Waiting", registry=registry).set_function(lambda: 2)
+        return registry.snapshot()
+
+    text = render(merge_snapshots([worker_snapshot(3), worker_snapshot(4)]))
+
+    assert "# TYPE cache_requests counter" in text
+    assert 'cache_requests_total{result="hit"} 7' in text
+    assert "queue_depth 4" in text
+
+
+def test_worker_responses_carry_stage_metrics(image_server):
+    from src.agents import outfit_agent
+    from tests.conftest import make_garment_image
+
+    base_url, images = image_server
+    images["shirt.jpg"] = make_garment_image(120, 100)
+    request = {"id": 1, "payload": {"images": [f"{base_url}/shirt.jpg"]}}
+    responses_out = io.StringIO()
+
+    outfit_agent.run_worker(io.StringIO(json.dumps(request) + "\n"), responses_out)
+
+    metrics = json.loads(responses_out.getvalue())["metrics"]
+    stages = metrics["stage_duration_seconds"]["samples"]
+    assert stages['stage_duration_seconds_count{stage="fetch"}'] >= 1
+    assert stages['stage_duration_seconds_count{stage="classification"}'] >= 1
+    assert stages['stage_duration_seconds_count{stage="preview_render"}'] >= 1
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from utils.model_scheduler import MicroBatcher, ModelScheduler
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Echoes how many items each prompt held and records when it was called"""
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def generate_content_async(self, contents):
+        self.calls.append((time.monotonic(), contents))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.latency)
+        self.active -= 1
+        items = [part for part in contents if isinstance(part, int)] if isinstance(contents, list) else []
+        return StubResponse(json.dumps([{"item": item} for item in items] or {"ok": True}))
+
+
+def test_concurrency_is_bounded():
+    model = StubModel(latency=0.05)
+    scheduler = ModelScheduler(model, requests_per_minute=6000, burst=20, max_concurrency=2)
+
+    async def scenario():
+        await asyncio.gather(*[scheduler.generate("prompt") for _ in range(6)])
+
+    asyncio.run(scenario())
+
+    assert len(model.calls) == 6
+    assert model.max_active == 2
+
+
+def test_token_bucket_spaces_calls_after_the_burst():
+    model = StubModel(latency=0)
+    scheduler = ModelScheduler(model, requests_per_minute=1200, burst=2, max_concurrency=10)
+
+    async def scenario():
+        await asyncio.gather(*[scheduler.generate("prompt") for _ in range(5)])
+
+    asyncio.run(scenario())
+
+    started = [at for at, _ in model.calls]
+    # Two burst tokens, then one call per 50ms
+    assert started[1] - started[0] < 0.02
+    assert started[-1] - started[0] == pytest.approx(0.15, abs=0.05)
+
+
+def test_items_arriving_together_share_one_model_call():
+    model = StubModel()
+    scheduler = ModelScheduler(model, requests_per_minute=6000, burst=20, max_concurrency=4)
+
+    async def handler(items):
+        contents = ["prompt"]
+        for item in items:
+            contents.extend(["Item:", item])
+        return json.loads(await scheduler.generate(contents))
+
+    batcher = MicroBatcher(handler, window=0.05, max_batch_size=4)
+
+    async def scenario():
+        return await asyncio.gather(*[batcher.submit(item) for item in range(6)])
+
+    results = asyncio.run(scenario())
+
+    # Each caller gets its own slice of the structured response
+    assert results == [{"item": item} for item in range(6)]
+    # Four fill the first batch, the other two go out when the window closes
+    assert len(model.calls) == 2
+    assert batcher.metrics()["mean_batch_size"] == 3
+
+
+def test_handler_failure_reaches_every_caller_in_the_batch():
+    async def handler(items):
+        return items[:-1]
+
+    batcher = MicroBatcher(handler, window=0.01, max_batch_size=8)
+
+    async def scenario():
+        return await asyncio.gather(
+            *[batcher.submit(item) for item in range(3)], return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_in_flight_batches_are_held_until_they_finish():
+    in_flight = []
+
+    async def handler(items):
+        in_flight.append(len(batcher._running))
+        await asyncio.sleep(0.01)
+        return items
+
+    batcher = MicroBatcher(handler, window=0.01, max_batch_size=2)
+
+    async def scenario():
+        return await asyncio.gather(*[batcher.submit(item) for item in range(4)])
+
+    assert asyncio.run(scenario()) == [0, 1, 2, 3]
+    assert in_flight and all(count >= 1 for count in in_flight)
+    assert not batcher._running
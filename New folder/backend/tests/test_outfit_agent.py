@@ -0,0 +1,277 @@
+import io
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from src.agents import outfit_agent
+from utils.preview_cache import PreviewCache
+from tests.conftest import make_garment_image
+
+
+def test_worker_answers_each_request_line_in_order():
+    requests_in = io.StringIO(
+        json.dumps({"id": 1, "payload": {"preferences": {"prompt": "party"}}}) + "\n"
+        "\n"
+        + json.dumps({"id": 2, "payload": {"images": []}}) + "\n"
+    )
+    responses_out = io.StringIO()
+
+    outfit_agent.run_worker(requests_in, responses_out)
+
+    responses = [json.loads(line) for line in responses_out.getvalue().splitlines()]
+    assert [r["id"] for r in responses] == [1, 2]
+    assert responses[0]["result"][0]["suggestions"]["accessories"][0] == "Statement necklace"
+    assert responses[1]["result"][0]["wardrobe_items"] == {}
+
+
+def test_worker_survives_malformed_lines():
+    responses_out = io.StringIO()
+
+    outfit_agent.run_worker(io.StringIO("not json\n"), responses_out)
+
+    response = json.loads(responses_out.getvalue())
+    assert response["id"] is None
+    assert "error" in response["result"][0]
+
+
+def test_analyze_images_keeps_order_and_isolates_slow_urls(image_server):
+    base_url, images = image_server
+    images['shirt.jpg'] = make_garment_image(200, 200)
+    images['jeans.jpg'] = make_garment_image(100, 200, color=(20, 20, 120))
+    images['boot.jpg'] = make_garment_image(120, 120, color=(60, 40, 20))
+
+    classifier = outfit_agent.ClothingClassifier(analysis_workers=2, image_timeout=1.0)
+    try:
+        classifier.warm_up()
+        analyses = classifier.analyze_images([
+            f"{base_url}/shirt.jpg",
+            f"{base_url}/slow/boot.jpg",
+            f"{base_url}/jeans.jpg",
+        ])
+    finally:
+        classifier.close()
+
+    assert [a['category'] for a in analyses] == ['tops', 'others', 'bottoms']
+    assert analyses[1] == outfit_agent.FALLBACK_ANALYSIS
+    assert analyses[2]['size'] == {'width': 100, 'height': 200}
+
+
+def test_image_deadline_bounds_the_whole_download(image_server):
+    base_url, images = image_server
+    images['coat.jpg'] = make_garment_image(200, 200)
+
+    # Every read arrives well within the socket timeout; only the total is slow
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        outfit_agent.fetch_image_bytes(f"{base_url}/trickle/coat.jpg", timeout=0.5)
+    assert time.monotonic() - start < 1.0
+
+
+def test_timed_out_images_release_their_fetch_thread(image_server):
+    base_url, images = image_server
+    images['coat.jpg'] = make_garment_image(200, 200)
+    images['shirt.jpg'] = make_garment_image(200, 200)
+
+    classifier = outfit_agent.ClothingClassifier(fetch_workers=1, analysis_workers=1, image_timeout=0.5)
+    try:
+        classifier.warm_up()
+        first = classifier.analyze_images([f"{base_url}/trickle/coat.jpg"])
+        start = time.monotonic()
+        # The single fetch thread must be free again for the next request
+        second = classifier.analyze_images([f"{base_url}/shirt.jpg"])
+    finally:
+        classifier.close()
+
+    assert first == [outfit_agent.FALLBACK_ANALYSIS]
+    assert second[0]['category'] == 'tops'
+    assert time.monotonic() - start < 0.5
+
+
+def test_image_store_respects_its_byte_budget():
+    store = outfit_agent.ImageStore(max_bytes=2 * 300 * 300 * 3)
+    thumbnail = np.zeros((300, 300, 3), dtype=np.uint8)
+
+    assert store.put('a', thumbnail)
+    assert store.put('b', thumbnail)
+    assert not store.put('c', thumbnail)
+    assert store.get('c') is None
+    assert store.used_bytes == 2 * thumbnail.nbytes
+
+
+def test_preview_reuses_thumbnails_from_analysis(image_server, monkeypatch, tmp_path):
+    monkeypatch.setattr(outfit_agent, 'BACKEND_DIR', str(tmp_path))
+    base_url, images = image_server
+    images['shirt.jpg'] = make_garment_image(640, 480)
+    url = f"{base_url}/shirt.jpg"
+
+    store = outfit_agent.ImageStore()
+    classifier = outfit_agent.ClothingClassifier()
+    analysis = classifier.analyze_image(url, store)
+    classifier.close()
+    assert store.get(url).shape == (225, 300, 3)
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("preview should not download the image again")
+    monkeypatch.setattr(outfit_agent.requests, 'get', no_network)
+
+    preview = outfit_agent.create_outfit_preview(
+        {analysis['category']: [{'url': url}]}, store
+    )
+    assert preview.startswith('data:image/jpeg;base64,')
+
+
+def test_cached_analysis_skips_decoding_and_keeps_bytes_for_preview(image_server, monkeypatch):
+    base_url, images = image_server
+    images['shirt.jpg'] = make_garment_image(200, 100)
+    url = f"{base_url}/shirt.jpg"
+
+    classifier = outfit_agent.ClothingClassifier()
+    first = classifier.analyze_image(url)
+
+    def no_decode(image_bytes):
+        raise AssertionError("cache hit should not decode the image")
+    monkeypatch.setattr(outfit_agent, 'extract_colors', no_decode)
+
+    store = outfit_agent.ImageStore()
+    second = classifier.analyze_image(url, store)
+    classifier.close()
+
+    assert second == first
+    assert store.get(url) == images['shirt.jpg']
+    assert classifier.analysis_cache.stats()['hits'] == 1
+
+
+def test_previews_encode_in_memory_and_only_persist_on_request(monkeypatch, tmp_path):
+    monkeypatch.setattr(outfit_agent, 'BACKEND_DIR', str(tmp_path))
+    monkeypatch.setattr(outfit_agent, 'preview_cache', PreviewCache(10 * 1024 * 1024))
+    thumbnail = np.full((200, 150, 3), 90, dtype=np.uint8)
+    store = outfit_agent.ImageStore()
+    store.put('shirt', thumbnail)
+    wardrobe = {'tops': [{'url': 'shirt', 'hash': 'a' * 64}]}
+
+    inline = outfit_agent.create_outfit_preview(wardrobe, store, mode='inline')
+    assert inline.startswith('data:image/jpeg;base64,')
+    assert not (tmp_path / 'uploads').exists()
+
+    url = outfit_agent.create_outfit_preview(wardrobe, store, mode='file')
+    assert url.startswith('/api/outfits/previews/')
+    saved = tmp_path / 'uploads' / 'previews' / f"outfit_preview_{url.rsplit('/', 1)[1]}.jpg"
+    assert saved.read_bytes()[:2] == b'\xff\xd8'
+    assert outfit_agent.create_outfit_preview(wardrobe, store, mode='none') is None
+
+
+def test_repeated_item_combinations_reuse_the_cached_preview(monkeypatch, tmp_path):
+    monkeypatch.setattr(outfit_agent, 'BACKEND_DIR', str(tmp_path))
+    monkeypatch.setattr(outfit_agent, 'preview_cache', PreviewCache(10 * 1024 * 1024))
+    store = outfit_agent.ImageStore()
+    store.put('shirt', np.full((200, 150, 3), 90, dtype=np.uint8))
+    store.put('jeans', np.full((250, 120, 3), 30, dtype=np.uint8))
+    shirt = {'url': 'shirt', 'hash': '1' * 64}
+    jeans = {'url': 'jeans', 'hash': '2' * 64}
+
+    first = outfit_agent.create_outfit_preview({'tops': [shirt], 'bottoms': [jeans]}, store, mode='file')
+
+    def no_render(*args, **kwargs):
+        raise AssertionError("cached preview should not be rendered again")
+    monkeypatch.setattr(outfit_agent, 'render_outfit_preview', no_render)
+
+    # Same items in a different order hit memory; a fresh process hits disk
+    assert outfit_agent.create_outfit_preview({'bottoms': [jeans], 'tops': [shirt]}, store, mode='file') == first
+    monkeypatch.setattr(outfit_agent, 'preview_cache', PreviewCache(10 * 1024 * 1024))
+    assert outfit_agent.create_outfit_preview({'tops': [shirt], 'bottoms': [jeans]}, store, mode='file') == first
+    assert outfit_agent.preview_cache.stats()['disk_hits'] == 1
+
+    # A different combination is a miss
+    other = {'url': 'shirt', 'hash': '3' * 64}
+    assert outfit_agent.create_outfit_preview({'tops': [other]}, store, mode='file') is None
+
+
+def test_preview_cleanup_enforces_age_and_count(tmp_path):
+    now = time.time()
+    for age in range(5):
+        path = tmp_path / f'outfit_preview_{age}.jpg'
+        path.write_bytes(b'x')
+        os.utime(path, (now - age * 3600, now - age * 3600))
+    (tmp_path / 'keep.txt').write_text('not a preview')
+
+    removed = outfit_agent.cleanup_previews(str(tmp_path), max_age=3.5 * 3600, max_files=3)
+
+    assert removed == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        'keep.txt', 'outfit_preview_0.jpg', 'outfit_preview_1.jpg', 'outfit_preview_2.jpg'
+    ]
+
+
+def test_uploads_are_analysed_from_their_derivatives(monkeypatch, tmp_path):
+    monkeypatch.setattr(outfit_agent, 'BACKEND_DIR', str(tmp_path))
+    upload_dir = tmp_path / 'uploads'
+    upload_dir.mkdir()
+    original = upload_dir / 'shirt.jpg'
+    original.write_bytes(make_garment_image(1600, 1200))
+
+    classifier = outfit_agent.ClothingClassifier()
+    def no_fetch(image_url, deadline=None):
+        raise AssertionError("local uploads should not be downloaded")
+    monkeypatch.setattr(classifier, 'fetch_image', no_fetch)
+
+    store = outfit_agent.ImageStore()
+    analysis = classifier.analyze_image('http://localhost/uploads/shirt.jpg', store, str(original))
+    classifier.close()
+
+    assert analysis['category'] == 'tops'
+    assert analysis['size'] == {'width': 1600, 'height': 1200}
+    assert (upload_dir / 'shirt.analysis.jpg').exists()
+    assert store.get('http://localhost/uploads/shirt.jpg') == (upload_dir / 'shirt.thumb.jpg').read_bytes()
+
+
+def test_paths_outside_the_upload_dir_are_not_read(monkeypatch, tmp_path):
+    monkeypatch.setattr(outfit_agent, 'BACKEND_DIR', str(tmp_path / 'backend'))
+    outside = tmp_path / 'secret.jpg'
+    outside.write_bytes(make_garment_image(100, 100))
+
+    assert outfit_agent.upload_path(str(outside)) is None
+    assert outfit_agent.upload_path(str(tmp_path / 'backend' / 'uploads' / '..' / '..' / 'secret.jpg')) is None
+
+
+def test_file_uris_and_local_paths_are_read_from_disk(monkeypatch, tmp_path):
+    monkeypatch.setattr(outfit_agent, 'BACKEND_DIR', str(tmp_path))
+    upload_dir = tmp_path / 'uploads'
+    upload_dir.mkdir()
+    original = upload_dir / 'jean.jpg'
+    original.write_bytes(make_garment_image(600, 900))
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("local uploads should not be downloaded")
+    monkeypatch.setattr(outfit_agent.requests, 'get', no_network)
+
+    classifier = outfit_agent.ClothingClassifier()
+    monkeypatch.setattr(classifier, 'fetch_image', no_network)
+    store = outfit_agent.ImageStore(max_bytes=0)
+    by_uri = classifier.analyze_image(original.as_uri(), store)
+    by_path = classifier.analyze_image(str(original))
+    classifier.close()
+
+    assert by_uri['category'] == by_path['category'] == 'bottoms'
+    assert by_uri['size'] == {'width': 600, 'height': 900}
+    # Nothing fitted in the store, so the preview maps the stored thumbnail
+    wardrobe = {'bottoms': [{'url': original.as_uri(), 'hash': by_uri['digest']}]}
+    assert outfit_agent.render_outfit_preview(wardrobe, store)[500, 400].tolist() != [255, 255, 255]
+
+
+def test_local_references_outside_the_upload_dir_are_refused(monkeypatch, tmp_path):
+    monkeypatch.setattr(outfit_agent, 'BACKEND_DIR', str(tmp_path / 'backend'))
+    (tmp_path / 'backend' / 'uploads').mkdir(parents=True)
+    outside = tmp_path / 'secret.jpg'
+    outside.write_bytes(make_garment_image(100, 100))
+
+    classifier = outfit_agent.ClothingClassifier()
+    def no_fetch(image_url, deadline=None):
+        raise AssertionError("local references must never fall through to HTTP")
+    monkeypatch.setattr(classifier, 'fetch_image', no_fetch)
+    for ref in (outside.as_uri(), str(outside), 'file://otherhost/etc/passwd'):
+        assert classifier.analyze_image(ref) == outfit_agent.FALLBACK_ANALYSIS
+    classifier.close()
+    assert outfit_agent.local_image_path('https://example.com/shirt.jpg') is None
@@ -0,0 +1,74 @@
+import random
+import time
+
+from utils.outfit_engine import harmony_matrix, parse_color, rank_outfits, _hsv
+
+import numpy as np
+
+
+def garment(name, color, confidence=0.8, occasion_tags=None):
+    return {
+        "url": f"http://localhost:5000/uploads/{name}.jpg",
+        "type": "",
+        "colors": [color],
+        "confidence": confidence,
+        "occasion_tags": occasion_tags or []
+    }
+
+
+def test_colours_parse_from_both_formats():
+    assert parse_color("rgb(10, 20,30)") == (10, 20, 30)
+    assert parse_color("#0A141e") == (10, 20, 30)
+    assert parse_color("#GOLD") is None
+
+
+def test_complementary_and_neutral_pairs_beat_clashing_hues():
+    hsv = _hsv(np.array([[200, 30, 30], [30, 200, 200], [200, 200, 30], [128, 128, 128]]))
+    scores = harmony_matrix(hsv[:1], hsv)[0]
+    red_cyan, red_yellow, red_grey = scores[1], scores[2], scores[3]
+    assert red_cyan > red_yellow
+    assert red_grey > red_yellow
+
+
+def test_ranking_respects_occasion_tags_and_fills_outfit_schema():
+    wardrobe = {
+        "tops": [garment("tee", "rgb(200,30,30)", occasion_tags=["gym"]),
+                 garment("shirt", "rgb(240,240,240)", occasion_tags=["work"])],
+        "bottoms": [garment("chinos", "rgb(30,40,90)", occasion_tags=["work"]),
+                    garment("shorts", "rgb(200,200,30)", occasion_tags=["gym"])],
+        "shoes": [garment("loafer", "rgb(60,40,20)", occasion_tags=["work"])],
+        "accessories": [garment("watch", "rgb(120,120,120)")],
+    }
+
+    outfits = rank_outfits(wardrobe, "Work meeting", k=2)
+
+    assert len(outfits) == 2
+    best = outfits[0]
+    assert [item["image_url"].rsplit("/", 1)[1] for item in best["items"]] == [
+        "shirt.jpg", "chinos.jpg", "loafer.jpg"
+    ]
+    assert best["confidence_score"] >= outfits[1]["confidence_score"]
+    assert 0 < best["confidence_score"] <= 1
+    assert set(best["items"][0]) == {
+        "category", "style", "image_url", "occasion_tags", "color", "style_tags"
+    }
+
+
+def test_large_wardrobes_rank_in_milliseconds():
+    rng = random.Random(0)
+
+    def items(n):
+        return [garment(f"{i}", "rgb(%d,%d,%d)" % tuple(rng.randrange(256) for _ in range(3)),
+                        confidence=rng.random())
+                for i in range(n)]
+
+    wardrobe = {"tops": items(300), "bottoms": items(300), "shoes": items(300),
+                "outerwear": items(100), "accessories": items(100)}
+
+    rank_outfits(wardrobe, "party", k=5)
+    start = time.perf_counter()
+    outfits = rank_outfits(wardrobe, "party", k=5)
+    elapsed = time.perf_counter() - start
+
+    assert len(outfits) == 5
+    assert elapsed < 0.25
@@ -0,0 +1,23 @@
+from utils.preview_cache import PreviewCache, preview_key
+
+
+def test_key_ignores_item_order_but_not_layout():
+    items = [("tops", "aa"), ("bottoms", "bb")]
+    assert preview_key(items, "1") == preview_key(list(reversed(items)), "1")
+    assert preview_key(items, "1") != preview_key(items, "2")
+    assert preview_key(items, "1", "jpeg:85") != preview_key(items, "1", "webp:85")
+
+
+def test_memory_tier_is_bounded_and_backed_by_disk(tmp_path):
+    cache = PreviewCache(max_bytes=10)
+    cache.put("a", b"12345", str(tmp_path / "a.jpg"))
+    cache.put("b", b"12345")
+    cache.put("c", b"12345")
+
+    # "a" was evicted from memory but is still on disk; "b" lived in memory only
+    assert cache.get("a", str(tmp_path / "a.jpg")) == b"12345"
+    assert cache.get("b") is None
+    assert cache.get("c") == b"12345"
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.stats()["bytes"] <= 10
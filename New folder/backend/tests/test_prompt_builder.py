@@ -0,0 +1,62 @@
+from utils.prompt_builder import PromptBuilder
+
+
+def item(category, style, occasions, style_tags=None, color=None):
+    return {
+        "category": category,
+        "style": style,
+        "image_url": f"http://localhost:5000/uploads/{category}-{style}.jpg",
+        "occasion_tags": occasions,
+        "style_tags": style_tags,
+        "color": color
+    }
+
+
+WARDROBE = {
+    "tops": [
+        item("tops", "casual", ["beach"]),
+        item("tops", "formal", ["Business Dinner", "work"], ["classic"], {"name": "white"}),
+        item("tops", "sporty", ["gym"]),
+        item("tops", "smart", ["dinner"], color={"rgb": [10, 20, 30]}),
+    ],
+    "shoes": [item("shoes", "sneakers", ["gym"]), item("shoes", "trainers", ["beach"])],
+}
+
+
+def test_selection_prefers_occasion_matches_and_keeps_every_category():
+    builder = PromptBuilder(max_per_category=2, min_per_category=1)
+
+    selected = builder.select("business dinner", WARDROBE)
+
+    tops = [entry["style"] for entry in selected if entry["category"] == "tops"]
+    shoes = [entry["style"] for entry in selected if entry["category"] == "shoes"]
+    assert tops == ["formal", "smart"]
+    # Nothing matches, but the category still gets a candidate
+    assert shoes == ["sneakers"]
+
+
+def test_prompt_is_a_compact_table_without_urls():
+    builder = PromptBuilder(max_per_category=2, min_per_category=1)
+
+    prompt, id_map = builder.build("Business dinner", WARDROBE)
+
+    assert "1|tops|formal|business dinner;work|classic|white" in prompt
+    assert "2|tops|smart|dinner||#0a141e" in prompt
+    assert "image_url" not in prompt and "http" not in prompt
+    assert set(id_map) == {"1", "2", "3"}
+
+
+def test_answer_ids_map_back_to_full_items():
+    builder = PromptBuilder(max_per_category=2, min_per_category=1)
+    _, id_map = builder.build("business dinner", WARDROBE)
+
+    suggestion = builder.resolve(
+        {"items": ["1", 3, "99"], "suggested_accessories": [], "styling_tips": "Tuck it in",
+         "confidence_score": "0.9"},
+        id_map
+    )
+
+    assert [entry["style"] for entry in suggestion["items"]] == ["formal", "sneakers"]
+    assert suggestion["items"][0]["image_url"].endswith("tops-formal.jpg")
+    assert suggestion["confidence_score"] == 0.9
+    assert suggestion["styling_tips"] == "Tuck it in"
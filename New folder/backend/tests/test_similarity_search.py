@@ -0,0 +1,84 @@
+import numpy as np
+
+from utils.feature_index import FeatureIndex, get_feature_index
+from utils.similarity_search import SimilaritySearch, get_similarity_search, matching_items_for
+from benchmarks.bench_similarity_search import make_catalogue
+
+
+def wardrobe_item(name, category, rgb, occasion_tags=()):
+    return {
+        "image_url": f"/uploads/{name}.jpg",
+        "category": category,
+        "occasion_tags": list(occasion_tags),
+        "image_features": {"dominant_color": rgb, "brightness": float(max(rgb))},
+    }
+
+
+def test_matches_come_from_other_categories_with_close_colour_and_tags():
+    index = get_feature_index("carol")
+    for item in [
+        wardrobe_item("navy-shirt", "tops", (20, 30, 90), ["work"]),
+        wardrobe_item("navy-chinos", "bottoms", (25, 35, 95), ["work"]),
+        wardrobe_item("red-shorts", "bottoms", (220, 20, 20), ["beach"]),
+        wardrobe_item("navy-loafers", "shoes", (30, 30, 80), ["work"]),
+        wardrobe_item("blue-tee", "tops", (20, 30, 100), ["work"]),
+    ]:
+        index.add_item(item)
+
+    matches = get_similarity_search("carol").matching_for_id("/uploads/navy-shirt.jpg", k=2)
+
+    assert [match["id"] for match in matches] == ["/uploads/navy-chinos.jpg", "/uploads/navy-loafers.jpg"]
+    assert {match["category"] for match in matches} == {"bottoms", "shoes"}
+
+    # A new item is matched before it is indexed, and the search rebuilds once it is
+    new = wardrobe_item("navy-skirt", "bottoms", (22, 32, 92), ["work"])
+    assert matching_items_for("carol", new, k=1)[0]["id"] in {
+        "/uploads/navy-shirt.jpg", "/uploads/blue-tee.jpg"
+    }
+    index.add_item(new)
+    assert "/uploads/navy-skirt.jpg" in [
+        match["id"] for match in get_similarity_search("carol").matching_for_id("/uploads/blue-tee.jpg", k=3)
+    ]
+
+
+def test_ivf_index_agrees_with_brute_force():
+    vectors, ids, categories = make_catalogue(5000)
+    exact = SimilaritySearch(vectors, ids, categories, ivf_threshold=10 ** 6)
+    ivf = SimilaritySearch(vectors, ids, categories, ivf_threshold=1000, nprobe=8)
+    assert ivf.is_partitioned and not exact.is_partitioned
+
+    queries = np.random.default_rng(0).choice(ids, 50, replace=False)
+    found = sum(
+        len({m["id"] for m in exact.matching_for_id(q, 10)} & {m["id"] for m in ivf.matching_for_id(q, 10)})
+        for q in queries
+    )
+    assert found / 500 > 0.85
+
+
+def test_updates_reuse_the_ivf_cells_until_enough_rows_change(tmp_path):
+    rng = np.random.default_rng(1)
+    categories = ["tops", "bottoms", "shoes"]
+    index = FeatureIndex(tmp_path / "dave")
+    index.add_items([
+        wardrobe_item(f"item{i}", categories[i % 3], tuple(int(c) for c in rng.integers(0, 256, 3)))
+        for i in range(400)
+    ])
+    # Probing every cell makes the IVF search exact, so results are comparable
+    search = SimilaritySearch.from_feature_index(index, ivf_threshold=100, nprobe=400)
+    assert search.is_partitioned
+
+    index.add_item(wardrobe_item("new", "tops", (10, 200, 10)))
+    index.add_item(wardrobe_item("item5", "shoes", (200, 10, 10)))
+    index.remove("/uploads/item7.jpg")
+    updated = search.updated(index)
+    exact = SimilaritySearch.from_feature_index(index, ivf_threshold=10 ** 6)
+
+    assert updated.centroids is search.centroids and updated.changed_since_training == 3
+    assert len(updated.ids) == 400 and "/uploads/item7.jpg" not in updated.ids
+    for item_id in ("/uploads/new.jpg", "/uploads/item5.jpg", "/uploads/item0.jpg"):
+        assert updated.matching_for_id(item_id, 5) == exact.matching_for_id(item_id, 5)
+
+    for i in range(100):
+        index.remove(f"/uploads/item{i}.jpg")
+    retrained = updated.updated(index)
+    assert retrained.centroids is not search.centroids and retrained.changed_since_training == 0
@@ -0,0 +1,106 @@
+import asyncio
+
+from utils.suggestion_cache import SuggestionCache, normalize_occasion, wardrobe_fingerprint
+
+
+WARDROBE = {"tops": [{"name": "white shirt"}], "bottoms": [{"name": "chinos"}]}
+
+
+def test_occasion_and_wardrobe_keys_are_normalised():
+    assert normalize_occasion("  Business   Casual! ") == "business casual"
+    reordered = {"bottoms": [{"name": "chinos"}], "tops": [{"name": "white shirt"}]}
+    assert wardrobe_fingerprint(WARDROBE) == wardrobe_fingerprint(reordered)
+    assert wardrobe_fingerprint(WARDROBE) != wardrobe_fingerprint({**WARDROBE, "shoes": []})
+
+
+def test_repeat_requests_hit_and_record_saved_latency():
+    cache = SuggestionCache(ttl=60, max_entries=10)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"selected_items": ["white shirt", "chinos"]}
+
+    async def scenario():
+        first = await cache.get_or_compute("alice", "Dinner", WARDROBE, compute)
+        second = await cache.get_or_compute("alice", "dinner.", WARDROBE, compute)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first == second
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["saved_latency_seconds"] >= 0.02
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = SuggestionCache(ttl=60, max_entries=10)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"ok": True}
+
+    async def scenario():
+        return await asyncio.gather(*[
+            cache.get_or_compute("alice", "party", WARDROBE, compute) for _ in range(5)
+        ])
+
+    assert asyncio.run(scenario()) == [{"ok": True}] * 5
+    assert len(calls) == 1
+
+
+def test_cancelled_leader_does_not_fail_the_followers():
+    cache = SuggestionCache(ttl=60, max_entries=10)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    async def scenario():
+        leader = asyncio.create_task(cache.get_or_compute("alice", "party", WARDROBE, compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_compute("alice", "party", WARDROBE, compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower, leader.cancelled()
+
+    assert asyncio.run(scenario()) == ({"ok": True}, True)
+    assert len(calls) == 1
+    assert cache.get("alice", "party", WARDROBE) == {"ok": True}
+
+
+def test_invalidation_only_touches_one_user():
+    cache = SuggestionCache(ttl=60, max_entries=10)
+    cache.put("alice", "work", WARDROBE, {"for": "alice"})
+    cache.put("bob", "work", WARDROBE, {"for": "bob"})
+
+    cache.invalidate_user("alice")
+
+    assert cache.get("alice", "work", WARDROBE) is None
+    assert cache.get("bob", "work", WARDROBE) == {"for": "bob"}
+
+
+def test_entries_expire_and_least_recent_are_evicted():
+    cache = SuggestionCache(ttl=0.01, max_entries=2)
+    cache.put("alice", "work", WARDROBE, 1)
+    asyncio.run(asyncio.sleep(0.02))
+    assert cache.get("alice", "work", WARDROBE) is None
+    assert cache.stats()["expirations"] == 1
+
+    cache.ttl = 60
+    cache.put("alice", "a", WARDROBE, 1)
+    cache.put("alice", "b", WARDROBE, 2)
+    cache.get("alice", "a", WARDROBE)
+    cache.put("alice", "c", WARDROBE, 3)
+
+    assert cache.get("alice", "b", WARDROBE) is None
+    assert cache.get("alice", "a", WARDROBE) == 1
+    assert cache.stats()["evictions"] == 1
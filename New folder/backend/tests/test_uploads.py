@@ -0,0 +1,37 @@
+import pytest
+
+from utils.uploads import is_remote, local_upload, read_upload
+
+
+def test_local_upload_resolves_paths_and_file_uris(tmp_path):
+    image = tmp_path / 'nested dir' / 'shirt.jpg'
+    image.parent.mkdir()
+    image.write_bytes(b'jpeg')
+
+    assert local_upload(str(image), tmp_path) == str(image)
+    assert local_upload(image.as_uri(), tmp_path) == str(image)
+    assert local_upload('file://localhost' + image.as_posix(), tmp_path) == str(image)
+    assert local_upload('http://localhost:8000/uploads/shirt.jpg', tmp_path) is None
+    assert is_remote('HTTPS://example.com/a.jpg') and not is_remote(image.as_uri())
+
+
+def test_local_upload_refuses_escapes_and_missing_files(tmp_path):
+    upload_dir = tmp_path / 'uploads'
+    upload_dir.mkdir()
+    (tmp_path / 'secret.jpg').write_bytes(b'secret')
+    (upload_dir / 'link.jpg').symlink_to(tmp_path / 'secret.jpg')
+
+    for ref in (str(upload_dir / '..' / 'secret.jpg'), str(upload_dir / 'link.jpg'),
+                (upload_dir / 'missing.jpg').as_uri(), 'file://fileserver/share/shirt.jpg'):
+        with pytest.raises(ValueError):
+            local_upload(ref, upload_dir)
+
+
+def test_read_upload_enforces_the_size_limit(tmp_path):
+    image = tmp_path / 'shirt.jpg'
+    image.write_bytes(b'x' * 100)
+    assert read_upload(str(image)) == b'x' * 100
+    (tmp_path / 'empty.jpg').write_bytes(b'')
+    assert read_upload(str(tmp_path / 'empty.jpg')) == b''
+    with pytest.raises(ValueError):
+        read_upload(str(image), max_size=99)
@@ -0,0 +1,29 @@
+from utils.feature_index import item_features
+from utils.image_processing import item_image_features
+from tests.conftest import make_garment_image
+
+# What Gemini returns: colour names, which the index can not use
+STYLE_ANALYSIS = {"style_tags": ["casual"], "color_palette": ["navy", "white"]}
+
+
+def test_uploaded_items_are_indexed_by_their_pixels(tmp_path):
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    image_data = make_garment_image(120, 160, color=(30, 60, 150))
+    upload = upload_dir / "coat.jpg"
+    upload.write_bytes(image_data)
+
+    features = item_image_features(str(upload), image_data, upload_dir)
+    rgb, brightness = item_features({"style_analysis": STYLE_ANALYSIS, "image_features": features})
+
+    assert rgb != (0, 0, 0) and rgb[2] > rgb[0] and brightness > 0
+    assert features["processed_path"].endswith(".thumb.jpg")
+
+
+def test_remote_items_are_indexed_from_the_downloaded_bytes(tmp_path):
+    image_data = make_garment_image(120, 160, color=(150, 40, 30))
+
+    features = item_image_features("https://example.com/coat.jpg", image_data, tmp_path)
+    rgb, brightness = item_features({"style_analysis": STYLE_ANALYSIS, "image_features": features})
+
+    assert rgb[0] > rgb[2] and brightness > 0
@@ -0,0 +1,47 @@
+import asyncio
+
+from services.wardrobe_service import WardrobeService
+from utils.database import Database
+from utils.db_manager import AsyncDatabase
+from utils.feature_index import get_feature_index
+
+
+class StubAIServices:
+    def __init__(self):
+        self.analysed = []
+
+    async def analyze_style(self, image_url):
+        self.analysed.append(image_url)
+        return {"style_tags": ["smart"], "style_category": "Business Casual", "color_palette": ["navy"]}
+
+
+def garment(name, category, rgb):
+    return {
+        "image_url": f"/uploads/{name}.jpg",
+        "category": category,
+        "occasion_tags": ["Work"],
+        "image_features": {"dominant_color": rgb, "brightness": float(max(rgb)),
+                           "processed_path": f"/uploads/{name}.thumb.jpg"},
+    }
+
+
+def test_added_items_are_stored_indexed_and_matched(tmp_path):
+    ai_services = StubAIServices()
+    store = AsyncDatabase(Database(tmp_path / "wardrobe.db"))
+    service = WardrobeService(ai_services=ai_services, db=store)
+
+    async def scenario():
+        await service.add_item(garment("chinos", "bottoms", (25, 35, 95)), "erin")
+        added = await service.add_item(garment("shirt", "tops", (20, 30, 90)), "erin")
+        wardrobe = await store.get_user_wardrobe("erin")
+        await store.close()
+        return added, wardrobe
+
+    added, wardrobe = asyncio.run(scenario())
+
+    assert ai_services.analysed == ["/uploads/chinos.thumb.jpg", "/uploads/shirt.thumb.jpg"]
+    recommendations = added["recommendations"]
+    assert [match["id"] for match in recommendations["matching_items"]] == ["/uploads/chinos.jpg"]
+    assert recommendations["occasions"] == ["business casual", "work"]
+    assert wardrobe["tops"]["style_analysis"]["style_category"] == "Business Casual"
+    assert len(get_feature_index("erin")) == 2
@@ -0,0 +1,89 @@
+import asyncio
+
+from utils.db_manager import AsyncDatabase
+from utils.write_behind import WriteBehindBuffer
+
+
+class CountingDatabase(AsyncDatabase):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    async def update_many(self, updates):
+        self.batches.append(updates)
+        await super().update_many(updates)
+
+
+def test_repeated_updates_coalesce_into_one_batched_write():
+    async def scenario():
+        db = CountingDatabase()
+        buffer = WriteBehindBuffer(db, flush_interval=60, max_pending=100)
+
+        await buffer.update_user_wardrobe("alice", {"tops": [1]})
+        await buffer.update_user_wardrobe("alice", {"tops": [1, 2]})
+        await buffer.update_user_wardrobe("bob", {"shoes": [3]})
+        pending = buffer.metrics()
+        visible = await buffer.get_user_wardrobe("alice")
+        stored_before_flush = await db.get_user_wardrobe("alice")
+
+        await buffer.close()
+        stored = await db.load()
+        await db.close()
+        return db.batches, pending, visible, stored_before_flush, stored, buffer.metrics()
+
+    batches, pending, visible, stored_before_flush, stored, after = asyncio.run(scenario())
+
+    assert pending["pending_mutations"] == 2
+    assert pending["mutations_coalesced"] == 1
+    assert visible == {"tops": [1, 2]}
+    assert stored_before_flush == {}
+    assert batches == [{"alice": {"tops": [1, 2]}, "bob": {"shoes": [3]}}]
+    assert stored["users"]["alice"] == {"tops": [1, 2]}
+    assert after["pending_mutations"] == 0
+    assert after["flushes"] == 1
+
+
+def test_count_threshold_and_interval_both_trigger_flushes():
+    async def scenario():
+        db = CountingDatabase()
+        buffer = WriteBehindBuffer(db, flush_interval=0.05, max_pending=2)
+
+        await buffer.update_user_wardrobe("alice", {"tops": [1], "shoes": [2]})
+        flushed_by_count = len(db.batches)
+
+        await buffer.update_user_wardrobe("bob", {"tops": [3]})
+        await asyncio.sleep(0.2)
+        flushed_by_interval = len(db.batches)
+
+        await buffer.close()
+        await db.close()
+        return flushed_by_count, flushed_by_interval
+
+    assert asyncio.run(scenario()) == (1, 2)
+
+
+def test_failed_flush_keeps_mutations_without_clobbering_newer_ones():
+    async def scenario():
+        db = CountingDatabase()
+        buffer = WriteBehindBuffer(db, flush_interval=60, max_pending=100)
+        await buffer.update_user_wardrobe("alice", {"tops": [1], "shoes": [1]})
+
+        original = db.update_many
+
+        async def failing_update_many(updates):
+            await buffer.update_user_wardrobe("alice", {"tops": [2]})
+            raise RuntimeError("disk full")
+
+        db.update_many = failing_update_many
+        try:
+            await buffer.flush()
+        except RuntimeError:
+            pass
+        db.update_many = original
+
+        await buffer.close()
+        wardrobe = await db.get_user_wardrobe("alice")
+        await db.close()
+        return wardrobe
+
+    assert asyncio.run(scenario()) == {"tops": [2], "shoes": [1]}
@@ -1,93 +1,159 @@
+from __future__ import annotations
+
 from typing import Dict, List, Optional
 import os
 import asyncio
-import google.generativeai as genai
-from PIL import Image
 import io
-import aiohttp
 from fastapi import HTTPException
 import json
+from utils.analysis_cache import AnalysisCache, image_digest
+from utils.http_client import HTTPClient, http_client
+from utils.model_scheduler import ModelScheduler, MicroBatcher
+from utils.suggestion_cache import SuggestionCache, suggestion_cache
+from utils.prompt_builder import PromptBuilder
+from utils.uploads import local_upload, read_upload
+from config import IMAGE_CONFIG
+from utils.lazy_import import lazy_import
+
+# The model SDK and PIL load when the first agent is built or image decoded
+genai = lazy_import("google.generativeai")
+Image = lazy_import("PIL.Image")
+derivatives = lazy_import("utils.derivatives")
+image_probe = lazy_import("utils.image_probe")
+
+# Bump when the style prompt or its parsing changes
+STYLE_ANALYSIS_VERSION = "2"
+
+STYLE_BATCH_PROMPT = """
+Analyze each of the following {count} clothing items. For every item provide:
+1. Style tags
+2. Detailed style description
+3. Color palette
+4. Style category
+5. Confidence score (0-100)
+Respond with only a JSON array holding one object per item, in the order given,
+with the keys "style_tags" (list of strings), "description" (string),
+"color_palette" (list of strings), "style_category" (string) and
+"confidence" (number).
+"""
 
 class AIServicesAgent:
-    def __init__(self, name: str):
+    def __init__(
+        self,
+        name: str,
+        http: Optional[HTTPClient] = None,
+        suggestions: Optional[SuggestionCache] = None
+    ):
+        # Shared pooled session, opened and closed with the application
+        self.http = http or http_client
+        self.suggestion_cache = suggestions or suggestion_cache
+        self.prompt_builder = PromptBuilder()
         try:
             gemini_api_key = os.getenv("GEMINI_API_KEY")
             if not gemini_api_key:
                 raise ValueError("GEMINI_API_KEY not found")
             genai.configure(api_key=gemini_api_key)
             self.model = genai.GenerativeModel('gemini-pro-vision')
+            # Every model call is rate limited and concurrency bounded; style
+            # analyses arriving together share one multimodal prompt
+            self.scheduler = ModelScheduler(self.model)
+            self.style_batcher = MicroBatcher(self._analyze_style_batch)
+            self.style_cache = AnalysisCache("style", STYLE_ANALYSIS_VERSION)
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to initialize AI services: {str(e)}"
             )
 
+    async def load_image(self, image_url: str) -> bytes:
+        # Our own uploads are read from disk, not fetched back over HTTP
+        path = local_upload(image_url)
+        if path is not None:
+            return await asyncio.to_thread(read_upload, path)
+        return await self.http.fetch_bytes(image_url)
+
     async def analyze_style(self, image_url: str) -> Dict:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url) as response:
-                    if response.status != 200:
-                        raise HTTPException(status_code=400, detail="Failed to fetch image")
-                    image_data = await response.read()
-                    image = Image.open(io.BytesIO(image_data))
+            return await self.analyze_style_bytes(await self.load_image(image_url))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Style analysis failed: {str(e)}"
+            )
+
+    async def analyze_style_bytes(self, image_data: bytes) -> Dict:
+        """Style analysis of an image already in memory (e.g. a local upload)"""
+        try:
+            # Identical image bytes always get the same style analysis
+            digest = image_digest(image_data)
+            cached = self.style_cache.get(digest)
+            if cached is not None:
+                return cached
+            # Refused from the header alone; large JPEGs decode at reduced scale
+            try:
+                image_probe.validate_image(image_data)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Image rejected: {str(e)}")
+            image = derivatives.open_scaled(io.BytesIO(image_data), IMAGE_CONFIG["display_size"])
+            image.thumbnail(IMAGE_CONFIG["display_size"], Image.LANCZOS)
 
-            prompt = """
-            Analyze this clothing item and provide:
-            1. Style tags (comma-separated)
-            2. Detailed style description
-            3. Color palette
-            4. Style category
-            5. Confidence score (0-100)
-            Format the response in clear sections.
-            """
-            
-            response = await self.model.generate_content([prompt, image])
-            
-            if not response.text:
-                raise ValueError("Empty response from Gemini")
-            
-            sections = response.text.split('\n\n')
-            return {
-                "style_tags": [tag.strip() for tag in sections[0].split(',')],
-                "description": sections[1],
-                "color_palette": sections[2].split(','),
-                "style_category": sections[3],
-                "confidence": float(sections[4].replace('%', '').strip())
-            }
-            
+            analysis = await self.style_batcher.submit(image)
+            self.style_cache.put(digest, analysis)
+            return analysis
+
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Style analysis failed: {str(e)}"
             )
 
-    async def suggest_outfit(self, occasion: str, wardrobe: Dict) -> Dict:
+    async def _analyze_style_batch(self, images: List[Image.Image]) -> List[Dict]:
+        """One model call for a whole batch, split back into per-image analyses"""
+        contents = [STYLE_BATCH_PROMPT.format(count=len(images))]
+        for index, image in enumerate(images, 1):
+            contents.extend([f"Item {index}:", image])
+
+        analyses = _parse_json(await self.scheduler.generate(contents))
+        if not isinstance(analyses, list):
+            raise ValueError("Expected a JSON array of style analyses")
+        return [
+            {
+                "style_tags": [str(tag).strip() for tag in analysis["style_tags"]],
+                "description": analysis["description"],
+                "color_palette": [str(color).strip() for color in analysis["color_palette"]],
+                "style_category": analysis["style_category"],
+                "confidence": float(analysis["confidence"])
+            }
+            for analysis in analyses
+        ]
+
+    async def suggest_outfit(self, occasion: str, wardrobe: Dict, user_id: str = "default") -> Dict:
         try:
-            prompt = f"""
-            Suggest an outfit for {occasion} using these available items:
-            {json.dumps(wardrobe, indent=2)}
-            
-            Consider:
-            1. Occasion appropriateness
-            2. Color coordination
-            3. Style matching
-            4. Weather suitability
-            
-            Format the response as a JSON with:
-            1. Selected items
-            2. Styling tips
-            3. Confidence score
-            """
-            
-            response = await self.model.generate_content(prompt)
-            
-            if not response.text:
-                raise ValueError("Empty response from Gemini")
-                
-            return json.loads(response.text)
-            
+            # Repeat occasions against an unchanged wardrobe skip the model
+            return await self.suggestion_cache.get_or_compute(
+                user_id, occasion, wardrobe,
+                lambda: self._generate_suggestion(occasion, wardrobe)
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Suggestion generation failed: {str(e)}"
             )
+
+    async def _generate_suggestion(self, occasion: str, wardrobe: Dict) -> Dict:
+        # Occasion-relevant items only, as a compact table with short ids
+        prompt, id_map = self.prompt_builder.build(occasion, wardrobe)
+        answer = _parse_json(await self.scheduler.generate(prompt))
+        return self.prompt_builder.resolve(answer, id_map)
+
+def _parse_json(text: str):
+    """Parse a model response, tolerating a surrounding markdown code fence"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return json.loads(text)
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import CACHE_CONFIG
+from utils.metrics import cache_counters
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """Content address of an image: SHA-256 of its raw bytes"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class AnalysisCache:
+    """Persistent cache of image analysis results keyed by image hash.
+
+    Entries live in a SQLite file shared by every process that analyses
+    images. Each cache instance owns one ``kind`` of result (for example
+    ``"vision"`` or ``"style"``) and one ``version``; entries written under an
+    older version of the same kind are dropped when the cache is opened.
+    The least recently used entries are evicted once ``max_entries`` or
+    ``max_bytes`` is exceeded.
+
+    Reads stay reads: a hit only writes its access time back when the
+    stored one is older than ``touch_interval`` seconds. Entry counts and
+    byte totals per kind are kept in ``analysis_cache_totals`` by triggers,
+    so ``put`` checks the budget with one primary-key lookup, whichever
+    process wrote the entries.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        version: str,
+        path: Optional[Path] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        touch_interval: Optional[float] = None
+    ):
+        self.kind = kind
+        self.version = version
+        self.path = Path(path or CACHE_CONFIG["analysis_db"])
+        self.max_entries = max_entries or CACHE_CONFIG["max_entries"]
+        self.max_bytes = max_bytes or CACHE_CONFIG["max_bytes"]
+        self.touch_interval = CACHE_CONFIG["touch_interval"] if touch_interval is None else touch_interval
+        self.hits = 0
+        self.misses = 0
+        self._hit_counter, self._miss_counter = cache_counters(f"analysis_{kind}")
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                kind TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (kind, digest)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS analysis_cache_lru ON analysis_cache (kind, last_access)"
+        )
+        # Exclusive while the totals are created, so two processes opening a
+        # pre-existing cache cannot both backfill them
+        self._conn.execute("BEGIN IMMEDIATE")
+        with self._conn:
+            self._create_totals()
+            self._conn.execute(
+                "DELETE FROM analysis_cache WHERE kind = ? AND version != ?",
+                (self.kind, self.version)
+            )
+
+    def _create_totals(self):
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'analysis_cache_totals'"
+        ).fetchone()
+        if exists:
+            return
+        self._conn.execute("""
+            CREATE TABLE analysis_cache_totals (
+                kind TEXT PRIMARY KEY,
+                entries INTEGER NOT NULL,
+                bytes INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            INSERT INTO analysis_cache_totals
+            SELECT kind, COUNT(*), SUM(size) FROM analysis_cache GROUP BY kind
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER analysis_cache_count_insert AFTER INSERT ON analysis_cache BEGIN
+                INSERT INTO analysis_cache_totals VALUES (NEW.kind, 1, NEW.size)
+                ON CONFLICT(kind) DO UPDATE SET entries = entries + 1, bytes = bytes + NEW.size;
+            END
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER analysis_cache_count_delete AFTER DELETE ON analysis_cache BEGIN
+                UPDATE analysis_cache_totals SET entries = entries - 1, bytes = bytes - OLD.size
+                WHERE kind = OLD.kind;
+            END
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER analysis_cache_count_update AFTER UPDATE OF size ON analysis_cache BEGIN
+                UPDATE analysis_cache_totals SET bytes = bytes - OLD.size + NEW.size
+                WHERE kind = NEW.kind;
+            END
+        """)
+
+    def _totals(self):
+        row = self._conn.execute(
+            "SELECT entries, bytes FROM analysis_cache_totals WHERE kind = ?", (self.kind,)
+        ).fetchone()
+        return row or (0, 0)
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for an image hash, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, last_access FROM analysis_cache WHERE kind = ? AND digest = ? AND version = ?",
+                (self.kind, digest, self.version)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                self._miss_counter.inc()
+                return None
+
+            self.hits += 1
+            self._hit_counter.inc()
+            now = time.time()
+            # LRU order only needs to be roughly right; skip the write on
+            # hits to recently used entries
+            if now - row[1] >= self.touch_interval:
+                with self._conn:
+                    self._conn.execute(
+                        "UPDATE analysis_cache SET last_access = ? WHERE kind = ? AND digest = ?",
+                        (now, self.kind, digest)
+                    )
+            return json.loads(row[0])
+
+    def put(self, digest: str, result: Dict[str, Any]):
+        """Store the result for an image hash and evict old entries"""
+        payload = json.dumps(result)
+        with self._lock, self._conn:
+            # An upsert, not INSERT OR REPLACE: replace deletes skip the triggers
+            self._conn.execute("""
+                INSERT INTO analysis_cache VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(kind, digest) DO UPDATE SET version = excluded.version,
+                    result = excluded.result, size = excluded.size, last_access = excluded.last_access
+            """, (self.kind, digest, self.version, payload, len(payload), time.time()))
+            self._evict()
+
+    def _evict(self):
+        count, total = self._totals()
+        while count > self.max_entries or total > self.max_bytes:
+            # Drop at least the overflow, and a tenth of the cache when over
+            # the byte budget, oldest access first
+            batch = max(count - self.max_entries, count // 10 if total > self.max_bytes else 0, 1)
+            self._conn.execute("""
+                DELETE FROM analysis_cache WHERE rowid IN (
+                    SELECT rowid FROM analysis_cache WHERE kind = ?
+                    ORDER BY last_access LIMIT ?
+                )
+            """, (self.kind, batch))
+            count, total = self._totals()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the current entry count"""
+        with self._lock:
+            entries = self._totals()[0]
+        lookups = self.hits + self.misses
+        return {
+            "kind": self.kind,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
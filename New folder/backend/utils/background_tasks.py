@@ -1,29 +1,156 @@
-from fastapi import BackgroundTasks
-from typing import Callable, Dict
 import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
-class BackgroundTaskManager:
-    def __init__(self):
-        self.tasks = {}
-    
-    async def add_task(
+from config import JOB_CONFIG
+from utils.error_handlers import QueueFullError
+from utils.metrics import QUEUE_DEPTH, error_counter
+
+logger = logging.getLogger(__name__)
+
+JOB_ERRORS = error_counter("job")
+
+
+class JobQueue:
+    """Bounded queue of background jobs served by a fixed worker pool.
+
+    ``submit`` returns a job ID at once and raises ``QueueFullError`` when
+    ``max_queued`` jobs are already waiting, so callers can push back
+    instead of piling up work. A job's status stays queryable until
+    ``result_ttl`` seconds after it finishes; expired jobs are dropped
+    lazily on the next submit or lookup. Jobs submitted with
+    ``report_progress`` get a ``progress`` callback whose latest value is
+    part of their status.
+    """
+
+    def __init__(
         self,
-        task_id: str,
-        func: Callable,
-        *args,
-        **kwargs
+        workers: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        result_ttl: Optional[float] = None
     ):
-        """Add a background task"""
-        self.tasks[task_id] = asyncio.create_task(func(*args, **kwargs))
-    
-    async def get_task_status(self, task_id: str) -> Dict:
-        """Get status of a background task"""
-        if task_id not in self.tasks:
-            return {"status": "not_found"}
-            
-        task = self.tasks[task_id]
-        if task.done():
-            return {"status": "completed", "result": task.result()}
-        return {"status": "running"}
-
-background_tasks = BackgroundTaskManager() 
\ No newline at end of file
+        self.workers = workers or JOB_CONFIG["workers"]
+        self.max_queued = max_queued or JOB_CONFIG["max_queued"]
+        self.result_ttl = result_ttl or JOB_CONFIG["result_ttl"]
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._calls: Dict[str, tuple] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_queued)
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if now - finished_at < self.result_ttl:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+
+    def ensure_room(self, jobs: int = 1):
+        """Raise ``QueueFullError`` unless ``jobs`` more can be submitted now"""
+        if self.queued() + jobs > self.max_queued:
+            raise QueueFullError(
+                "Too many jobs waiting, try again later",
+                {"queued": self.queued(), "max_queued": self.max_queued}
+            )
+
+    def submit(self, func: Callable[..., Awaitable[Any]], *args, kind: str = "job",
+               report_progress: bool = False, **kwargs) -> str:
+        """Queue ``func(*args, **kwargs)`` and return its job ID"""
+        self._start()
+        self._evict()
+        self.ensure_room()
+        job_id = uuid.uuid4().hex
+        self._jobs[job_id] = {
+            "id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": None,
+            "result": None,
+            "error": None
+        }
+        if report_progress:
+            kwargs["progress"] = partial(self._set_progress, job_id)
+        self._calls[job_id] = (func, args, kwargs)
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    def _set_progress(self, job_id: str, progress: Any):
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job["progress"] = progress
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job, or None if unknown or expired"""
+        self._evict()
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = self._jobs[job_id]
+        func, args, kwargs = self._calls.pop(job_id)
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        try:
+            job["result"] = await func(*args, **kwargs)
+            job["status"] = "completed"
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job['kind']}) failed: {str(e)}")
+            JOB_ERRORS.inc()
+            job["status"] = "failed"
+            job["error"] = str(e)
+        job["finished_at"] = time.time()
+        self._finished[job_id] = time.monotonic()
+
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def join(self):
+        """Wait until every queued job has finished"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        """Stop the workers; jobs still queued are abandoned"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def stats(self) -> Dict[str, int]:
+        statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "completed": statuses.count("completed"),
+            "failed": statuses.count("failed"),
+            "max_queued": self.max_queued,
+            "workers": self.workers
+        }
+
+
+# Upload analysis and indexing
+ingestion_queue = JobQueue()
+QUEUE_DEPTH.labels(queue="ingestion").set_function(ingestion_queue.queued)
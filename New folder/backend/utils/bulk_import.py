@@ -0,0 +1,392 @@
+"""Bulk wardrobe import: thousands of images analysed and stored in chunks.
+
+An import is a stream of entries, each able to put one image on disk under
+the upload directory: a saved multipart file, a zip member extracted on
+demand, or a manifest path already there. ``concurrency`` workers pull
+entries from the stream, so no more than that many images are being read
+at once no matter how large the import is. Each image gets its derivatives
+and colour features (``process_image``) and, when an analyser is given,
+a style analysis of its thumbnail. Finished items are written
+``chunk_size`` at a time, each chunk in one storage transaction and one
+feature index update.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
+import zipfile
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import BULK_IMPORT_CONFIG, IMAGE_CONFIG, UPLOAD_DIR
+from utils.db_manager import get_wardrobe_store
+from utils.feature_index import get_feature_index
+from utils.image_processing import process_image
+from utils.suggestion_cache import suggestion_cache
+
+logger = logging.getLogger(__name__)
+
+# (name for reports, callable returning the image's local path, item fields)
+ImportEntry = Tuple[str, Callable[[], Path], Dict[str, Any]]
+
+COPY_BUFFER = 1024 * 1024
+MAX_FORM_FIELD_SIZE = 64 * 1024
+
+
+def import_directory(name: Optional[str] = None) -> Path:
+    """A fresh directory under the uploads for one import's images"""
+    directory = Path(UPLOAD_DIR) / "imports" / (name or uuid.uuid4().hex)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def public_url(path: Path) -> str:
+    """The ``/uploads/...`` URL clients load an imported image from"""
+    relative = Path(os.path.realpath(path)).relative_to(os.path.realpath(UPLOAD_DIR))
+    return f"/uploads/{relative.as_posix()}"
+
+
+def is_image_name(name: str) -> bool:
+    return Path(name).suffix.lower() in IMAGE_CONFIG["allowed_extensions"]
+
+
+def save_stream(stream, directory: Path, filename: str) -> Path:
+    """Copy a file object to ``directory`` in fixed-size chunks"""
+    path = directory / f"{uuid.uuid4().hex}{Path(filename).suffix.lower()}"
+    with open(path, "wb") as out:
+        shutil.copyfileobj(stream, out, COPY_BUFFER)
+    return path
+
+
+class TooManyFilesError(ValueError):
+    pass
+
+
+class MultipartUpload:
+    """A multipart import request, streamed to disk as it arrives.
+
+    Parts of the ``files`` field and a single ``archive`` part are written
+    to ``directory`` under fresh names while the body is read, so no more
+    than the chunk being parsed is held in memory. ``files`` parts that are
+    not images are not saved; their names are kept in ``rejected``. Plain
+    form fields end up in ``fields``. Malformed bodies raise ValueError,
+    more than ``max_files`` files TooManyFilesError.
+    """
+
+    def __init__(self, directory: Path, max_files: int, max_fields: int = 10):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_fields = max_fields
+        self.fields: Dict[str, str] = {}
+        # (name as sent, saved path)
+        self.files: List[Tuple[str, Path]] = []
+        self.archive: Optional[Path] = None
+        self.rejected: List[str] = []
+
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._disposition = b""
+        self._part: Optional[Tuple[str, str, Optional[Path]]] = None
+        self._value: Optional[bytearray] = None
+        # File writes queued by the parser callbacks, run off the event loop
+        self._pending: List[Callable[[], None]] = []
+        self._out = None
+
+    async def receive(self, content_type: str, chunks: AsyncIterator[bytes]):
+        from python_multipart.multipart import MultipartParser, parse_options_header
+
+        _, params = parse_options_header(content_type)
+        if not params.get(b"boundary"):
+            raise ValueError("Missing multipart boundary")
+        parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+        try:
+            async for chunk in chunks:
+                parser.write(chunk)
+                if self._pending:
+                    await asyncio.to_thread(self._flush)
+            parser.finalize()
+        finally:
+            self._pending.clear()
+            self._close()
+
+    def _flush(self):
+        pending, self._pending = self._pending, []
+        for write in pending:
+            write()
+
+    def _open(self, path: Path):
+        self._out = open(path, "wb")
+
+    def _write(self, data: bytes):
+        self._out.write(data)
+
+    def _close(self):
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+
+    def _on_part_begin(self):
+        self._disposition = b""
+        self._part = None
+        self._value = None
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self):
+        from python_multipart.multipart import parse_options_header
+
+        _, options = parse_options_header(self._disposition)
+        if b"name" not in options:
+            raise ValueError("Every form part needs a name")
+        name = options[b"name"].decode("utf-8", "replace")
+        if b"filename" not in options:
+            if len(self.fields) >= self.max_fields:
+                raise ValueError(f"At most {self.max_fields} form fields")
+            self._part = (name, "", None)
+            self._value = bytearray()
+            return
+
+        filename = options[b"filename"].decode("utf-8", "replace")
+        if name == "files":
+            if len(self.files) + len(self.rejected) >= self.max_files:
+                raise TooManyFilesError(f"At most {self.max_files} files per request")
+            if not is_image_name(filename):
+                self.rejected.append(filename)
+                return
+        elif name != "archive" or self.archive is not None:
+            raise ValueError(f"Unexpected file part '{name}'; send images as 'files' and one 'archive'")
+        path = self.directory / f"{uuid.uuid4().hex}{Path(filename).suffix.lower()}"
+        self._part = (name, filename, path)
+        self._pending.append(partial(self._open, path))
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._part is None:
+            return
+        if self._value is not None:
+            if len(self._value) + end - start > MAX_FORM_FIELD_SIZE:
+                raise ValueError(f"Form field '{self._part[0]}' is over {MAX_FORM_FIELD_SIZE} bytes")
+            self._value += data[start:end]
+        else:
+            self._pending.append(partial(self._write, data[start:end]))
+
+    def _on_part_end(self):
+        if self._part is None:
+            return
+        name, filename, path = self._part
+        if self._value is not None:
+            self.fields[name] = self._value.decode("utf-8", "replace")
+            return
+        self._pending.append(self._close)
+        if name == "archive":
+            self.archive = path
+        else:
+            self.files.append((filename, path))
+
+
+def file_entries(paths: Iterable[Tuple[str, Path]], fields: Optional[Dict[str, Any]] = None) -> Iterator[ImportEntry]:
+    """Entries for files already saved to disk, e.g. a multipart batch"""
+    for name, path in paths:
+        yield name, partial(Path, path), dict(fields or {})
+
+
+def _extract_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, directory: Path) -> Path:
+    if info.file_size > IMAGE_CONFIG["max_file_size"]:
+        raise ValueError(f"{info.filename} is larger than {IMAGE_CONFIG['max_file_size']} bytes")
+    with archive.open(info) as member:
+        return save_stream(member, directory, info.filename)
+
+
+def zip_entries(archive: zipfile.ZipFile, directory: Path,
+                fields: Optional[Dict[str, Any]] = None) -> Iterator[ImportEntry]:
+    """Entries for the images in an open archive, extracted one at a time.
+
+    Only the member's base name is used on disk, so archive paths can not
+    escape ``directory``.
+    """
+    for info in archive.infolist():
+        name = Path(info.filename).name
+        if info.is_dir() or name.startswith(".") or not is_image_name(name):
+            continue
+        yield info.filename, partial(_extract_member, archive, info, directory), dict(fields or {})
+
+
+def count_zip_images(archive: zipfile.ZipFile) -> int:
+    return sum(1 for _ in zip_entries(archive, Path(".")))
+
+
+def _upload_file(path: str) -> Path:
+    upload_dir = os.path.realpath(UPLOAD_DIR)
+    resolved = os.path.realpath(path)
+    if os.path.commonpath([upload_dir, resolved]) != upload_dir:
+        raise ValueError(f"{path} is outside the upload directory")
+    if not os.path.isfile(resolved):
+        raise FileNotFoundError(path)
+    return Path(resolved)
+
+
+def manifest_entries(manifest: List[Dict[str, Any]]) -> Iterator[ImportEntry]:
+    """Entries for ``{"path": ..., **item fields}`` objects.
+
+    Paths must lie inside the upload directory; others fail as entries
+    rather than being read.
+    """
+    for entry in manifest:
+        fields = {key: value for key, value in entry.items() if key != "path"}
+        yield entry["path"], partial(_upload_file, entry["path"]), fields
+
+
+class BulkImporter:
+    """Runs one import for one user"""
+
+    def __init__(
+        self,
+        user_id: str,
+        analyze: Optional[Callable[[bytes], Awaitable[Dict[str, Any]]]] = None,
+        store=None,
+        concurrency: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        self.user_id = user_id
+        self.analyze = analyze
+        self.store = store or get_wardrobe_store()
+        self.concurrency = concurrency or BULK_IMPORT_CONFIG["concurrency"]
+        self.chunk_size = chunk_size or BULK_IMPORT_CONFIG["chunk_size"]
+        self.progress = progress
+
+        self._chunk: List[Dict[str, Any]] = []
+        self._write_lock = asyncio.Lock()
+        self.total: Optional[int] = None
+        self.processed = 0
+        self.imported = 0
+        self.stored = 0
+        self.errors: List[Dict[str, str]] = []
+
+    def reject(self, name: str, error: str):
+        """Count an entry that failed before the import started"""
+        self._record_error(name, error)
+        self.processed += 1
+
+    def _record_error(self, name: str, error: str):
+        if len(self.errors) < BULK_IMPORT_CONFIG["max_errors"]:
+            self.errors.append({"name": name, "error": error})
+
+    def _report(self):
+        if self.progress is not None:
+            self.progress(self.summary())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "processed": self.processed,
+            "imported": self.imported,
+            "stored": self.stored,
+            "failed": self.processed - self.imported,
+            "errors": list(self.errors)
+        }
+
+    async def run(self, entries: Iterable[ImportEntry], total: Optional[int] = None) -> Dict[str, Any]:
+        """Import every entry; returns the final summary"""
+        self.total = total
+        start = time.monotonic()
+        self._report()
+        shared = iter(entries)
+
+        async def worker():
+            # next() never awaits, so workers can share one iterator
+            for entry in shared:
+                await self._import_one(entry)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        await self._write_chunk()
+        summary = self.summary()
+        summary["seconds"] = time.monotonic() - start
+        logger.info(f"Imported {self.imported} of {self.processed} images for {self.user_id}")
+        return summary
+
+    async def _import_one(self, entry: ImportEntry):
+        name, materialize, fields = entry
+        try:
+            path = await asyncio.to_thread(materialize)
+            features = await asyncio.to_thread(process_image, str(path))
+            # The disk path stays server-side, next to the derivatives' paths
+            features["original_path"] = str(path)
+            item = {
+                "id": uuid.uuid4().hex,
+                "category": "others",
+                **fields,
+                "image_url": public_url(path),
+                "image_features": features
+            }
+            if self.analyze is not None:
+                thumbnail = await asyncio.to_thread(Path(features["processed_path"]).read_bytes)
+                item["style_analysis"] = await self.analyze(thumbnail)
+            self._chunk.append(item)
+            self.imported += 1
+        except Exception as e:
+            self._record_error(name, str(e))
+        self.processed += 1
+        if len(self._chunk) >= self.chunk_size:
+            await self._write_chunk()
+        self._report()
+
+    async def _write_chunk(self):
+        async with self._write_lock:
+            items, self._chunk = self._chunk, []
+            if not items:
+                return
+            by_category: Dict[str, List[Dict[str, Any]]] = {}
+            for item in items:
+                by_category.setdefault(item["category"], []).append(item)
+            await self.store.append_items(self.user_id, by_category)
+            await asyncio.to_thread(get_feature_index(self.user_id).add_items, items)
+            suggestion_cache.invalidate_user(self.user_id)
+            self.stored += len(items)
+
+
+async def import_files(user_id: str, paths: List[Tuple[str, Path]], fields: Dict[str, Any],
+                       rejected: Iterable[str] = (), analyze=None, progress=None) -> Dict[str, Any]:
+    """Import saved files; ``rejected`` names files that were sent but not saved"""
+    importer = BulkImporter(user_id, analyze=analyze, progress=progress)
+    for name in rejected:
+        importer.reject(name, "Not an allowed image type")
+    return await importer.run(file_entries(paths, fields), total=len(paths) + importer.processed)
+
+
+async def import_zip(user_id: str, archive_path: Path, fields: Dict[str, Any],
+                     analyze=None, progress=None) -> Dict[str, Any]:
+    """Import the images in a saved archive, deleting the archive afterwards"""
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            importer = BulkImporter(user_id, analyze=analyze, progress=progress)
+            entries = zip_entries(archive, import_directory(), fields)
+            return await importer.run(entries, total=count_zip_images(archive))
+    finally:
+        os.remove(archive_path)
+
+
+async def import_manifest(user_id: str, manifest: List[Dict[str, Any]],
+                          analyze=None, progress=None) -> Dict[str, Any]:
+    importer = BulkImporter(user_id, analyze=analyze, progress=progress)
+    return await importer.run(manifest_entries(manifest), total=len(manifest))
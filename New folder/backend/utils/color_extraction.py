@@ -0,0 +1,158 @@
+"""Dominant colour extraction with selectable backends.
+
+Backends, all deterministic for a given input:
+
+- ``histogram``: quantised 3D RGB histogram in pure NumPy. Pixels of the whole
+  batch are binned in one ``bincount`` pass; each palette colour is the mean of
+  a heavily populated bin, picked greedily so that colours stay distinct.
+- ``median_cut``: classic median cut in pure NumPy.
+- ``minibatch``: scikit-learn ``MiniBatchKMeans`` with a fixed seed.
+- ``kmeans``: scikit-learn ``KMeans(n_init=10)``, the exact reference the
+  classifier used before this module existed (now seeded).
+
+Palettes are returned most-populated colour first, as ``int`` RGB triples.
+"""
+from typing import Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+DEFAULT_BACKEND = "histogram"
+BACKENDS = ("histogram", "median_cut", "minibatch", "kmeans")
+
+# Histogram backend tuning
+HISTOGRAM_BITS = 3          # 8 levels per channel, 512 bins
+HISTOGRAM_CANDIDATES = 16   # most populated bins considered per image
+MIN_COLOR_DISTANCE = 24.0   # RGB distance below which two bins count as one colour
+
+RANDOM_STATE = 0
+
+ImageBatch = Union[np.ndarray, Sequence[np.ndarray]]
+
+
+def _as_pixels(image: np.ndarray) -> np.ndarray:
+    """Flatten an (H, W, 3) image or (N, 3) pixel array to (N, 3) uint8"""
+    pixels = np.asarray(image).reshape(-1, 3)
+    if pixels.dtype != np.uint8:
+        pixels = np.clip(pixels, 0, 255).astype(np.uint8)
+    return pixels
+
+
+def _pad_palette(palette: List[np.ndarray], n_colors: int) -> np.ndarray:
+    """Repeat the last colour so every palette has exactly ``n_colors`` rows"""
+    if not palette:
+        palette = [np.zeros(3)]
+    while len(palette) < n_colors:
+        palette.append(palette[-1])
+    return np.rint(np.stack(palette[:n_colors])).astype(int)
+
+
+def _histogram_palettes(batch: List[np.ndarray], n_colors: int) -> np.ndarray:
+    shift = 8 - HISTOGRAM_BITS
+    n_bins = 1 << (3 * HISTOGRAM_BITS)
+
+    sizes = np.array([len(pixels) for pixels in batch])
+    pixels = np.concatenate(batch).astype(np.int64)
+    image_index = np.repeat(np.arange(len(batch)), sizes)
+
+    quantised = pixels >> shift
+    bins = (quantised[:, 0] << (2 * HISTOGRAM_BITS)) | (quantised[:, 1] << HISTOGRAM_BITS) | quantised[:, 2]
+    flat_bins = image_index * n_bins + bins
+
+    # One pass over every pixel of the batch for counts and per-bin sums
+    minlength = len(batch) * n_bins
+    counts = np.bincount(flat_bins, minlength=minlength).reshape(len(batch), n_bins)
+    sums = np.stack([
+        np.bincount(flat_bins, weights=pixels[:, channel], minlength=minlength)
+        for channel in range(3)
+    ], axis=-1).reshape(len(batch), n_bins, 3)
+
+    # Most populated bins first; ties resolved by bin index for determinism
+    candidates = np.argsort(-counts, axis=1, kind="stable")[:, :HISTOGRAM_CANDIDATES]
+
+    palettes = []
+    for image in range(len(batch)):
+        chosen = []
+        for bin_index in candidates[image]:
+            count = counts[image, bin_index]
+            if count == 0:
+                break
+            color = sums[image, bin_index] / count
+            if all(np.linalg.norm(color - other) >= MIN_COLOR_DISTANCE for other in chosen):
+                chosen.append(color)
+            if len(chosen) == n_colors:
+                break
+        palettes.append(_pad_palette(chosen, n_colors))
+    return np.stack(palettes)
+
+
+def _median_cut_palette(pixels: np.ndarray, n_colors: int) -> np.ndarray:
+    boxes = [pixels.astype(np.int32)]
+    while len(boxes) < n_colors:
+        # Split the box with the widest channel range at its median
+        spans = [np.ptp(box, axis=0) if len(box) > 1 else np.zeros(3, dtype=np.int32) for box in boxes]
+        widest = int(np.argmax([span.max() for span in spans]))
+        if spans[widest].max() == 0:
+            break
+        box = boxes.pop(widest)
+        channel = int(np.argmax(spans[widest]))
+        order = np.argsort(box[:, channel], kind="stable")
+        half = len(box) // 2
+        boxes.extend([box[order[:half]], box[order[half:]]])
+
+    boxes.sort(key=len, reverse=True)
+    return _pad_palette([box.mean(axis=0) for box in boxes], n_colors)
+
+
+def _kmeans_palette(pixels: np.ndarray, n_colors: int, minibatch: bool) -> np.ndarray:
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    n_clusters = min(n_colors, len(np.unique(pixels, axis=0)))
+    if minibatch:
+        model = MiniBatchKMeans(n_clusters=n_clusters, random_state=RANDOM_STATE, n_init=3, batch_size=1024)
+    else:
+        model = KMeans(n_clusters=n_clusters, n_init=10, random_state=RANDOM_STATE)
+    labels = model.fit_predict(pixels.astype(np.float64))
+
+    order = np.argsort(-np.bincount(labels, minlength=n_clusters), kind="stable")
+    return _pad_palette(list(model.cluster_centers_[order]), n_colors)
+
+
+def extract_palettes(images: ImageBatch, n_colors: int = 3, backend: str = DEFAULT_BACKEND) -> np.ndarray:
+    """Extract an ``n_colors`` palette for every image in a batch.
+
+    ``images`` is an (B, N, 3) array or a sequence of (H, W, 3) / (N, 3)
+    arrays, which may differ in size. Returns a (B, n_colors, 3) int array.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown color backend: {backend}")
+
+    batch = [_as_pixels(image) for image in images]
+    if not batch:
+        return np.zeros((0, n_colors, 3), dtype=int)
+
+    if backend == "histogram":
+        return _histogram_palettes(batch, n_colors)
+    if backend == "median_cut":
+        return np.stack([_median_cut_palette(pixels, n_colors) for pixels in batch])
+    return np.stack([
+        _kmeans_palette(pixels, n_colors, minibatch=(backend == "minibatch"))
+        for pixels in batch
+    ])
+
+
+def extract_palette(image: np.ndarray, n_colors: int = 3, backend: str = DEFAULT_BACKEND) -> np.ndarray:
+    """Extract the palette of a single image as an (n_colors, 3) int array"""
+    return extract_palettes([image], n_colors, backend)[0]
+
+
+def dominant_color(image: np.ndarray) -> Tuple[int, int, int]:
+    """Mean colour of an image, i.e. the single-cluster k-means centre"""
+    return tuple(int(channel) for channel in _as_pixels(image).mean(axis=0))
+
+
+def palette_error(image: np.ndarray, palette: Iterable) -> float:
+    """Mean RGB distance from each pixel to its nearest palette colour"""
+    pixels = _as_pixels(image).astype(np.float32)
+    palette = np.asarray(list(palette), dtype=np.float32)
+    distances = np.linalg.norm(pixels[:, None, :] - palette[None, :, :], axis=-1)
+    return float(distances.min(axis=1).mean())
@@ -1,40 +1,303 @@
 import json
-from typing import Dict, Any
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional
 from pathlib import Path
 from datetime import datetime
 
+from config import STORAGE_CONFIG
+
+SCHEMA_VERSION = "2.0"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS categories (
+    user_id TEXT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    is_list INTEGER NOT NULL,
+    PRIMARY KEY (user_id, category)
+);
+CREATE TABLE IF NOT EXISTS items (
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, category, position),
+    FOREIGN KEY (user_id, category) REFERENCES categories(user_id, category) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared by any thread.
+
+    Connections are opened lazily up to ``size``; once all are checked out,
+    ``acquire`` blocks until one is released or ``timeout`` expires.
+    """
+
+    def __init__(self, file_path: Path, size: int, timeout: float = 30.0):
+        self.file_path = file_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            str(self.file_path),
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = self._open()
+                self._all.append(conn)
+                return conn
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection free after {self.timeout}s")
+
+    def release(self, conn: sqlite3.Connection):
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+            self._idle = queue.LifoQueue()
+
 class Database:
-    def __init__(self, file_path: Path):
+    """Wardrobe storage backed by SQLite in WAL mode.
+
+    Each user is a row, each wardrobe category a row under it, and each item
+    in a category list its own record, so an update only touches the
+    categories it changes. Every write runs in one ``BEGIN IMMEDIATE``
+    transaction; readers never block writers thanks to WAL. Connections come
+    from a bounded ``ConnectionPool`` and may be used from any thread.
+
+    ``file_path`` may still point at a legacy ``user_wardrobes.json``; the
+    database is then created next to it and the JSON is migrated once.
+    """
+
+    def __init__(
+        self,
+        file_path: Optional[Path] = None,
+        legacy_json_path: Optional[Path] = None,
+        pool_size: Optional[int] = None
+    ):
+        file_path = Path(file_path or STORAGE_CONFIG["database_file"])
+        if file_path.suffix == ".json":
+            legacy_json_path = legacy_json_path or file_path
+            file_path = file_path.with_suffix(".db")
         self.file_path = file_path
+        self.legacy_json_path = Path(legacy_json_path or STORAGE_CONFIG["wardrobe_file"])
+        self.pool = ConnectionPool(self.file_path, pool_size or STORAGE_CONFIG["pool_size"])
         self._ensure_file_exists()
-        
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction that takes the write lock up front"""
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def _snapshot(self) -> Iterator[sqlite3.Connection]:
+        """Read transaction giving a consistent view across several queries"""
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                conn.execute("COMMIT")
+
     def _ensure_file_exists(self):
-        """Create database file if it doesn't exist"""
-        if not self.file_path.exists():
-            self.file_path.parent.mkdir(parents=True, exist_ok=True)
-            self.save({
-                "users": {"default": {}},
-                "metadata": {
-                    "version": "1.0",
-                    "last_updated": None
-                }
-            })
-    
+        """Create the schema and migrate the legacy JSON file once"""
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._transaction() as conn:
+            # executescript() would commit, so run the DDL statement by statement
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute(
+                "INSERT OR IGNORE INTO metadata VALUES ('version', ?)", (SCHEMA_VERSION,)
+            )
+            conn.execute("INSERT OR IGNORE INTO metadata VALUES ('last_updated', NULL)")
+            migrated = conn.execute(
+                "SELECT value FROM metadata WHERE key = 'migrated_from_json'"
+            ).fetchone()
+
+            # Same transaction as the schema, so concurrent openers migrate once
+            if migrated is None:
+                if self.legacy_json_path.exists():
+                    self._migrate(conn, self.legacy_json_path)
+                else:
+                    self._upsert(conn, "default", {})
+                    conn.execute("INSERT INTO metadata VALUES ('migrated_from_json', '')")
+
+    def migrate_from_json(self, json_path: Path):
+        """One-shot import of the legacy ``{"users": ..., "metadata": ...}`` file"""
+        with self._transaction() as conn:
+            self._migrate(conn, json_path)
+
+    def _migrate(self, conn: sqlite3.Connection, json_path: Path):
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+
+        for user_id, wardrobe in data.get("users", {}).items():
+            self._upsert(conn, user_id, wardrobe)
+        conn.execute(
+            "INSERT OR REPLACE INTO metadata VALUES ('migrated_from_json', ?)",
+            (str(json_path),)
+        )
+        self._touch(conn)
+
+    def _upsert_user(self, conn: sqlite3.Connection, user_id: str):
+        conn.execute(
+            "INSERT INTO users VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (user_id, datetime.now().isoformat())
+        )
+
+    def _upsert(self, conn: sqlite3.Connection, user_id: str, wardrobe_data: Dict[str, Any]):
+        self._upsert_user(conn, user_id)
+        for category, value in wardrobe_data.items():
+            is_list = isinstance(value, list)
+            conn.execute(
+                "DELETE FROM items WHERE user_id = ? AND category = ?", (user_id, category)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO categories VALUES (?, ?, ?)",
+                (user_id, category, int(is_list))
+            )
+            values = value if is_list else [value]
+            conn.executemany(
+                "INSERT INTO items VALUES (?, ?, ?, ?)",
+                [(user_id, category, position, json.dumps(item))
+                 for position, item in enumerate(values)]
+            )
+
+    def _touch(self, conn: sqlite3.Connection):
+        conn.execute(
+            "UPDATE metadata SET value = ? WHERE key = 'last_updated'",
+            (datetime.now().isoformat(),)
+        )
+
+    def _read_wardrobes(self, conn: sqlite3.Connection, user_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+        users = {row[0]: {} for row in conn.execute(f"SELECT user_id FROM users {where}", params)}
+        for uid, category, is_list in conn.execute(
+            f"SELECT user_id, category, is_list FROM categories {where}", params
+        ):
+            users[uid][category] = [] if is_list else None
+        for uid, category, data in conn.execute(
+            f"SELECT user_id, category, data FROM items {where} ORDER BY user_id, category, position",
+            params
+        ):
+            wardrobe = users[uid]
+            if isinstance(wardrobe[category], list):
+                wardrobe[category].append(json.loads(data))
+            else:
+                wardrobe[category] = json.loads(data)
+        return users
+
     def load(self) -> Dict[str, Any]:
-        """Load data from JSON file"""
-        with open(self.file_path, 'r') as f:
-            return json.load(f)
-    
+        """Load every user's wardrobe in the legacy JSON document shape"""
+        with self._snapshot() as conn:
+            users = self._read_wardrobes(conn)
+            metadata = dict(conn.execute(
+                "SELECT key, value FROM metadata WHERE key IN ('version', 'last_updated')"
+            ).fetchall())
+        return {"users": users, "metadata": metadata}
+
     def save(self, data: Dict[str, Any]):
-        """Save data to JSON file"""
+        """Replace all stored wardrobes with ``data`` in one transaction"""
         data["metadata"]["last_updated"] = datetime.now().isoformat()
-        with open(self.file_path, 'w') as f:
-            json.dump(data, f, indent=4)
-    
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM users")
+            for user_id, wardrobe in data["users"].items():
+                self._upsert(conn, user_id, wardrobe)
+            self._touch(conn)
+
+    def get_user_wardrobe(self, user_id: str) -> Dict[str, Any]:
+        """Get one user's wardrobe; empty if the user does not exist"""
+        with self._snapshot() as conn:
+            return self._read_wardrobes(conn, user_id).get(user_id, {})
+
     def update_user_wardrobe(self, user_id: str, wardrobe_data: Dict[str, Any]):
         """Update specific user's wardrobe data"""
-        data = self.load()
-        if user_id not in data["users"]:
-            data["users"][user_id] = {}
-        data["users"][user_id].update(wardrobe_data)
-        self.save(data) 
\ No newline at end of file
+        with self._transaction() as conn:
+            self._upsert(conn, user_id, wardrobe_data)
+            self._touch(conn)
+
+    def update_many(self, updates: Dict[str, Dict[str, Any]]):
+        """Apply several users' wardrobe updates in one transaction"""
+        with self._transaction() as conn:
+            for user_id, wardrobe_data in updates.items():
+                self._upsert(conn, user_id, wardrobe_data)
+            self._touch(conn)
+
+    def append_items(self, user_id: str, items: Dict[str, List[Dict[str, Any]]]):
+        """Append items to a user's categories in one transaction.
+
+        Unlike ``update_user_wardrobe`` the stored items are kept; a
+        category holding a single item becomes a list.
+        """
+        with self._transaction() as conn:
+            self._upsert_user(conn, user_id)
+            for category, values in items.items():
+                start = conn.execute(
+                    "SELECT COALESCE(MAX(position) + 1, 0) FROM items WHERE user_id = ? AND category = ?",
+                    (user_id, category)
+                ).fetchone()[0]
+                # Not INSERT OR REPLACE: the delete would cascade to the items
+                conn.execute(
+                    "INSERT INTO categories VALUES (?, ?, 1) "
+                    "ON CONFLICT(user_id, category) DO UPDATE SET is_list = 1",
+                    (user_id, category)
+                )
+                conn.executemany(
+                    "INSERT INTO items VALUES (?, ?, ?, ?)",
+                    [(user_id, category, start + offset, json.dumps(item))
+                     for offset, item in enumerate(values)]
+                )
+            self._touch(conn)
+
+    def close(self):
+        """Close every pooled connection"""
+        self.pool.close()
@@ -1,11 +1,114 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Union
+from config import STORAGE_CONFIG
 from utils.database import Database
+from utils.metrics import QUEUE_DEPTH, stage_timer
+
+class AsyncDatabase:
+    """Awaitable access to ``Database`` that never blocks the event loop.
+
+    Every call runs on a dedicated thread pool sized to the connection pool,
+    so at most ``pool_size`` queries are in flight and each one has a pooled
+    connection waiting for it. Callers beyond that queue on the executor
+    instead of piling up on SQLite's busy handler.
+    """
+
+    def __init__(self, database: Optional[Database] = None):
+        self.database = database or Database()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.database.pool.size,
+            thread_name_prefix="db"
+        )
+
+    async def _run(self, func: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._timed, func, *args))
+
+    @staticmethod
+    def _timed(func: Callable, *args) -> Any:
+        # Timed on the executor thread, so queueing for a connection is excluded
+        timer = _DB_TIMERS.get(func.__name__)
+        if timer is None:
+            timer = _DB_TIMERS[func.__name__] = stage_timer(f"db_{func.__name__}")
+        with timer.time():
+            return func(*args)
+
+    async def load(self) -> Dict[str, Any]:
+        return await self._run(self.database.load)
+
+    async def save(self, data: Dict[str, Any]):
+        await self._run(self.database.save, data)
+
+    async def get_user_wardrobe(self, user_id: str) -> Dict[str, Any]:
+        return await self._run(self.database.get_user_wardrobe, user_id)
+
+    async def update_user_wardrobe(self, user_id: str, wardrobe_data: Dict[str, Any]):
+        await self._run(self.database.update_user_wardrobe, user_id, wardrobe_data)
+
+    async def update_many(self, updates: Dict[str, Dict[str, Any]]):
+        await self._run(self.database.update_many, updates)
+
+    async def append_items(self, user_id: str, items: Dict[str, List[Dict[str, Any]]]):
+        await self._run(self.database.append_items, user_id, items)
+
+    async def close(self):
+        """Wait for in-flight queries, then close every pooled connection"""
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._executor.shutdown, wait=True)
+        )
+        self.database.close()
+
+# Stage timers per Database method, e.g. db_load, db_save
+_DB_TIMERS: Dict[str, Any] = {}
+
+_shared_db: Optional[AsyncDatabase] = None
+_shared_store = None
+
+def get_async_database() -> AsyncDatabase:
+    """Process-wide pooled database, created on first use"""
+    global _shared_db
+    if _shared_db is None:
+        _shared_db = AsyncDatabase()
+    return _shared_db
+
+def get_wardrobe_store() -> Union[AsyncDatabase, "WriteBehindBuffer"]:
+    """Wardrobe store for request handlers.
+
+    The shared pool itself, or a write-behind buffer in front of it when
+    ``STORAGE_CONFIG["write_behind"]["enabled"]`` is set.
+    """
+    global _shared_store
+    if _shared_store is None:
+        settings = STORAGE_CONFIG["write_behind"]
+        if settings["enabled"]:
+            from utils.write_behind import WriteBehindBuffer
+            _shared_store = WriteBehindBuffer(
+                get_async_database(),
+                flush_interval=settings["flush_interval"],
+                max_pending=settings["max_pending"]
+            )
+            QUEUE_DEPTH.labels(queue="write_behind").set_function(
+                lambda: _shared_store.metrics()["pending_mutations"] if _shared_store else 0
+            )
+        else:
+            _shared_store = get_async_database()
+    return _shared_store
+
+async def close_db():
+    """Flush buffered writes and close the shared pool; call on shutdown"""
+    global _shared_db, _shared_store
+    store, _shared_store = _shared_store, None
+    if store is not None and store is not _shared_db:
+        await store.close()
+    if _shared_db is not None:
+        db, _shared_db = _shared_db, None
+        await db.close()
 
 @asynccontextmanager
-async def get_db() -> AsyncGenerator[Database, None]:
-    db = Database()
-    try:
-        yield db
-    finally:
-        await db.close() 
\ No newline at end of file
+async def get_db() -> AsyncGenerator[AsyncDatabase, None]:
+    # Hands out the shared pool; connections go back to it after each call,
+    # and the pool itself lives until close_db() at shutdown
+    yield get_async_database()
@@ -0,0 +1,110 @@
+"""Downscaled copies of an upload, made once and stored next to it.
+
+For ``uploads/<name>.<ext>`` the ingest stage writes:
+
+- ``<name>.analysis.jpg``: fits ``IMAGE_CONFIG["analysis_size"]``, read by colour analysis
+- ``<name>.thumb.jpg``: fits ``IMAGE_CONFIG["thumbnail_size"]``, read by previews
+- ``<name>.display.webp``: fits ``IMAGE_CONFIG["display_size"]``, for showing the item
+- ``<name>.meta.json``: original width, height and SHA-256
+
+Originals are validated from their header first (``utils.image_probe``).
+JPEGs are then decoded with PIL ``draft()``, so the DCT decoder scales
+down while decoding instead of materialising every full-resolution pixel.
+Every derivative is then produced from the next larger one.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Tuple, Union
+
+from PIL import Image
+
+from config import IMAGE_CONFIG
+from utils.image_probe import validate_image
+
+# Largest first: each derivative is shrunk from the previous one
+DERIVATIVES = (
+    ("display", "display_size", ".display.webp", "WEBP"),
+    ("thumbnail", "thumbnail_size", ".thumb.jpg", "JPEG"),
+    ("analysis", "analysis_size", ".analysis.jpg", "JPEG"),
+)
+DERIVATIVE_QUALITY = 85
+META_SUFFIX = ".meta.json"
+
+
+def derivative_path(original: Union[str, Path], name: str) -> Path:
+    original = Path(original)
+    if name == "meta":
+        return original.with_name(original.stem + META_SUFFIX)
+    suffix = next(suffix for key, _, suffix, _ in DERIVATIVES if key == name)
+    return original.with_name(original.stem + suffix)
+
+
+def is_derivative(path: Union[str, Path]) -> bool:
+    name = Path(path).name
+    return name.endswith(META_SUFFIX) or any(name.endswith(suffix) for _, _, suffix, _ in DERIVATIVES)
+
+
+def open_scaled(source, size: Tuple[int, int]) -> Image.Image:
+    """Open an image decoded at the smallest scale still covering ``size``"""
+    img = Image.open(source)
+    # Only JPEG honours draft(); other formats decode at full size
+    img.draft("RGB", size)
+    return img.convert("RGB")
+
+
+def create_derivatives(original: Union[str, Path]) -> Dict[str, Any]:
+    """Write every derivative and the metadata file for one upload.
+
+    Raises ValueError, before decoding, if the upload fails validation.
+    """
+    original = Path(original)
+    info = validate_image(original)
+    data = original.read_bytes()
+
+    img = open_scaled(original, IMAGE_CONFIG["display_size"])
+    paths = {}
+    for name, size_key, _, fmt in DERIVATIVES:
+        img.thumbnail(IMAGE_CONFIG[size_key], Image.LANCZOS)
+        path = derivative_path(original, name)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        img.save(tmp_path, fmt, quality=DERIVATIVE_QUALITY)
+        os.replace(tmp_path, path)
+        paths[name] = path
+
+    meta = {"width": info.width, "height": info.height, "digest": hashlib.sha256(data).hexdigest()}
+    meta_path = derivative_path(original, "meta")
+    tmp_path = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(meta))
+    os.replace(tmp_path, meta_path)
+    return {**paths, "meta": meta}
+
+
+def ensure_derivatives(original: Union[str, Path]) -> Dict[str, Any]:
+    """Derivative paths and metadata, creating them if missing or stale.
+
+    After the first call for an upload this is only a few ``stat`` calls
+    and a small JSON read.
+    """
+    original = Path(original)
+    original_mtime = original.stat().st_mtime
+    meta_path = derivative_path(original, "meta")
+    paths = {name: derivative_path(original, name) for name, _, _, _ in DERIVATIVES}
+    try:
+        fresh = all(path.stat().st_mtime >= original_mtime for path in [meta_path, *paths.values()])
+    except FileNotFoundError:
+        fresh = False
+    if not fresh:
+        return create_derivatives(original)
+    return {**paths, "meta": json.loads(meta_path.read_text())}
+
+
+def smallest_derivative(original: Union[str, Path], size: Tuple[int, int]) -> Path:
+    """The smallest stored copy whose bounding box covers ``size``"""
+    derivatives = ensure_derivatives(original)
+    for name, size_key, _, _ in reversed(DERIVATIVES):
+        box = IMAGE_CONFIG[size_key]
+        if box[0] >= size[0] and box[1] >= size[1]:
+            return derivatives[name]
+    return Path(original)
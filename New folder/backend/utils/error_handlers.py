@@ -20,11 +20,15 @@ class SuggestionError(OutfitSuggesterError):
     """Raised when suggestion generation fails"""
     pass
 
+class QueueFullError(OutfitSuggesterError):
+    """Raised when a background job queue has no room left"""
+    pass
+
 def handle_error(error: Exception) -> HTTPException:
     """Convert application errors to HTTP exceptions"""
     if isinstance(error, OutfitSuggesterError):
         return HTTPException(
-            status_code=400,
+            status_code=429 if isinstance(error, QueueFullError) else 400,
             detail={
                 "message": error.message,
                 "details": error.details
@@ -0,0 +1,326 @@
+"""Per-user wardrobe feature index.
+
+Each user's items live as struct-of-arrays in ``.npy`` files, one file
+per feature, that are memory-mapped on open:
+
+- ``lab``: CIE Lab colour of the item's dominant colour, float32 (N, 3)
+- ``category``: index into ``CATEGORIES``, uint8
+- ``occasion_bits`` / ``style_bits``: tags hashed into 64-bit sets, uint64
+- ``brightness``: mean HSV value from ``process_image``, float32 0..255
+- ``alive``: False for removed rows, bool
+
+Rows are appended as items are added and arrays double in capacity when
+full, so adding an item never recomputes features of the rest of the
+wardrobe. ``ids.jsonl`` next to the arrays is an append-only log of item
+ids, one per row, and ``meta.json`` holds the committed row count. A
+change flushes only the pages of the rows it touched and appends only new
+ids, so its cost does not grow with the wardrobe.
+"""
+import json
+import mmap
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from config import STORAGE_CONFIG
+from utils.suggestion_cache import normalize_occasion
+
+CATEGORIES = ("others", "tops", "bottoms", "dresses", "outerwear", "shoes", "accessories")
+TAG_BITS = 64
+INITIAL_CAPACITY = 64
+
+FIELDS = {
+    "lab": (np.float32, (3,)),
+    "category": (np.uint8, ()),
+    "occasion_bits": (np.uint64, ()),
+    "style_bits": (np.uint64, ()),
+    "brightness": (np.float32, ()),
+    "alive": (np.bool_, ()),
+}
+
+def _flush_rows(array: np.memmap, rows: Sequence[int]):
+    """msync only the pages holding ``rows`` instead of the whole mapping"""
+    if not rows:
+        return
+    mapped = getattr(array, "_mmap", None)
+    if mapped is None:
+        array.flush()
+        return
+    # np.memmap maps from the allocation boundary below its data offset
+    data_start = array.offset % mmap.ALLOCATIONGRANULARITY
+    row_bytes = array.strides[0]
+    first = data_start + min(rows) * row_bytes
+    end = data_start + (max(rows) + 1) * row_bytes
+    aligned = first - first % mmap.ALLOCATIONGRANULARITY
+    mapped.flush(aligned, end - aligned)
+
+
+_COLOR_PATTERN = re.compile(r"rgb\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)")
+
+
+def tag_bits(tags: Optional[Iterable[str]]) -> int:
+    """Hash free-text tags into a 64-bit set; equal tags always share a bit"""
+    bits = 0
+    for tag in tags or []:
+        tag = normalize_occasion(str(tag))
+        if tag:
+            bits |= 1 << (zlib.crc32(tag.encode("utf-8")) % TAG_BITS)
+    return bits
+
+
+def query_bits(text: str) -> int:
+    """Tag set matching the whole phrase or any of its words"""
+    text = normalize_occasion(text)
+    return tag_bits([text] + text.split()) if text else 0
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    """Number of set bits in each element of a uint64 array"""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """(N, 3) RGB 0..255 to (N, 3) CIE Lab with L in 0..100"""
+    pixels = np.asarray(rgb, dtype=np.float32).reshape(-1, 1, 3) / 255.0
+    return cv2.cvtColor(pixels, cv2.COLOR_RGB2LAB).reshape(-1, 3)
+
+
+def lab_to_rgb(lab: np.ndarray) -> np.ndarray:
+    """Inverse of ``rgb_to_lab``"""
+    pixels = np.asarray(lab, dtype=np.float32).reshape(-1, 1, 3)
+    rgb = cv2.cvtColor(pixels, cv2.COLOR_LAB2RGB).reshape(-1, 3)
+    return np.clip(rgb * 255.0, 0, 255)
+
+
+def category_code(category: Optional[str]) -> int:
+    return CATEGORIES.index(category) if category in CATEGORIES else 0
+
+
+def item_features(item: Dict[str, Any]) -> Tuple[Tuple[int, int, int], float]:
+    """Dominant RGB colour and brightness of a wardrobe item.
+
+    Prefers the ``image_features`` written by ``process_image``; otherwise
+    uses the first parseable colour of the item's palette.
+    """
+    features = item.get("image_features") or {}
+    rgb = features.get("dominant_color")
+    if rgb is None:
+        palette = item.get("colors") or (item.get("style_analysis") or {}).get("color_palette") or []
+        for color in palette:
+            match = _COLOR_PATTERN.fullmatch(str(color).strip())
+            if match:
+                rgb = tuple(int(channel) for channel in match.groups())
+                break
+    rgb = tuple(int(channel) for channel in (rgb or (0, 0, 0)))
+    brightness = features.get("brightness")
+    if brightness is None:
+        brightness = max(rgb)
+    return rgb, float(brightness)
+
+
+def item_id(item: Dict[str, Any]) -> str:
+    features = item.get("image_features") or {}
+    return str(item.get("id") or item.get("image_url") or item.get("url")
+               or features.get("processed_path"))
+
+
+def _item_fields(item: Dict[str, Any]) -> tuple:
+    rgb, brightness = item_features(item)
+    analysis = item.get("style_analysis") or {}
+    return (
+        item_id(item),
+        item.get("category"),
+        rgb,
+        brightness,
+        item.get("occasion_tags"),
+        (item.get("style_tags") or []) + list(analysis.get("style_tags") or [])
+    )
+
+
+class FeatureIndex:
+    """Memory-mapped struct-of-arrays feature store for one user"""
+
+    def __init__(self, directory: Path, initial_capacity: int = INITIAL_CAPACITY):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._meta_path = self.directory / "meta.json"
+        self._ids_path = self.directory / "ids.jsonl"
+
+        if self._meta_path.exists():
+            meta = json.loads(self._meta_path.read_text())
+            self.count = meta["count"]
+            self._arrays = {name: np.load(self._path(name), mmap_mode="r+") for name in FIELDS}
+            self.ids: List[str] = self._read_ids()
+        else:
+            self.count = 0
+            self.ids = []
+            self._arrays = {name: self._create(name, initial_capacity) for name in FIELDS}
+        self._persisted_ids = len(self.ids)
+        self._rows = {item: row for row, item in enumerate(self.ids)}
+        # Bumped on every change so derived structures know to rebuild
+        self.version = 0
+
+    def _path(self, name: str) -> Path:
+        return self.directory / f"{name}.npy"
+
+    def _read_ids(self) -> List[str]:
+        with open(self._ids_path) as f:
+            lines = f.read().split("\n")
+        ids = [json.loads(line) for line in lines[:self.count]]
+        # Ids appended by a write that never committed its count are dropped,
+        # so later appends line up with their rows again
+        if len(lines) != self.count + 1 or lines[-1]:
+            self.ids = ids
+            self._rewrite_ids()
+        return ids
+
+    def _rewrite_ids(self):
+        tmp = self._ids_path.with_suffix(".tmp")
+        tmp.write_text("".join(json.dumps(item) + "\n" for item in self.ids))
+        os.replace(tmp, self._ids_path)
+        self._write_count()
+
+    def _write_count(self):
+        tmp = self._meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"count": self.count}))
+        os.replace(tmp, self._meta_path)
+
+    def _create(self, name: str, capacity: int, suffix: str = "") -> np.memmap:
+        dtype, shape = FIELDS[name]
+        path = self._path(name).with_suffix(suffix + ".npy") if suffix else self._path(name)
+        return open_memmap(str(path), mode="w+", dtype=dtype, shape=(capacity,) + shape)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._arrays["alive"])
+
+    def _grow(self):
+        """Double every array, copying into new files swapped in by rename"""
+        capacity = self.capacity * 2
+        for name, old in self._arrays.items():
+            new = self._create(name, capacity, suffix=".grow")
+            new[:self.count] = old[:self.count]
+            new.flush()
+            del new
+        # Drop the old mappings before their files are replaced
+        self._arrays = {}
+        for name in FIELDS:
+            os.replace(self._path(name).with_suffix(".grow.npy"), self._path(name))
+        self._arrays = {name: np.load(self._path(name), mmap_mode="r+") for name in FIELDS}
+
+    def add(
+        self,
+        item_id: str,
+        category: Optional[str],
+        rgb: Sequence[int],
+        brightness: float,
+        occasion_tags: Optional[Iterable[str]] = None,
+        style_tags: Optional[Iterable[str]] = None
+    ) -> int:
+        """Insert or overwrite one item's features; returns its row"""
+        with self._lock:
+            row = self._set(item_id, category, rgb, brightness, occasion_tags, style_tags)
+            self.version += 1
+            self._commit([row])
+            return row
+
+    def _set(self, item_id, category, rgb, brightness, occasion_tags, style_tags) -> int:
+        row = self._rows.get(item_id)
+        if row is None:
+            if self.count == self.capacity:
+                self._grow()
+            row = self.count
+            self.count += 1
+            self.ids.append(item_id)
+            self._rows[item_id] = row
+
+        arrays = self._arrays
+        arrays["lab"][row] = rgb_to_lab(np.array([rgb]))[0]
+        arrays["category"][row] = category_code(category)
+        arrays["occasion_bits"][row] = tag_bits(occasion_tags)
+        arrays["style_bits"][row] = tag_bits(style_tags)
+        arrays["brightness"][row] = brightness
+        arrays["alive"][row] = True
+        return row
+
+    def add_item(self, item: Dict[str, Any]) -> int:
+        """Index a wardrobe item dict as stored by the wardrobe services"""
+        return self.add(*_item_fields(item))
+
+    def add_items(self, items: Iterable[Dict[str, Any]]) -> List[int]:
+        """Index several item dicts, flushing and writing metadata once"""
+        with self._lock:
+            rows = [self._set(*_item_fields(item)) for item in items]
+            self.version += 1
+            self._commit(rows)
+            return rows
+
+    def remove(self, item_id: str) -> bool:
+        """Mark an item's row dead; the row is reused if the id is re-added"""
+        with self._lock:
+            row = self._rows.get(item_id)
+            if row is None:
+                return False
+            self._arrays["alive"][row] = False
+            self.version += 1
+            self._commit([row])
+            return True
+
+    def _commit(self, rows: Sequence[int]):
+        """Persist the changed ``rows``, then any new ids and the count"""
+        # Arrays first, so the count never covers rows that are not on disk
+        for array in self._arrays.values():
+            _flush_rows(array, rows)
+        if self._persisted_ids < len(self.ids):
+            with open(self._ids_path, "a") as f:
+                f.write("".join(json.dumps(item) + "\n" for item in self.ids[self._persisted_ids:]))
+            self._persisted_ids = len(self.ids)
+            self._write_count()
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Views of every feature array over the used rows"""
+        with self._lock:
+            return {name: array[:self.count] for name, array in self._arrays.items()}
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._arrays["alive"][:self.count]))
+
+    def close(self):
+        with self._lock:
+            for array in self._arrays.values():
+                array.flush()
+            self._arrays = {}
+
+
+_indexes: Dict[str, FeatureIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _user_directory(user_id: str) -> Path:
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", user_id)
+    return Path(STORAGE_CONFIG["feature_index_dir"]) / f"{safe}-{zlib.crc32(user_id.encode()):08x}"
+
+
+def get_feature_index(user_id: str) -> FeatureIndex:
+    """The user's index, opened once per process"""
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is None:
+            index = _indexes[user_id] = FeatureIndex(_user_directory(user_id))
+        return index
+
+
+def close_feature_indexes():
+    with _indexes_lock:
+        for index in _indexes.values():
+            index.close()
+        _indexes.clear()
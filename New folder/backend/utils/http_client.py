@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+from config import HTTP_CONFIG, IMAGE_CONFIG
+from utils.error_handlers import ImageProcessingError
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying; anything else in 4xx/5xx fails immediately
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HTTPClient:
+    """One pooled aiohttp session shared by the AI services layer.
+
+    The session is opened on application startup and closed on shutdown,
+    so connections (and their TLS handshakes and DNS lookups) are reused
+    across requests within the configured per-host limits.
+    """
+
+    def __init__(self, **overrides):
+        settings = {**HTTP_CONFIG, **overrides}
+        self.limit = settings["limit"]
+        self.limit_per_host = settings["limit_per_host"]
+        self.keepalive_timeout = settings["keepalive_timeout"]
+        self.timeout = aiohttp.ClientTimeout(
+            total=settings["total_timeout"],
+            connect=settings["connect_timeout"],
+            sock_read=settings["read_timeout"]
+        )
+        self.retries = settings["retries"]
+        self.backoff = settings["backoff"]
+        self.chunk_size = settings["chunk_size"]
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch_bytes(self, url: str, max_size: Optional[int] = None) -> bytes:
+        """Download ``url`` with retries, refusing bodies over ``max_size``.
+
+        The limit is checked against Content-Length up front and again while
+        streaming, so an oversized body is never fully buffered.
+        """
+        max_size = max_size or IMAGE_CONFIG["max_file_size"]
+        await self.start()
+
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._fetch_once(url, max_size)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError, _RetryableStatus) as e:
+                if attempt == self.retries:
+                    raise ImageProcessingError(
+                        "Failed to fetch image",
+                        details={"url": url, "attempts": attempt + 1, "error": str(e)}
+                    )
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(f"Fetching {url} failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _fetch_once(self, url: str, max_size: int) -> bytes:
+        async with self._session.get(url) as response:
+            if response.status in RETRY_STATUSES:
+                raise _RetryableStatus(response.status)
+            if response.status != 200:
+                raise ImageProcessingError(
+                    "Failed to fetch image", details={"url": url, "status": response.status}
+                )
+            if response.content_length is not None and response.content_length > max_size:
+                raise _too_large(url, max_size)
+
+            body = bytearray()
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                body.extend(chunk)
+                if len(body) > max_size:
+                    raise _too_large(url, max_size)
+            return bytes(body)
+
+class _RetryableStatus(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+def _too_large(url: str, max_size: int) -> ImageProcessingError:
+    return ImageProcessingError(
+        "Image exceeds maximum file size", details={"url": url, "max_size": max_size}
+    )
+
+http_client = HTTPClient()
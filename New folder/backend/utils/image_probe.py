@@ -0,0 +1,86 @@
+"""Header-only image validation, run before anything is decoded.
+
+``Image.open`` only parses the header, so format, dimensions and frame
+count are known without touching the pixel data. ``validate_image`` uses
+them to refuse oversized, multi-frame or disallowed images with
+``ValueError``. Decoders only see images that passed, and large JPEGs are
+then decoded at reduced scale (``utils.derivatives.open_scaled``).
+PIL's own decompression-bomb limit is set to the same pixel budget, as a
+backstop for any decode that skips this check.
+"""
+import os
+import warnings
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, NamedTuple, Optional, Union
+
+from PIL import Image
+
+from config import IMAGE_CONFIG
+
+Image.MAX_IMAGE_PIXELS = IMAGE_CONFIG["max_pixels"]
+
+Source = Union[str, Path, bytes, BinaryIO]
+
+
+class ImageInfo(NamedTuple):
+    format: str
+    width: int
+    height: int
+    frames: int
+
+
+def probe_image(source: Source) -> ImageInfo:
+    """Format, size and frame count, read from the header only"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = BytesIO(source)
+    try:
+        # Between one and two times the limit PIL only warns; validate_image
+        # refuses those itself
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            img = Image.open(source)
+        with img:
+            width, height = img.size
+            return ImageInfo(img.format or "", width, height, getattr(img, "n_frames", 1))
+    except Image.DecompressionBombError as e:
+        raise ValueError(str(e)) from e
+    except (OSError, SyntaxError) as e:
+        raise ValueError(f"Not a readable image: {e}") from e
+
+
+def _byte_size(source: Source) -> Optional[int]:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if isinstance(source, (str, Path)):
+        return os.path.getsize(source)
+    return None
+
+
+def validate_image(source: Source, name: Optional[str] = None) -> ImageInfo:
+    """Header facts of ``source``, or ValueError if it must not be decoded.
+
+    ``name`` (a filename or URL) is checked against the allowed extensions;
+    paths are checked by their own name.
+    """
+    if name is None and isinstance(source, (str, Path)):
+        name = str(source)
+    if name is not None:
+        extension = Path(name.split("?", 1)[0]).suffix.lower()
+        if extension and extension not in IMAGE_CONFIG["allowed_extensions"]:
+            raise ValueError(f"File type {extension} is not allowed")
+
+    size = _byte_size(source)
+    if size is not None and size > IMAGE_CONFIG["max_file_size"]:
+        raise ValueError(f"Image is {size} bytes, over the {IMAGE_CONFIG['max_file_size']} byte limit")
+
+    info = probe_image(source)
+    if info.format not in IMAGE_CONFIG["allowed_formats"]:
+        raise ValueError(f"Image format {info.format or 'unknown'} is not allowed")
+    if info.width * info.height > IMAGE_CONFIG["max_pixels"]:
+        raise ValueError(
+            f"Image is {info.width}x{info.height}, over the {IMAGE_CONFIG['max_pixels']} pixel limit"
+        )
+    if info.frames > IMAGE_CONFIG["max_frames"]:
+        raise ValueError(f"Image has {info.frames} frames, over the {IMAGE_CONFIG['max_frames']} frame limit")
+    return info
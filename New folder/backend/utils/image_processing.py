@@ -1,21 +1,22 @@
+from io import BytesIO
+from pathlib import Path
 from PIL import Image
 import cv2
 import numpy as np
-from typing import Tuple, Dict
-import os
-import time
-import uuid
+from typing import Tuple, Dict, Union
+from config import IMAGE_CONFIG, UPLOAD_DIR
+from utils.color_extraction import dominant_color
+from utils.derivatives import ensure_derivatives, open_scaled
+from utils.image_probe import validate_image
+from utils.uploads import local_upload
 
 def process_image(image_path: str) -> Dict:
     """Process uploaded image and extract features"""
-    # Load image
-    img = Image.open(image_path)
+    # Downscaled copies are made once, next to the upload
+    derivatives = ensure_derivatives(image_path)
     
-    # Resize for consistent processing
-    img = img.resize((300, 300))
-    
-    # Convert to numpy array for OpenCV processing
-    img_array = np.array(img)
+    # Features only need the small analysis copy
+    img_array = np.array(Image.open(derivatives["analysis"]).convert("RGB"))
     
     # Extract dominant color
     dominant_color = get_dominant_color(img_array)
@@ -24,36 +25,42 @@ def process_image(image_path: str) -> Dict:
     features = {
         "dominant_color": dominant_color,
         "brightness": calculate_brightness(img_array),
-        "processed_path": save_processed_image(img)
+        "processed_path": str(derivatives["thumbnail"]),
+        "derivatives": {
+            name: str(derivatives[name]) for name in ("analysis", "thumbnail", "display")
+        },
+        "size": {"width": derivatives["meta"]["width"], "height": derivatives["meta"]["height"]},
+        "digest": derivatives["meta"]["digest"]
     }
     
     return features
 
+def item_image_features(image_ref: str, image_data: bytes,
+                        upload_dir: Union[str, Path] = UPLOAD_DIR) -> Dict:
+    """Features to store and index with an item being added.
+
+    A local upload gets the full ``process_image`` features (and its
+    derivatives); a remote image gets the dominant colour and brightness
+    of the bytes already downloaded for its style analysis.
+    """
+    path = local_upload(image_ref, upload_dir)
+    if path is not None:
+        return process_image(path)
+    validate_image(image_data, image_ref)
+    img_array = np.array(open_scaled(BytesIO(image_data), IMAGE_CONFIG["analysis_size"]))
+    return {
+        "dominant_color": get_dominant_color(img_array),
+        "brightness": calculate_brightness(img_array)
+    }
+
 def get_dominant_color(img_array: np.ndarray) -> Tuple[int, int, int]:
     """Extract the dominant color from an image"""
-    pixels = img_array.reshape(-1, 3)
-    from sklearn.cluster import KMeans
-    kmeans = KMeans(n_clusters=1)
-    kmeans.fit(pixels)
-    dominant_color = kmeans.cluster_centers_[0]
-    return tuple(map(int, dominant_color))
+    # A single k-means cluster centre is just the mean colour
+    return dominant_color(img_array)
 
 def calculate_brightness(img_array: np.ndarray) -> float:
     """Calculate the average brightness of an image"""
     hsv = cv2.cvtColor(img_array, cv2.COLOR_RGB2HSV)
     return hsv[:, :, 2].mean()
 
-def save_processed_image(img: Image) -> str:
-    """Save processed image and return path"""
-    # Create uploads directory if it doesn't exist
-    upload_dir = "backend/uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Generate unique filename
-    filename = f"{int(time.time())}_{uuid.uuid4().hex[:8]}.jpg"
-    processed_path = os.path.join(upload_dir, filename)
-    
-    img.save(processed_path)
-    return processed_path
-
 # ... existing code ... 
\ No newline at end of file
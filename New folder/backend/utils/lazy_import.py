@@ -0,0 +1,47 @@
+"""Deferred imports for heavy dependencies.
+
+``lazy_import("cv2")`` returns a stand-in that imports the real module on
+first attribute access. A process therefore pays for numpy, OpenCV, PIL or
+the model SDK only once a code path actually uses them. Modules holding
+such stand-ins need ``from __future__ import annotations``, so that
+annotations like ``np.ndarray`` are not evaluated when functions are
+defined.
+"""
+import importlib
+from typing import Any
+
+# Checked by the import-time report and tests: none of these should load
+# for text-only requests
+HEAVY_MODULES = ("numpy", "cv2", "PIL", "sklearn", "requests", "google.generativeai", "uagents")
+
+
+class LazyModule:
+    __slots__ = ("_name", "_module")
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            module = importlib.import_module(self._name)
+            object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr: str):
+        delattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
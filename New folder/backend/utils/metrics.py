@@ -0,0 +1,281 @@
+"""In-process metrics exposed in the Prometheus text format.
+
+Counters, gauges and histograms register with a ``Registry``. Bind label
+values once (``STAGE_SECONDS.labels(stage="fetch")``) and keep the child:
+recording is then a lock and a few additions, with nothing formatted until
+the registry is scraped, so the timers can stay on under load.
+
+``snapshot()`` gives every sample keyed by its exposition name, e.g.
+``stage_duration_seconds_bucket{stage="fetch",le="0.1"}``. Snapshots from
+several processes (the outfit agent workers) are combined with
+``merge_snapshots`` before ``render``.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Snapshot = Dict[str, Dict[str, Any]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample_key(name: str, labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric"):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def snapshot(self) -> Snapshot:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {
+                "type": metric.kind,
+                "help": metric.documentation,
+                "samples": dict(metric.samples())
+            }
+            for metric in metrics
+        }
+
+    def render(self) -> str:
+        return render(self.snapshot())
+
+
+def merge_snapshots(snapshots: Iterable[Snapshot]) -> Snapshot:
+    """Sum samples with the same key across snapshots"""
+    merged: Snapshot = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            target = merged.setdefault(name, {"type": family["type"], "help": family["help"], "samples": {}})
+            samples = target["samples"]
+            for key, value in family["samples"].items():
+                samples[key] = samples.get(key, 0) + value
+    return merged
+
+
+def render(snapshot: Snapshot) -> str:
+    """Prometheus text exposition of a snapshot"""
+    lines = []
+    for name, family in snapshot.items():
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        lines.extend(f"{key} {_format_value(value)}" for key, value in family["samples"].items())
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional[Registry] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels: Any):
+        """The child for one set of label values, created on first use"""
+        values = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        return self.labels()
+
+    def _labelled_children(self) -> List[Tuple[List[Tuple[str, str]], Any]]:
+        with self._lock:
+            children = list(self._children.items())
+        return [(list(zip(self.labelnames, values)), child) for values, child in children]
+
+    def samples(self) -> Iterator[Tuple[str, float]]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value", "function", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from ``function`` at collection time instead"""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled().inc(amount)
+
+    def samples(self):
+        for labels, child in self._labelled_children():
+            yield _sample_key(f"{self.name}_total", labels), child.get()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        self._unlabelled().set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self._unlabelled().set_function(function)
+
+    def samples(self):
+        for labels, child in self._labelled_children():
+            try:
+                value = child.get()
+            except Exception:
+                # A broken callback must not take down the whole scrape
+                continue
+            yield _sample_key(self.name, labels), value
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: "_HistogramChild"):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bucket plus +Inf, not cumulative until collected
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Context manager observing the elapsed seconds"""
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._unlabelled().observe(value)
+
+    def time(self) -> _Timer:
+        return self._unlabelled().time()
+
+    def samples(self):
+        for labels, child in self._labelled_children():
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                yield _sample_key(f"{self.name}_bucket", labels + [("le", le)]), cumulative
+            yield _sample_key(f"{self.name}_sum", labels), total
+            yield _sample_key(f"{self.name}_count", labels), cumulative
+
+
+# Shared metrics; bind the labels once where they are recorded
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]
+)
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds", "Time spent in each processing stage", ["stage"]
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests", "Cache lookups by cache and result", ["cache", "result"]
+)
+ERRORS = Counter("errors", "Errors by stage", ["stage"])
+QUEUE_DEPTH = Gauge("queue_depth", "Work waiting in each queue", ["queue"])
+
+
+def stage_timer(stage: str) -> _HistogramChild:
+    return STAGE_SECONDS.labels(stage=stage)
+
+
+def cache_counters(cache: str) -> Tuple[_Value, _Value]:
+    """(hit, miss) counters for one cache"""
+    return CACHE_REQUESTS.labels(cache=cache, result="hit"), CACHE_REQUESTS.labels(cache=cache, result="miss")
+
+
+def error_counter(stage: str) -> _Value:
+    return ERRORS.labels(stage=stage)
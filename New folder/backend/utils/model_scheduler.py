@@ -0,0 +1,161 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from config import MODEL_CONFIG
+from utils.metrics import error_counter, stage_timer
+
+MODEL_CALL_TIMER = stage_timer("model_call")
+MODEL_ERRORS = error_counter("model_call")
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, at most ``capacity`` saved up"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # The lock keeps waiters in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class ModelScheduler:
+    """Rate-limited, concurrency-bounded access to a generative model.
+
+    Every model call goes through a token bucket (``requests_per_minute``
+    with ``burst`` headroom) and a semaphore of ``max_concurrency``, so
+    bursts queue here instead of tripping provider rate limits.
+    """
+
+    def __init__(
+        self,
+        model,
+        requests_per_minute: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_concurrency: Optional[int] = None
+    ):
+        self.model = model
+        self.bucket = TokenBucket(
+            (requests_per_minute or MODEL_CONFIG["requests_per_minute"]) / 60.0,
+            burst or MODEL_CONFIG["burst"]
+        )
+        self.max_concurrency = max_concurrency or MODEL_CONFIG["max_concurrency"]
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.calls = 0
+        self.in_flight = 0
+
+    async def generate(self, contents) -> str:
+        """Send one prompt (text or multimodal parts) and return the response text"""
+        await self.bucket.acquire()
+        async with self._semaphore:
+            self.calls += 1
+            self.in_flight += 1
+            try:
+                with MODEL_CALL_TIMER.time():
+                    if hasattr(self.model, "generate_content_async"):
+                        response = await self.model.generate_content_async(contents)
+                    else:
+                        response = await asyncio.get_running_loop().run_in_executor(
+                            None, self.model.generate_content, contents
+                        )
+            except Exception:
+                MODEL_ERRORS.inc()
+                raise
+            finally:
+                self.in_flight -= 1
+
+        if not response.text:
+            MODEL_ERRORS.inc()
+            raise ValueError("Empty response from model")
+        return response.text
+
+class MicroBatcher:
+    """Packs items submitted within a short window into one handler call.
+
+    The first ``submit`` opens a batch; it is dispatched after ``window``
+    seconds or as soon as ``max_batch_size`` items have joined. ``handler``
+    receives the items in submission order and must return one result per
+    item, which is handed back to the matching caller. If the handler
+    fails, every caller in that batch gets the exception.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], Awaitable[List[Any]]],
+        window: Optional[float] = None,
+        max_batch_size: Optional[int] = None
+    ):
+        self.handler = handler
+        self.window = MODEL_CONFIG["batch_window"] if window is None else window
+        self.max_batch_size = max_batch_size or MODEL_CONFIG["max_batch_size"]
+        self._items: List[Any] = []
+        self._futures: List[asyncio.Future] = []
+        self._timer: Optional[asyncio.Task] = None
+        # The loop only keeps weak references to tasks; hold in-flight
+        # batches here so they are not collected before they finish
+        self._running: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append(item)
+        self._futures.append(future)
+
+        if len(self._items) >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.create_task(self._dispatch_after_window())
+        return await future
+
+    async def _dispatch_after_window(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        self._dispatch()
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._items:
+            return
+        items, futures = self._items, self._futures
+        self._items, self._futures = [], []
+        task = asyncio.get_running_loop().create_task(self._run(items, futures))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, items: List[Any], futures: List[asyncio.Future]):
+        self.batches += 1
+        self.items += len(items)
+        try:
+            results = await self.handler(items)
+            if len(results) != len(items):
+                raise ValueError(f"Expected {len(items)} results, got {len(results)}")
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0
+        }
@@ -0,0 +1,291 @@
+"""Local outfit ranking over a categorised wardrobe.
+
+Candidate outfits take one item from each core category (tops, bottoms,
+shoes) and optionally one outerwear piece and accessories. Each outfit is
+scored on:
+
+- colour harmony: pairwise hue relationships (analogous, complementary,
+  triadic) between the items' dominant colours, with neutrals matching
+  anything and a little credit for light/dark contrast;
+- occasion fit: overlap between an item's ``occasion_tags``/``style_tags``
+  and the occasion text;
+- classifier confidence.
+
+All scoring is vectorised with NumPy. Each category is first pruned to the
+``beam`` items with the best individual score plus best possible pairing,
+so the full cross product stays small even with hundreds of items per
+category.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.feature_index import FeatureIndex, category_code, lab_to_rgb, popcount, query_bits
+from utils.suggestion_cache import normalize_occasion
+
+CORE_CATEGORIES = ("tops", "bottoms", "shoes")
+OPTIONAL_CATEGORIES = ("outerwear",)
+ACCESSORY_CATEGORY = "accessories"
+
+DEFAULT_BEAM = 16
+HARMONY_WEIGHT = 0.5
+OCCASION_WEIGHT = 0.3
+CONFIDENCE_WEIGHT = 0.2
+
+# Items without any tags are neither a match nor a mismatch
+UNTAGGED_OCCASION_FIT = 0.5
+NEUTRAL_SATURATION = 0.2
+NEUTRAL_VALUE = 0.15
+NEUTRAL_HARMONY = 0.85
+
+_COLOR_PATTERN = re.compile(r"rgb\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)")
+
+
+def parse_color(color: str) -> Optional[Tuple[int, int, int]]:
+    """RGB triple from ``rgb(r,g,b)`` or ``#rrggbb``; None if unparseable"""
+    match = _COLOR_PATTERN.fullmatch(color.strip())
+    if match:
+        return tuple(min(255, int(channel)) for channel in match.groups())
+    if re.fullmatch(r"#[0-9a-fA-F]{6}", color.strip()):
+        return tuple(int(color.strip()[i:i + 2], 16) for i in (1, 3, 5))
+    return None
+
+
+def _hsv(rgb: np.ndarray) -> np.ndarray:
+    """(N, 3) RGB in 0..255 to (N, 3) hue degrees, saturation, value"""
+    rgb = rgb.astype(np.float64) / 255.0
+    high = rgb.max(axis=1)
+    low = rgb.min(axis=1)
+    delta = high - low
+    safe = np.where(delta == 0, 1.0, delta)
+    r, g, b = rgb.T
+    hue = np.select(
+        [high == r, high == g],
+        [((g - b) / safe) % 6, (b - r) / safe + 2],
+        (r - g) / safe + 4
+    ) * 60.0
+    hue = np.where(delta == 0, 0.0, hue)
+    saturation = np.where(high == 0, 0.0, delta / np.where(high == 0, 1.0, high))
+    return np.stack([hue, saturation, high], axis=1)
+
+
+def harmony_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise colour harmony in [0, 1] between two (N, 3) HSV arrays"""
+    dh = np.abs(a[:, None, 0] - b[None, :, 0])
+    dh = np.minimum(dh, 360.0 - dh)
+    hue_score = np.maximum.reduce([
+        np.exp(-(dh / 30.0) ** 2),             # analogous / monochrome
+        np.exp(-((dh - 180.0) / 25.0) ** 2),   # complementary
+        np.exp(-((dh - 120.0) / 20.0) ** 2),   # triadic
+    ])
+    neutral_a = (a[:, 1] < NEUTRAL_SATURATION) | (a[:, 2] < NEUTRAL_VALUE)
+    neutral_b = (b[:, 1] < NEUTRAL_SATURATION) | (b[:, 2] < NEUTRAL_VALUE)
+    score = np.where(neutral_a[:, None] | neutral_b[None, :], NEUTRAL_HARMONY, hue_score)
+    contrast = np.abs(a[:, None, 2] - b[None, :, 2])
+    return np.clip(score + 0.1 * contrast, 0.0, 1.0)
+
+
+def occasion_fit(item: Dict[str, Any], occasion: str) -> float:
+    """Share of an item's tags that match the occasion text"""
+    tags = [normalize_occasion(str(tag)) for tag in
+            (item.get("occasion_tags") or []) + (item.get("style_tags") or [])]
+    tags = [tag for tag in tags if tag]
+    if not tags or not occasion:
+        return UNTAGGED_OCCASION_FIT
+    terms = set(occasion.split())
+    matches = sum(1 for tag in tags if tag in occasion or terms & set(tag.split()))
+    return matches / len(tags)
+
+
+class _Category:
+    """Feature arrays for one wardrobe category"""
+
+    def __init__(self, name: str, items: List[Dict[str, Any]], occasion: str):
+        self.name = name
+        self.items = items
+        rgb = np.array([
+            next(filter(None, map(parse_color, item.get("colors") or [])), (0, 0, 0))
+            for item in items
+        ], dtype=np.float64).reshape(-1, 3)
+        self.rgb = rgb.astype(int)
+        self.hsv = _hsv(rgb)
+        fit = np.array([occasion_fit(item, occasion) for item in items])
+        confidence = np.array([float(item.get("confidence", 0.5)) for item in items])
+        self.unary = (OCCASION_WEIGHT * fit + CONFIDENCE_WEIGHT * confidence) / (
+            OCCASION_WEIGHT + CONFIDENCE_WEIGHT
+        )
+
+    @classmethod
+    def from_index(cls, name: str, ids: List[str], lab: np.ndarray, fit: np.ndarray) -> "_Category":
+        """Category built from precomputed ``FeatureIndex`` rows"""
+        category = object.__new__(cls)
+        category.name = name
+        category.items = [{"url": item_id} for item_id in ids]
+        rgb = lab_to_rgb(lab)
+        category.rgb = np.rint(rgb).astype(int)
+        category.hsv = _hsv(rgb)
+        # Indexed items were confirmed by the user, so confidence is full
+        category.unary = (OCCASION_WEIGHT * fit + CONFIDENCE_WEIGHT) / (
+            OCCASION_WEIGHT + CONFIDENCE_WEIGHT
+        )
+        return category
+
+    def take(self, index: np.ndarray) -> "_Category":
+        pruned = object.__new__(_Category)
+        pruned.name = self.name
+        pruned.items = [self.items[i] for i in index]
+        pruned.rgb = self.rgb[index]
+        pruned.hsv = self.hsv[index]
+        pruned.unary = self.unary[index]
+        return pruned
+
+
+class OutfitEngine:
+    """Ranks full outfits from a categorised wardrobe without a remote model"""
+
+    def __init__(self, beam: int = DEFAULT_BEAM):
+        self.beam = beam
+
+    def _prune(self, categories: List[_Category]) -> List[_Category]:
+        """Keep each category's best ``beam`` items by own score plus best pairing"""
+        if all(len(category.items) <= self.beam for category in categories):
+            return categories
+        potential = [category.unary.copy() for category in categories]
+        for i in range(len(categories)):
+            for j in range(i + 1, len(categories)):
+                matrix = harmony_matrix(categories[i].hsv, categories[j].hsv)
+                potential[i] += matrix.max(axis=1)
+                potential[j] += matrix.max(axis=0)
+
+        pruned = []
+        for category, scores in zip(categories, potential):
+            if len(category.items) <= self.beam:
+                pruned.append(category)
+                continue
+            keep = np.argpartition(-scores, self.beam - 1)[:self.beam]
+            pruned.append(category.take(keep))
+        return pruned
+
+    def rank(self, wardrobe: Dict[str, List[Dict[str, Any]]], occasion: str = "", k: int = 3) -> List[Dict[str, Any]]:
+        """Top ``k`` outfits shaped like ``schemas.OutfitSuggestion``"""
+        occasion = normalize_occasion(occasion)
+        core = [_Category(name, wardrobe[name], occasion)
+                for name in CORE_CATEGORIES if wardrobe.get(name)]
+        outerwear = [_Category(name, wardrobe[name], occasion)
+                     for name in OPTIONAL_CATEGORIES if wardrobe.get(name)]
+        accessories = (_Category(ACCESSORY_CATEGORY, wardrobe[ACCESSORY_CATEGORY], occasion)
+                       if wardrobe.get(ACCESSORY_CATEGORY) else None)
+        return self._rank(core, outerwear, accessories, k)
+
+    def rank_index(self, index: FeatureIndex, occasion: str = "", k: int = 3) -> List[Dict[str, Any]]:
+        """Top ``k`` outfits from a user's feature index, without touching images"""
+        arrays = index.arrays()
+        ids = np.array(index.ids[:len(arrays["alive"])], dtype=object)
+        bits = arrays["occasion_bits"] | arrays["style_bits"]
+        tagged = popcount(bits)
+        matched = popcount(bits & np.uint64(query_bits(occasion)))
+        fit = np.where(tagged > 0, matched / np.maximum(tagged, 1), UNTAGGED_OCCASION_FIT)
+
+        def category(name: str) -> Optional[_Category]:
+            rows = np.flatnonzero(arrays["alive"] & (arrays["category"] == category_code(name)))
+            if not len(rows):
+                return None
+            return _Category.from_index(name, list(ids[rows]), arrays["lab"][rows], fit[rows])
+
+        core = [c for c in map(category, CORE_CATEGORIES) if c is not None]
+        outerwear = [c for c in map(category, OPTIONAL_CATEGORIES) if c is not None]
+        return self._rank(core, outerwear, category(ACCESSORY_CATEGORY), k)
+
+    def _rank(self, core: List[_Category], outerwear: List[_Category],
+              accessories: Optional[_Category], k: int) -> List[Dict[str, Any]]:
+        if not core:
+            return []
+        core = self._prune(core)
+
+        # Broadcast every core combination into one score tensor
+        shape = tuple(len(category.items) for category in core)
+        unary = np.zeros(shape)
+        for axis, category in enumerate(core):
+            unary = unary + _along(category.unary, axis, len(core))
+        unary /= len(core)
+
+        harmony = np.zeros(shape)
+        pairs = 0
+        for i in range(len(core)):
+            for j in range(i + 1, len(core)):
+                matrix = harmony_matrix(core[i].hsv, core[j].hsv)
+                harmony = harmony + _expand(matrix, i, j, len(core))
+                pairs += 1
+        harmony = harmony / pairs if pairs else np.full(shape, NEUTRAL_HARMONY)
+
+        scores = (HARMONY_WEIGHT * harmony
+                  + (OCCASION_WEIGHT + CONFIDENCE_WEIGHT) * unary).ravel()
+        k = min(k, scores.size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+
+        outfits = []
+        for flat in best:
+            picks = np.unravel_index(flat, shape)
+            chosen = [(category, int(index)) for category, index in zip(core, picks)]
+            score = float(scores[flat])
+
+            # Optional layers only join when they raise the outfit score
+            for layer in outerwear:
+                layer_scores = self._layer_scores(layer, chosen)
+                top = int(np.argmax(layer_scores))
+                if layer_scores[top] > score:
+                    chosen.append((layer, top))
+
+            suggested = []
+            if accessories is not None:
+                accessory_scores = self._layer_scores(accessories, chosen)
+                for index in np.argsort(-accessory_scores, kind="stable")[:2]:
+                    if accessory_scores[index] > score:
+                        suggested.append(_wardrobe_item(accessories, int(index)))
+
+            outfits.append({
+                "items": [_wardrobe_item(category, index) for category, index in chosen],
+                "suggested_accessories": suggested,
+                "confidence_score": round(score, 4)
+            })
+        return outfits
+
+    def _layer_scores(self, layer: _Category, chosen: List[Tuple[_Category, int]]) -> np.ndarray:
+        """Score of each ``layer`` item as an addition to the chosen outfit"""
+        harmony = np.mean([
+            harmony_matrix(layer.hsv, category.hsv[index:index + 1])[:, 0]
+            for category, index in chosen
+        ], axis=0)
+        return HARMONY_WEIGHT * harmony + (OCCASION_WEIGHT + CONFIDENCE_WEIGHT) * layer.unary
+
+
+def _along(values: np.ndarray, axis: int, ndim: int) -> np.ndarray:
+    shape = [1] * ndim
+    shape[axis] = len(values)
+    return values.reshape(shape)
+
+
+def _expand(matrix: np.ndarray, i: int, j: int, ndim: int) -> np.ndarray:
+    shape = [1] * ndim
+    shape[i], shape[j] = matrix.shape
+    return matrix.reshape(shape)
+
+
+def _wardrobe_item(category: _Category, index: int) -> Dict[str, Any]:
+    """An analysed wardrobe entry in ``schemas.WardrobeItem`` shape"""
+    item = category.items[index]
+    return {
+        "category": category.name,
+        "style": item.get("style", ""),
+        "image_url": item.get("url") or item.get("image_url", ""),
+        "occasion_tags": list(item.get("occasion_tags") or []),
+        "color": {"rgb": category.rgb[index].tolist(), "palette": list(item.get("colors") or [])},
+        "style_tags": item.get("style_tags")
+    }
+
+
+def rank_outfits(wardrobe: Dict[str, List[Dict[str, Any]]], occasion: str = "", k: int = 3,
+                 beam: int = DEFAULT_BEAM) -> List[Dict[str, Any]]:
+    return OutfitEngine(beam).rank(wardrobe, occasion, k)
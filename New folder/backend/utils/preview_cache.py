@@ -0,0 +1,102 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from utils.metrics import cache_counters
+
+HIT_COUNTER, MISS_COUNTER = cache_counters("preview")
+
+
+def preview_key(items: Iterable[Tuple[str, str]], layout_version: str, variant: str = "") -> str:
+    """Content address of a preview: its (category, item hash) set plus layout.
+
+    Items are sorted, so the same outfit always maps to the same key no
+    matter the order it was requested in.
+    """
+    parts = [f"layout={layout_version}", f"variant={variant}"]
+    parts.extend(f"{category}:{item_hash}" for category, item_hash in sorted(items))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+class PreviewCache:
+    """Encoded preview bytes, in a bounded memory LRU above an optional disk tier.
+
+    ``get`` checks memory first, then the file at ``disk_path`` (promoting a
+    disk hit into memory). ``put`` always fills memory and writes the file
+    only when a ``disk_path`` is given, so persistence stays the caller's
+    choice.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._used_bytes -= len(previous)
+        self._entries[key] = data
+        self._used_bytes += len(data)
+        while self._used_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._used_bytes -= len(evicted)
+
+    def get(self, key: str, disk_path: Optional[str] = None) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                HIT_COUNTER.inc()
+                return data
+
+        if disk_path is not None:
+            try:
+                with open(disk_path, "rb") as f:
+                    data = f.read()
+                # Reading counts as use for the retention policy
+                os.utime(disk_path)
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                with self._lock:
+                    self._remember(key, data)
+                    self.disk_hits += 1
+                HIT_COUNTER.inc()
+                return data
+
+        with self._lock:
+            self.misses += 1
+        MISS_COUNTER.inc()
+        return None
+
+    def put(self, key: str, data: bytes, disk_path: Optional[str] = None):
+        with self._lock:
+            self._remember(key, data)
+        if disk_path is not None and not os.path.exists(disk_path):
+            os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+            tmp_path = f"{disk_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, disk_path)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._used_bytes
+            }
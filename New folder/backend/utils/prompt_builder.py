@@ -0,0 +1,132 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import MODEL_CONFIG
+from utils.suggestion_cache import normalize_occasion
+
+SUGGESTION_PROMPT = """
+Suggest an outfit for {occasion} using only these wardrobe items.
+One item per line: {columns}
+
+{table}
+
+Consider occasion appropriateness, color coordination, style matching and
+weather suitability. Respond with only a JSON object with the keys
+"items" (list of item ids), "suggested_accessories" (list of item ids),
+"styling_tips" (string) and "confidence_score" (number from 0 to 1).
+"""
+
+COLUMNS = ("id", "category", "style", "occasions", "style_tags", "color")
+
+
+def flatten_wardrobe(wardrobe: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Wardrobe categories (single items or lists) as one list of item dicts"""
+    items = []
+    for category, value in wardrobe.items():
+        for item in value if isinstance(value, list) else [value]:
+            if item is None:
+                continue
+            if not isinstance(item, dict):
+                item = {"style": str(item)}
+            items.append({"category": category, **item})
+    return items
+
+
+def _tags(values: Optional[List[str]]) -> List[str]:
+    return [normalize_occasion(str(value)) for value in values or [] if str(value).strip()]
+
+
+def _color_name(color: Optional[Dict]) -> str:
+    if not color:
+        return ""
+    for key in ("name", "hex"):
+        if color.get(key):
+            return str(color[key])
+    rgb = color.get("rgb")
+    if isinstance(rgb, (list, tuple)) and len(rgb) == 3:
+        return "#%02x%02x%02x" % tuple(int(c) for c in rgb)
+    return str(next(iter(color.values())))
+
+
+def _cell(value: str) -> str:
+    # The table uses | and newlines as separators
+    return " ".join(value.replace("|", "/").split())
+
+
+class PromptBuilder:
+    """Compact outfit prompts for large wardrobes.
+
+    Only items relevant to the occasion are sent: every category keeps its
+    best ``max_per_category`` matches on ``occasion_tags`` and
+    ``style_tags``, topped up to ``min_per_category`` with untagged items so
+    no category disappears. Items become rows of a ``|``-separated table
+    with short numeric ids instead of pretty-printed JSON, and the ids in
+    the model's answer are mapped back to the full items.
+    """
+
+    def __init__(self, max_per_category: Optional[int] = None, min_per_category: Optional[int] = None):
+        self.max_per_category = max_per_category or MODEL_CONFIG["prompt_max_per_category"]
+        self.min_per_category = min_per_category or MODEL_CONFIG["prompt_min_per_category"]
+
+    def score(self, item: Dict[str, Any], occasion: str) -> int:
+        """How well an item fits the occasion; 0 when none of its tags match"""
+        terms = set(occasion.split())
+        score = 0
+        for tag in _tags(item.get("occasion_tags")):
+            if tag in occasion or terms & set(tag.split()):
+                score += 2
+        for tag in _tags(item.get("style_tags")) + _tags([item.get("style", "")]):
+            if tag in occasion or terms & set(tag.split()):
+                score += 1
+        return score
+
+    def select(self, occasion: str, wardrobe: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Candidate items for the occasion, best matches first per category"""
+        occasion = normalize_occasion(occasion)
+        by_category: Dict[str, List[Tuple[int, int, Dict[str, Any]]]] = {}
+        for position, item in enumerate(flatten_wardrobe(wardrobe)):
+            by_category.setdefault(item["category"], []).append(
+                (self.score(item, occasion), position, item)
+            )
+
+        selected = []
+        for scored in by_category.values():
+            scored.sort(key=lambda entry: (-entry[0], entry[1]))
+            matches = [entry for entry in scored if entry[0] > 0][:self.max_per_category]
+            if len(matches) < self.min_per_category:
+                matches = scored[:self.min_per_category]
+            selected.extend(item for _, _, item in matches)
+        return selected
+
+    def encode(self, items: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Dict[str, Any]]]:
+        """Table rows for ``items`` and the id -> item map to decode answers"""
+        rows, id_map = [], {}
+        for index, item in enumerate(items, 1):
+            item_id = str(index)
+            id_map[item_id] = item
+            rows.append("|".join(_cell(value) for value in (
+                item_id,
+                str(item.get("category", "")),
+                str(item.get("style", "")),
+                ";".join(_tags(item.get("occasion_tags"))),
+                ";".join(_tags(item.get("style_tags"))),
+                _color_name(item.get("color"))
+            )))
+        return "\n".join(rows), id_map
+
+    def build(self, occasion: str, wardrobe: Dict[str, Any]) -> Tuple[str, Dict[str, Dict[str, Any]]]:
+        """Full suggestion prompt plus the id map for ``resolve``"""
+        table, id_map = self.encode(self.select(occasion, wardrobe))
+        prompt = SUGGESTION_PROMPT.format(occasion=occasion, columns="|".join(COLUMNS), table=table)
+        return prompt, id_map
+
+    def resolve(self, answer: Dict[str, Any], id_map: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Replace item ids in the model's answer with the full items"""
+        def lookup(ids) -> List[Dict[str, Any]]:
+            return [id_map[str(item_id)] for item_id in ids or [] if str(item_id) in id_map]
+
+        return {
+            "items": lookup(answer.get("items")),
+            "suggested_accessories": lookup(answer.get("suggested_accessories")),
+            "styling_tips": answer.get("styling_tips", ""),
+            "confidence_score": float(answer.get("confidence_score", 0.0))
+        }
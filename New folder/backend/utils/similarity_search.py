@@ -0,0 +1,310 @@
+"""Nearest-neighbour search over wardrobe item embeddings.
+
+An item's embedding joins its Lab colour (scaled to roughly unit range)
+with its occasion/style tag bitset spread over 64 dimensions. Each part
+is weighted by ``SIMILARITY_CONFIG``. "Items that go with X" is a k-NN
+query around X's embedding, restricted to other categories: a top is
+matched with bottoms, shoes and so on of similar colour and purpose.
+
+Small collections are searched exactly by brute force. From
+``ivf_threshold`` items up, an inverted-file (IVF) index is built: k-means
+cells over the embeddings, with only the ``nprobe`` cells nearest the
+query scanned exactly. This is the layout shared catalogues use.
+
+When the feature index changes, ``SimilaritySearch.updated`` embeds only
+the rows that changed and files them under their nearest existing cell;
+k-means runs again only once ``retrain_fraction`` of the rows have
+changed since the cells were trained.
+"""
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import SIMILARITY_CONFIG
+from utils.feature_index import (
+    CATEGORIES, FeatureIndex, TAG_BITS, category_code, get_feature_index,
+    item_features, rgb_to_lab, tag_bits, item_id as indexed_id
+)
+
+RANDOM_STATE = 0
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 20000
+
+_BIT_POSITIONS = np.arange(TAG_BITS, dtype=np.uint64)
+
+
+def embed(lab: np.ndarray, bits: np.ndarray) -> np.ndarray:
+    """(N, 3 + TAG_BITS) float32 embeddings from Lab colours and tag bitsets"""
+    lab = np.asarray(lab, dtype=np.float32).reshape(-1, 3)
+    color = lab / np.array([100.0, 128.0, 128.0], dtype=np.float32)
+    bits = np.asarray(bits, dtype=np.uint64).reshape(-1)
+    tags = ((bits[:, None] >> _BIT_POSITIONS) & np.uint64(1)).astype(np.float32)
+    # Unit-length tag part, so many tags don't outweigh the colour
+    tags /= np.maximum(np.linalg.norm(tags, axis=1, keepdims=True), 1.0)
+    return np.hstack([
+        SIMILARITY_CONFIG["color_weight"] * color,
+        SIMILARITY_CONFIG["tag_weight"] * tags
+    ]).astype(np.float32)
+
+
+def embed_item(item: Dict[str, Any]) -> Tuple[np.ndarray, int]:
+    """Embedding and category code of a wardrobe item dict not yet indexed"""
+    rgb, _ = item_features(item)
+    analysis = item.get("style_analysis") or {}
+    bits = tag_bits(item.get("occasion_tags")) | tag_bits(
+        (item.get("style_tags") or []) + list(analysis.get("style_tags") or [])
+    )
+    vector = embed(rgb_to_lab(np.array([rgb])), np.array([bits], dtype=np.uint64))[0]
+    return vector, category_code(item.get("category"))
+
+
+class SimilaritySearch:
+    """k-NN over item embeddings, exact or IVF depending on size"""
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        ids: Sequence[str],
+        categories: np.ndarray,
+        ivf_threshold: Optional[int] = None,
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        index_rows: Optional[np.ndarray] = None,
+        centroids: Optional[np.ndarray] = None,
+        labels: Optional[np.ndarray] = None,
+        index_row_by_id: Optional[Dict[str, int]] = None
+    ):
+        """``centroids`` and per-vector cell ``labels`` reuse trained IVF cells"""
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.ids = np.asarray(ids, dtype=object)
+        self.categories = np.asarray(categories, dtype=np.uint8)
+        self.norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        self.nprobe = nprobe or SIMILARITY_CONFIG["nprobe"]
+        self.ivf_threshold = ivf_threshold or SIMILARITY_CONFIG["ivf_threshold"]
+        # Feature index row of each vector, when built from an index
+        self.index_rows = np.arange(len(self.vectors)) if index_rows is None else np.asarray(index_rows)
+        # Ids map to their feature index row, which never changes, so an
+        # update patches this map instead of rebuilding it
+        if index_row_by_id is None:
+            index_row_by_id = dict(zip(self.ids.tolist(), self.index_rows.tolist()))
+        self._index_row_by_id = index_row_by_id
+        # Index contents this search reflects, and rows changed since training
+        self._source: Optional[Dict[str, np.ndarray]] = None
+        self.changed_since_training = 0
+
+        self.centroids = None
+        self.labels = None
+        if centroids is not None:
+            self._partition(np.asarray(labels), centroids)
+        elif len(self.vectors) >= self.ivf_threshold:
+            self._build_ivf(nlist or int(np.sqrt(len(self.vectors))))
+        else:
+            self._locate()
+
+    @classmethod
+    def from_feature_index(cls, index: FeatureIndex, **kwargs) -> "SimilaritySearch":
+        source = _snapshot(index)
+        rows = np.flatnonzero(source["alive"])
+        vectors = embed(source["lab"][rows], source["bits"][rows])
+        ids = [index.ids[row] for row in rows]
+        search = cls(vectors, ids, source["category"][rows], index_rows=rows, **kwargs)
+        search._source = source
+        return search
+
+    def updated(self, index: FeatureIndex) -> "SimilaritySearch":
+        """A search over ``index`` as it is now, built from this one.
+
+        Exact searches are simply rebuilt. IVF searches keep their cells:
+        only rows that differ from what this search was built from are
+        embedded and added to their nearest cell, until so many rows have
+        changed that the cells are retrained.
+        """
+        if not self.is_partitioned or self._source is None:
+            return SimilaritySearch.from_feature_index(index, ivf_threshold=self.ivf_threshold, nprobe=self.nprobe)
+
+        source = _snapshot(index)
+        old = self._source
+        seen = len(old["alive"])
+        differs = (old["alive"] != source["alive"][:seen]) | (source["alive"][:seen] & (
+            (old["lab"] != source["lab"][:seen]).any(axis=1)
+            | (old["bits"] != source["bits"][:seen])
+            | (old["category"] != source["category"][:seen])
+        ))
+        changed = np.concatenate([np.flatnonzero(differs), np.arange(seen, len(source["alive"]))])
+        alive = int(np.count_nonzero(source["alive"]))
+        changed_since_training = self.changed_since_training + len(changed)
+        if (alive < self.ivf_threshold
+                or changed_since_training > SIMILARITY_CONFIG["retrain_fraction"] * alive):
+            return SimilaritySearch.from_feature_index(index, ivf_threshold=self.ivf_threshold, nprobe=self.nprobe)
+
+        keep = ~np.isin(self.index_rows, changed)
+        added = changed[source["alive"][changed]]
+        index_row_by_id = dict(self._index_row_by_id)
+        for row in changed[~source["alive"][changed]]:
+            index_row_by_id.pop(index.ids[row], None)
+        index_row_by_id.update((index.ids[row], int(row)) for row in added)
+        vectors = embed(source["lab"][added], source["bits"][added])
+        search = SimilaritySearch(
+            np.concatenate([self.vectors[keep], vectors]),
+            np.concatenate([self.ids[keep], np.asarray([index.ids[row] for row in added], dtype=object)]),
+            np.concatenate([self.categories[keep], source["category"][added]]),
+            ivf_threshold=self.ivf_threshold,
+            nprobe=self.nprobe,
+            index_rows=np.concatenate([self.index_rows[keep], added]),
+            centroids=self.centroids,
+            labels=np.concatenate([self.labels[keep], _nearest(vectors, self.centroids)]),
+            index_row_by_id=index_row_by_id
+        )
+        search._source = source
+        search.changed_since_training = changed_since_training
+        return search
+
+    @property
+    def is_partitioned(self) -> bool:
+        return self.centroids is not None
+
+    def _build_ivf(self, nlist: int):
+        """k-means cells with each cell's rows stored contiguously"""
+        rng = np.random.default_rng(RANDOM_STATE)
+        sample = self.vectors
+        if len(sample) > KMEANS_SAMPLE:
+            sample = sample[rng.choice(len(sample), KMEANS_SAMPLE, replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            labels = _nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+
+        self._partition(_nearest(self.vectors, centroids), centroids)
+
+    def _partition(self, labels: np.ndarray, centroids: np.ndarray):
+        order = np.argsort(labels, kind="stable")
+        self.vectors = self.vectors[order]
+        self.ids = self.ids[order]
+        self.categories = self.categories[order]
+        self.norms = self.norms[order]
+        self.index_rows = self.index_rows[order]
+        self.labels = labels[order]
+        self._locate()
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=len(centroids)))])
+        self.centroids = centroids
+        self.centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+
+    def _locate(self):
+        """Position of each feature index row among the vectors"""
+        size = int(self.index_rows.max()) + 1 if len(self.index_rows) else 0
+        self._positions = np.full(size, -1, dtype=np.int64)
+        self._positions[self.index_rows] = np.arange(len(self.index_rows))
+
+    def _row(self, item_id: str) -> Optional[int]:
+        index_row = self._index_row_by_id.get(item_id)
+        return None if index_row is None else int(self._positions[index_row])
+
+    def _candidates(self, query: np.ndarray, probes: int) -> np.ndarray:
+        distances = self.centroid_norms - 2 * self.centroids @ query
+        cells = np.argpartition(distances, min(probes, len(distances)) - 1)[:probes]
+        return np.concatenate([
+            np.arange(self.offsets[cell], self.offsets[cell + 1]) for cell in cells
+        ])
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        exclude_categories: Iterable[int] = (),
+        exclude_ids: Iterable[str] = ()
+    ) -> List[Tuple[str, int, float]]:
+        """``k`` nearest ``(id, category code, distance)``, closest first"""
+        query = np.asarray(query, dtype=np.float32)
+        excluded = np.zeros(len(CATEGORIES), dtype=bool)
+        excluded[list(exclude_categories)] = True
+        excluded_rows = [row for row in map(self._row, exclude_ids) if row is not None]
+
+        probes = self.nprobe
+        while True:
+            if self.is_partitioned:
+                rows = self._candidates(query, probes)
+            else:
+                rows = np.arange(len(self.vectors))
+            keep = ~excluded[self.categories[rows]] & ~np.isin(rows, excluded_rows)
+            rows = rows[keep]
+            # Widen the probe until enough candidates survive the filters
+            if (len(rows) >= k or not self.is_partitioned
+                    or probes >= len(self.centroids)):
+                break
+            probes *= 2
+
+        if not len(rows):
+            return []
+        distances = self.norms[rows] - 2 * (self.vectors[rows] @ query) + float(query @ query)
+        k = min(k, len(rows))
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best], kind="stable")]
+        return [
+            (self.ids[rows[i]], int(self.categories[rows[i]]), float(np.sqrt(max(distances[i], 0.0))))
+            for i in best
+        ]
+
+    def matching_items(self, query: np.ndarray, category: int, k: int = 10,
+                       exclude_ids: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """Items from other categories that go with an item of ``category``"""
+        exclude = [category] if category != category_code("others") else []
+        return [
+            {"id": item_id, "category": CATEGORIES[code], "distance": distance}
+            for item_id, code, distance in self.search(query, k, exclude, exclude_ids)
+        ]
+
+    def matching_for_id(self, item_id: str, k: int = 10) -> List[Dict[str, Any]]:
+        """``matching_items`` for an item already in the collection"""
+        row = self._row(item_id)
+        if row is None:
+            raise KeyError(item_id)
+        return self.matching_items(self.vectors[row], int(self.categories[row]), k, [item_id])
+
+
+def _snapshot(index: FeatureIndex) -> Dict[str, np.ndarray]:
+    """Copies of the index columns the embeddings are made from"""
+    arrays = index.arrays()
+    return {
+        "lab": np.array(arrays["lab"]),
+        "bits": arrays["occasion_bits"] | arrays["style_bits"],
+        "category": np.array(arrays["category"]),
+        "alive": np.array(arrays["alive"]),
+    }
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    distances = (np.einsum("ij,ij->i", centroids, centroids)[None, :]
+                 - 2 * vectors @ centroids.T)
+    return distances.argmin(axis=1)
+
+
+_searches: Dict[str, Tuple[int, SimilaritySearch]] = {}
+_searches_lock = threading.Lock()
+
+
+def get_similarity_search(user_id: str) -> SimilaritySearch:
+    """Search over the user's feature index, updated only after it changes.
+
+    Updating can take a while for large wardrobes; call it off the event loop.
+    """
+    index = get_feature_index(user_id)
+    with _searches_lock:
+        cached = _searches.get(user_id)
+        if cached is None:
+            cached = _searches[user_id] = (index.version, SimilaritySearch.from_feature_index(index))
+        elif cached[0] != index.version:
+            # Read the version first: a change racing the update bumps it again
+            version = index.version
+            cached = _searches[user_id] = (version, cached[1].updated(index))
+        return cached[1]
+
+
+def matching_items_for(user_id: str, item: Dict[str, Any], k: int = 10) -> List[Dict[str, Any]]:
+    """Items in the user's wardrobe that go with ``item``"""
+    query, category = embed_item(item)
+    return get_similarity_search(user_id).matching_items(query, category, k, [indexed_id(item)])
@@ -0,0 +1,160 @@
+import asyncio
+import copy
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from config import CACHE_CONFIG
+from utils.metrics import cache_counters
+
+CacheKey = Tuple[str, str, str]
+
+HIT_COUNTER, MISS_COUNTER = cache_counters("suggestion")
+
+
+def normalize_occasion(occasion: str) -> str:
+    """Case, punctuation and spacing insensitive form of an occasion"""
+    return " ".join(re.sub(r"[^\w\s]", " ", occasion.lower()).split())
+
+
+def wardrobe_fingerprint(wardrobe: Dict[str, Any]) -> str:
+    """Stable hash of wardrobe contents, independent of key order"""
+    canonical = json.dumps(wardrobe, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SuggestionCache:
+    """In-memory cache of outfit suggestions.
+
+    Keyed on user, normalised occasion and wardrobe fingerprint, so a
+    suggestion is only reused while the wardrobe it was made for is
+    unchanged. Entries expire after ``ttl`` seconds and the least recently
+    used are evicted beyond ``max_entries``. ``invalidate_user`` drops one
+    user's entries when their wardrobe is edited.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl or CACHE_CONFIG["suggestion_ttl"]
+        self.max_entries = max_entries or CACHE_CONFIG["suggestion_max_entries"]
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any, float]]" = OrderedDict()
+        self._by_user: Dict[str, Set[CacheKey]] = {}
+        self._in_flight: Dict[CacheKey, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    def _key(self, user_id: str, occasion: str, wardrobe: Dict[str, Any]) -> CacheKey:
+        return (user_id, normalize_occasion(occasion), wardrobe_fingerprint(wardrobe))
+
+    def _discard(self, key: CacheKey):
+        self._entries.pop(key, None)
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    def _lookup(self, key: CacheKey) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            MISS_COUNTER.inc()
+            return None
+        expires_at, value, latency = entry
+        if expires_at <= time.monotonic():
+            self._discard(key)
+            self.expirations += 1
+            self.misses += 1
+            MISS_COUNTER.inc()
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        HIT_COUNTER.inc()
+        # Every hit spares one model call of the latency it originally took
+        self.saved_seconds += latency
+        return copy.deepcopy(value)
+
+    def _store(self, key: CacheKey, value: Any, latency: float):
+        self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value), latency)
+        self._entries.move_to_end(key)
+        self._by_user.setdefault(key[0], set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def get(self, user_id: str, occasion: str, wardrobe: Dict[str, Any]) -> Optional[Any]:
+        return self._lookup(self._key(user_id, occasion, wardrobe))
+
+    def put(self, user_id: str, occasion: str, wardrobe: Dict[str, Any], value: Any, latency: float = 0.0):
+        """Store a suggestion along with how long it took to generate"""
+        self._store(self._key(user_id, occasion, wardrobe), value, latency)
+
+    async def get_or_compute(
+        self,
+        user_id: str,
+        occasion: str,
+        wardrobe: Dict[str, Any],
+        compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Cached suggestion, or ``compute()`` it once for concurrent callers.
+
+        The computation runs as its own task that every caller awaits through
+        ``asyncio.shield``, so cancelling one caller (e.g. a disconnected
+        client) never cancels the work the others are waiting on.
+        """
+        key = self._key(user_id, occasion, wardrobe)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute(key, compute))
+            # Nobody may be left waiting; don't warn about an unretrieved error
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._in_flight[key] = task
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def _compute(self, key: CacheKey, compute: Callable[[], Awaitable[Any]]) -> Any:
+        start = time.monotonic()
+        try:
+            value = await compute()
+            # Skip the store if the user was invalidated while we computed
+            if self._in_flight.get(key) is asyncio.current_task():
+                self._store(key, value, time.monotonic() - start)
+            return value
+        finally:
+            if self._in_flight.get(key) is asyncio.current_task():
+                del self._in_flight[key]
+
+    def invalidate_user(self, user_id: str):
+        """Forget every suggestion made for this user's wardrobe"""
+        for key in list(self._by_user.get(user_id, ())):
+            self._discard(key)
+        for key in [key for key in self._in_flight if key[0] == user_id]:
+            del self._in_flight[key]
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "saved_latency_seconds": self.saved_seconds
+        }
+
+
+suggestion_cache = SuggestionCache()
@@ -0,0 +1,74 @@
+"""Direct access to images in the upload directory.
+
+Uploads on this machine are read from disk instead of being fetched back
+through the server's own ``/uploads`` route. A reference may be a bare
+path or a ``file://`` URI. Either one must resolve, after symlinks and
+``..``, to an existing file inside the upload directory. Anything else is
+refused with ``ValueError``, so these readers can never be pointed at
+arbitrary files. The module stays free of FastAPI so that the outfit
+agent workers can import it cheaply.
+"""
+import mmap
+import os
+from pathlib import Path
+from typing import Optional, Union
+from urllib.parse import urlparse
+
+from config import IMAGE_CONFIG, UPLOAD_DIR
+
+REMOTE_SCHEMES = ("http", "https")
+
+
+def is_remote(image_ref: str) -> bool:
+    return urlparse(image_ref).scheme.lower() in REMOTE_SCHEMES
+
+
+def upload_path(path: Optional[str], upload_dir: Union[str, Path] = UPLOAD_DIR) -> Optional[str]:
+    """``path`` resolved if it is an existing file inside ``upload_dir``"""
+    if not path:
+        return None
+    root = os.path.realpath(upload_dir)
+    resolved = os.path.realpath(path)
+    if os.path.commonpath([root, resolved]) != root or not os.path.isfile(resolved):
+        return None
+    return resolved
+
+
+def local_upload(image_ref: str, upload_dir: Union[str, Path] = UPLOAD_DIR) -> Optional[str]:
+    """The upload a local reference names, or None for http(s) URLs.
+
+    A ``file://`` URI or path that is not an upload raises ``ValueError``
+    rather than falling through to an HTTP fetch.
+    """
+    if not image_ref or is_remote(image_ref):
+        return None
+    parsed = urlparse(image_ref)
+    if parsed.scheme.lower() == "file":
+        if parsed.netloc not in ("", "localhost"):
+            raise ValueError(f"Remote file URIs are not supported: {image_ref}")
+        # urllib.request pulls in the whole HTTP client stack; only load it here
+        from urllib.request import url2pathname
+        candidate = url2pathname(parsed.path)
+    else:
+        # Bare paths, including Windows drive letters that parse as a scheme
+        candidate = image_ref
+    path = upload_path(candidate, upload_dir)
+    if path is None:
+        raise ValueError(f"Local image is not in the upload directory: {image_ref}")
+    return path
+
+
+def read_upload(path: str, max_size: Optional[int] = None) -> bytes:
+    """Contents of a resolved upload, copied out of a read-only mapping.
+
+    The size is checked against ``max_size`` before anything is read.
+    """
+    max_size = max_size or IMAGE_CONFIG["max_file_size"]
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > max_size:
+            raise ValueError(f"Image exceeds maximum file size of {max_size} bytes: {path}")
+        if size == 0:
+            return b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[:]
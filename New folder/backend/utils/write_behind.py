@@ -0,0 +1,153 @@
+import asyncio
+import copy
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from utils.db_manager import AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindBuffer:
+    """Collects wardrobe mutations in memory and writes them in batches.
+
+    Offers the same awaitable wardrobe API as ``AsyncDatabase``. Updates to
+    the same user and category coalesce, so only the latest value is
+    written. Pending mutations are flushed in one transaction every
+    ``flush_interval`` seconds, as soon as ``max_pending`` of them have
+    accumulated, and on ``close()``. Reads see pending mutations on top of
+    the stored data.
+    """
+
+    def __init__(self, db: AsyncDatabase, flush_interval: float = 1.0, max_pending: int = 500):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._pending_count = 0
+        self._oldest_pending: Optional[float] = None
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Event] = None
+
+        self.mutations_received = 0
+        self.mutations_coalesced = 0
+        self.flushes = 0
+        self.last_flush_size = 0
+        self.last_flush_seconds = 0.0
+        self.last_flush_lag_seconds = 0.0
+
+    def start(self):
+        """Start the interval flusher; call from a running event loop"""
+        if self._flusher is None:
+            self._closing = asyncio.Event()
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                # Mutations stay pending and are retried on the next tick
+                logger.error(f"Write-behind flush failed: {str(e)}")
+
+    async def update_user_wardrobe(self, user_id: str, wardrobe_data: Dict[str, Any]):
+        """Queue an update; returns before it reaches the database"""
+        self.start()
+        wardrobe = self._pending.setdefault(user_id, {})
+        if not wardrobe_data and not wardrobe:
+            # Still record the user, as Database.update_user_wardrobe would
+            self._pending_count += 1
+        for category, value in wardrobe_data.items():
+            if category in wardrobe:
+                self.mutations_coalesced += 1
+            else:
+                self._pending_count += 1
+            wardrobe[category] = copy.deepcopy(value)
+        self.mutations_received += max(1, len(wardrobe_data))
+        if self._oldest_pending is None:
+            self._oldest_pending = time.monotonic()
+
+        if self._pending_count >= self.max_pending:
+            await self.flush()
+
+    async def append_items(self, user_id: str, items: Dict[str, List[Dict[str, Any]]]):
+        """Append straight to the database, after anything pending is written.
+
+        Appends are already batched by the caller, and a pending update of
+        the same category flushed later would overwrite them.
+        """
+        await self.flush()
+        await self.db.append_items(user_id, items)
+
+    async def get_user_wardrobe(self, user_id: str) -> Dict[str, Any]:
+        wardrobe = await self.db.get_user_wardrobe(user_id)
+        wardrobe.update(copy.deepcopy(self._pending.get(user_id, {})))
+        return wardrobe
+
+    async def load(self) -> Dict[str, Any]:
+        data = await self.db.load()
+        for user_id, pending in self._pending.items():
+            data["users"].setdefault(user_id, {}).update(copy.deepcopy(pending))
+        return data
+
+    async def flush(self):
+        """Write every pending mutation in one transaction"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            batch_count, self._pending_count = self._pending_count, 0
+            oldest, self._oldest_pending = self._oldest_pending, None
+
+            start = time.monotonic()
+            try:
+                await self.db.update_many(batch)
+            except Exception:
+                # Put the batch back underneath anything queued meanwhile
+                for user_id, wardrobe in batch.items():
+                    pending = self._pending.setdefault(user_id, {})
+                    for category, value in wardrobe.items():
+                        if category not in pending:
+                            pending[category] = value
+                            self._pending_count += 1
+                    if not wardrobe and not pending:
+                        self._pending_count += 1
+                if self._oldest_pending is None or oldest < self._oldest_pending:
+                    self._oldest_pending = oldest
+                raise
+
+            finished = time.monotonic()
+            self.flushes += 1
+            self.last_flush_size = batch_count
+            self.last_flush_seconds = finished - start
+            self.last_flush_lag_seconds = finished - oldest
+
+    def metrics(self) -> Dict[str, Any]:
+        """Buffer state for tuning interval and threshold"""
+        return {
+            "pending_mutations": self._pending_count,
+            "pending_users": len(self._pending),
+            "flush_lag_seconds": (
+                time.monotonic() - self._oldest_pending if self._oldest_pending is not None else 0.0
+            ),
+            "mutations_received": self.mutations_received,
+            "mutations_coalesced": self.mutations_coalesced,
+            "flushes": self.flushes,
+            "last_flush_size": self.last_flush_size,
+            "last_flush_seconds": self.last_flush_seconds,
+            "last_flush_lag_seconds": self.last_flush_lag_seconds
+        }
+
+    async def close(self):
+        """Stop the flusher and write everything still pending"""
+        if self._flusher is not None:
+            # Let an in-progress flush finish rather than cancelling it
+            self._closing.set()
+            await self._flusher
+            self._flusher = None
+        await self.flush()